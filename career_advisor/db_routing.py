@@ -0,0 +1,170 @@
+"""
+Read-replica routing for read-only API views
+
+Views decorated with ``use_read_replica`` read from one of
+``settings.DATABASE_REPLICAS``; everything else, and every write, stays on
+``default``. Once a request writes, the rest of it reads from the primary, and
+``ReplicaPinMiddleware`` keeps that user on the primary for
+``REPLICA_PIN_SECONDS`` so they read their own writes despite replication lag.
+The pin is a signed cookie, so it holds whichever server process the user's
+next request lands on.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'career_advisor.db_routing'
+
+
+class RoutingState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+# Context variables follow a request into sync_to_async threads
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_seconds() -> int:
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def pin_to_primary(response, user_id) -> None:
+    """
+    Keep the user's reads on the primary for ``REPLICA_PIN_SECONDS``, through a cookie on ``response``
+    """
+    response.set_signed_cookie(
+        PIN_COOKIE, str(user_id), salt=PIN_SALT, max_age=_pin_seconds(), httponly=True, samesite='Lax'
+    )
+
+
+def is_pinned_to_primary(request, user_id) -> bool:
+    # The signature's timestamp bounds the pin even if a client keeps the cookie longer
+    pinned = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_SALT, max_age=_pin_seconds())
+    return pinned == str(user_id)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary inside this block, even within a ``use_read_replica`` view
+    """
+    state = _routing_state.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = True
+
+
+class ReplicaRouter:
+    """
+    Send reads inside ``use_read_replica`` views to a random replica, all writes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        return random.choice(replica_aliases())
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        same_data = {'default', *replica_aliases()}
+        if obj1._state.db in same_data and obj2._state.db in same_data:
+            return True
+        return None
+
+
+def use_read_replica(view):
+    """
+    Run a read-only view against a replica unless its user wrote within the pin window
+
+    Apply it inside ``@api_view`` (or to ``list``/``retrieve`` with ``method_decorator``)
+    so ``request.user`` is already authenticated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_aliases():
+            return view(request, *args, **kwargs)
+        state = _routing_state.get()
+        token = None
+        if state is None:
+            # Outside ReplicaPinMiddleware (management commands, tests), scoped to this call
+            state = RoutingState()
+            token = _routing_state.set(state)
+        user = request.user
+        state.use_replica = not (user.is_authenticated and is_pinned_to_primary(request, user.pk))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+            if token is not None:
+                _routing_state.reset(token)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """
+    Track writes per request and pin the writing user to the primary afterwards
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.wrote and replica_aliases():
+            self._pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.wrote and replica_aliases():
+            # A session user is resolved lazily from the database
+            await sync_to_async(self._pin)(request, response)
+        return response
+
+    def _pin(self, request, response):
+        # DRF copies the user it authenticated (e.g. from a JWT) back onto the Django request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(response, user.pk)
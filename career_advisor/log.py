@@ -0,0 +1,17 @@
+import logging
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    Standard formatting followed by the record's ``extra`` fields as key=value pairs
+    """
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value!r}' if isinstance(value, str) else f'{key}={value}' for key, value in fields.items())
+        return line
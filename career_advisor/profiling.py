@@ -0,0 +1,195 @@
+"""
+On-demand request profiling with cProfile and, optionally, tracemalloc
+
+A request is profiled when it carries a valid signed ``X-Profile`` header (see
+``manage.py request_profiles --sign-header``), when a staff user adds
+``?profile=1`` (``?profile=memory`` adds allocations), or when it is picked by
+``PROFILING_SAMPLE_RATE``. Each profile is written to ``PROFILING_DIR`` as a
+pstats ``.prof`` file plus a ``.json`` summary.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+import tracemalloc
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SIGNING_SALT = 'career_advisor.profiling'
+TOP_ALLOCATIONS = 25
+
+
+def sign_profile_header(memory: bool = False) -> str:
+    """
+    Value for an ``X-Profile`` header, valid for ``PROFILING_HEADER_MAX_AGE`` seconds
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('memory' if memory else 'cpu')
+
+
+def profile_dir() -> Path:
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+class ProfilingMiddleware:
+    """
+    Run selected requests under cProfile (and tracemalloc) and save the results
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.sample_memory = getattr(settings, 'PROFILING_SAMPLE_MEMORY', False)
+        self.header_max_age = getattr(settings, 'PROFILING_HEADER_MAX_AGE', 3600)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        mode = self._header_mode(request) or self._staff_mode(request) or self._sampled_mode()
+        if mode is None:
+            return self.get_response(request)
+        session = ProfileSession(mode)
+        with session:
+            response = self.get_response(request)
+        session.save(request, response)
+        return response
+
+    async def __acall__(self, request):
+        mode = self._header_mode(request)
+        if mode is None and 'profile' in request.GET:
+            # Resolving the user touches the database
+            mode = await sync_to_async(self._staff_mode)(request)
+        mode = mode or self._sampled_mode()
+        if mode is None:
+            return await self.get_response(request)
+        # cProfile follows the thread: other coroutines on this event loop show up too,
+        # work handed to executors does not
+        session = ProfileSession(mode)
+        with session:
+            response = await self.get_response(request)
+        session.save(request, response)
+        return response
+
+    def _header_mode(self, request):
+        """
+        (trigger, memory) for a valid signed X-Profile header, else None
+        """
+        header = request.META.get(PROFILE_HEADER)
+        if not header:
+            return None
+        try:
+            value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(header, max_age=self.header_max_age)
+        except signing.BadSignature:
+            logger.warning("Ignoring invalid X-Profile header", extra={'path': request.path})
+            return None
+        return 'header', value == 'memory'
+
+    def _staff_mode(self, request):
+        flag = request.GET.get('profile')
+        if flag and self._is_staff(request):
+            return 'staff', flag == 'memory'
+        return None
+
+    def _sampled_mode(self):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample', self.sample_memory
+        return None
+
+    def _is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        # API clients authenticate per view with JWT, after middleware runs
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return result is not None and result[0].is_staff
+
+
+class ProfileSession:
+    def __init__(self, mode):
+        self.trigger, self.memory = mode
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+        self._owns_tracemalloc = False
+
+    def __enter__(self):
+        if self.memory and not tracemalloc.is_tracing():
+            # tracemalloc is process-wide; a request already tracing keeps ownership
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self.started = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler already owns this thread (a concurrent profiled coroutine)
+            self.profiler = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self.started
+        if self._owns_tracemalloc:
+            self.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        return False
+
+    def save(self, request, response):
+        if self.profiler is None:
+            return
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        created_at = timezone.now()
+        name = f"{created_at:%Y%m%dT%H%M%S%f}_{re.sub(r'[^A-Za-z0-9_.-]+', '-', view)}_{self.seconds * 1000:.0f}ms"
+
+        directory = profile_dir()
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.profiler.dump_stats(os.fspath(directory / f'{name}.prof'))
+            summary = {
+                'view': view,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'duration_ms': round(self.seconds * 1000, 3),
+                'trigger': self.trigger,
+                'created_at': created_at.isoformat(),
+                'top_allocations': self._top_allocations(),
+            }
+            with open(directory / f'{name}.json', 'w') as summary_file:
+                json.dump(summary, summary_file, indent=2)
+        except OSError:
+            logger.exception("Could not save request profile", extra={'profile_dir': os.fspath(directory)})
+            return
+        logger.info("Saved request profile", extra={'profile': name, 'view': view, 'trigger': self.trigger})
+
+    def _top_allocations(self):
+        if self.snapshot is None:
+            return None
+        return [
+            {
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'size_kib': round(stat.size / 1024, 1),
+                'count': stat.count,
+            }
+            for stat in self.snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+        ]
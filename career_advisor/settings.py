@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'career_advisor.middleware.MetricsMiddleware',  # Outermost, so it times everything below
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'career_advisor.db_routing.ReplicaPinMiddleware',
+    'career_advisor.profiling.ProfilingMiddleware',  # After auth, so ?profile=1 can check is_staff
 ]
 
 REST_FRAMEWORK = {
@@ -55,6 +59,26 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Queue POST /api/quiz/analyze/ as a background job (202 + job id) unless the request
+# passes ?background=0; jobs are run by `python manage.py run_analysis_workers`
+QUIZ_ANALYSIS_JOBS = False
+
+# Seconds a process trusts the catalog version it last read; other processes' catalog changes show up this late
+QUIZ_CATALOG_VERSION_TTL = 1.0
+
+# Users whose last analysis result is kept per process, reused while their answers and the catalog are unchanged
+QUIZ_ANALYSIS_CACHE_SIZE = 10000
+
+# Threads scoring requests for the async quiz views (quiz.async_views), per process
+QUIZ_SCORING_WORKERS = 4
+
+# Request profiling (career_advisor.profiling): signed X-Profile header, staff ?profile=1|memory,
+# or a random sample; inspect with `python manage.py request_profiles`
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_MEMORY = False  # tracemalloc on sampled requests too (slows them down noticeably)
+PROFILING_HEADER_MAX_AGE = 3600  # seconds a signed X-Profile header stays valid
+
 # JWT Settings
 from datetime import timedelta
 
@@ -80,13 +104,55 @@ TEMPLATES = [
     },
 ]
 
+# DB_ENGINE=postgresql uses DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT; SQLite by default
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+
+def _database(name):
+    if DB_ENGINE == 'postgresql':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': name,
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+        }
+    return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': _database(os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3')),
 }
 
+# Read replicas (career_advisor.db_routing): DB_REPLICAS=replica1.sqlite3,replica2.sqlite3, or
+# Postgres database names on the same server; read-only views use them, writes never do
+DATABASE_REPLICAS = []
+for _index, _name in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {**_database(_name.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+# User shards (career_advisor.sharding): DB_SHARDS=shard0.sqlite3,shard1.sqlite3 (or Postgres database
+# names) spreads these models over shard0..N by a hash of user_id; 'default' keeps users and the catalog.
+# Only append shards, then run `python manage.py rebalance_shards` to move the users that changed shard.
+SHARDED_MODELS = ['quiz.answer', 'quiz.careerrecommendation', 'quiz.userscorestate', 'quiz.userprofilevector']
+DATABASE_SHARDS = []
+for _index, _name in enumerate(filter(None, os.environ.get('DB_SHARDS', '').split(','))):
+    DATABASES[f'shard{_index}'] = {**_database(_name.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_SHARDS.append(f'shard{_index}')
+
+# Without DB_REPLICAS/DB_SHARDS these aliases are never routed to; the routing and sharding tests
+# switch them on with override_settings: a replica mirroring default and two shard test databases,
+# created only for the tests that use them
+DATABASES.setdefault('replica1', {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
+DATABASES.setdefault('shard0', _database(f"{DATABASES['default']['NAME']}-shard0"))
+DATABASES.setdefault('shard1', _database(f"{DATABASES['default']['NAME']}-shard1"))
+
+DATABASE_ROUTERS = ['career_advisor.sharding.ShardRouter', 'career_advisor.db_routing.ReplicaRouter']
+
+# Seconds a user reads from the primary after a request of theirs wrote (covers replication lag)
+REPLICA_PIN_SECONDS = 10
+
 CORS_ALLOW_ALL_ORIGINS = True  # Allow all for now (adjust later)
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
@@ -102,5 +168,29 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = []
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Logging: key=value lines on stderr; DJANGO_LOG_LEVEL=DEBUG for more detail
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'key_value': {
+            '()': 'career_advisor.log.KeyValueFormatter',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'key_value',
+        },
+    },
+    'loggers': {
+        'career_advisor': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'quiz': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+        'users': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Hash sharding of per-user rows across ``settings.DATABASE_SHARDS``
+
+Models listed in ``SHARDED_MODELS`` (answers, recommendations, score states)
+live on the shard picked by a jump consistent hash of their ``user_id``;
+users, questions, careers and everything else stay in the ``default`` catalog
+database. With no shards configured every helper falls back to normal routing.
+
+Routers only see the model and, for instance operations, the instance, so
+querysets of sharded models go through ``ShardedManager.for_user()`` and
+friends rather than ``objects.filter(user=...)``.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import models
+
+
+def shard_aliases() -> List[str]:
+    return getattr(settings, 'DATABASE_SHARDS', [])
+
+
+def is_sharded(model) -> bool:
+    return model._meta.label_lower in getattr(settings, 'SHARDED_MODELS', ())
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash: growing from n to n + 1 buckets moves only 1/(n + 1) of the keys
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id) -> Optional[str]:
+    """
+    Database alias holding the user's sharded rows, or None when sharding is off
+    """
+    shards = shard_aliases()
+    if not shards:
+        return None
+    return shards[jump_hash(int(user_id), len(shards))]
+
+
+def user_db(user_id) -> str:
+    """
+    Database to write the user's sharded rows to, and to open transactions on
+    """
+    return shard_for_user(user_id) or 'default'
+
+
+def users_by_db(user_ids: Iterable) -> Dict[str, List]:
+    grouped = defaultdict(list)
+    for user_id in user_ids:
+        grouped[user_db(user_id)].append(user_id)
+    return dict(grouped)
+
+
+def _hinted_user_id(hints):
+    instance = hints.get('instance')
+    if instance is None:
+        return None
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+        return instance.pk  # Related managers such as user.answers
+    return getattr(instance, 'user_id', None)
+
+
+class ShardRouter:
+    """
+    Route saves, deletes and related-manager queries of sharded models by their user
+    """
+
+    def _db_for_user_rows(self, model, **hints):
+        if not shard_aliases():
+            return None
+        if is_sharded(model):
+            user_id = _hinted_user_id(hints)
+            return shard_for_user(user_id) if user_id is not None else None
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)):
+            # Catalog rows reached from a sharded row (lazy foreign keys, prefetches); Django
+            # would otherwise look for them in the shard the row came from
+            return 'default'
+        return None
+
+    db_for_read = _db_for_user_rows
+    db_for_write = _db_for_user_rows
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows point at catalog rows in another database by id only (db_constraint=False)
+        if is_sharded(type(obj1)) or is_sharded(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in shard_aliases():
+            return model_name is not None and f'{app_label}.{model_name}' in settings.SHARDED_MODELS
+        return None
+
+
+class ShardedManager(models.Manager):
+    """
+    Querysets of a sharded model pinned to the right shard
+    """
+
+    def shard(self, user_id) -> models.QuerySet:
+        alias = shard_for_user(user_id)
+        queryset = self.get_queryset()
+        return queryset if alias is None else queryset.using(alias)
+
+    def for_user(self, user_id) -> models.QuerySet:
+        return self.shard(user_id).filter(user_id=user_id)
+
+    def _shard_of_arguments(self, kwargs) -> models.QuerySet:
+        # Routers see no instance for manager-level creates; the user is in the arguments
+        user = kwargs.get('user')
+        user_id = kwargs.get('user_id', getattr(user, 'pk', None))
+        return self.get_queryset() if user_id is None else self.shard(user_id)
+
+    def create(self, **kwargs):
+        return self._shard_of_arguments(kwargs).create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        return self._shard_of_arguments(kwargs).get_or_create(defaults=defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, **kwargs):
+        return self._shard_of_arguments(kwargs).update_or_create(defaults=defaults, **kwargs)
+
+    def for_users(self, user_ids: Iterable) -> List[models.QuerySet]:
+        """
+        One queryset per shard holding any of ``user_ids``
+        """
+        if not shard_aliases():
+            return [self.get_queryset().filter(user_id__in=list(user_ids))]
+        return [
+            self.get_queryset().using(alias).filter(user_id__in=ids)
+            for alias, ids in users_by_db(user_ids).items()
+        ]
+
+    def on_every_shard(self) -> List[models.QuerySet]:
+        """
+        The whole table, one queryset per shard, for scans that are not about one user
+        """
+        if not shard_aliases():
+            return [self.get_queryset()]
+        return [self.get_queryset().using(alias) for alias in shard_aliases()]
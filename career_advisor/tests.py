@@ -0,0 +1,309 @@
+import json
+import re
+import tempfile
+from contextlib import ExitStack
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from quiz.career_analysis import CareerAnalyzer
+from quiz.models import Answer, Career, CareerRecommendation, Question, UserProfileVector, UserScoreState
+from quiz.result_cache import analysis_results
+
+from .db_routing import PIN_COOKIE
+from .metrics import REGISTRY
+from .profiling import sign_profile_header
+from .sharding import jump_hash, shard_for_user
+
+User = get_user_model()
+
+
+def _samples():
+    """``{'name{labels}': value}`` of every sample /metrics currently exposes"""
+    samples = {}
+    for line in REGISTRY.render().splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            Career.objects.create(name=f'Career {i}', category='Test', description='Test career', growth_prospects='high')
+
+    def test_requests_are_counted_per_url_name(self):
+        client = Client()
+        requests = 'http_requests_total{view="get-all-careers",method="GET",status="200"}'
+        latency = 'http_request_duration_seconds_count{view="get-all-careers",method="GET"}'
+        queries = 'http_request_db_queries_sum{view="get-all-careers"}'
+        before = _samples()
+        client.get('/api/quiz/careers/?page_size=2')
+        client.get('/api/quiz/careers/?page_size=2')
+        client.get('/no/such/page/')
+
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        after = _samples()
+        self.assertEqual(after[requests] - before.get(requests, 0), 2)
+        self.assertEqual(after[latency] - before.get(latency, 0), 2)
+        self.assertGreaterEqual(after[queries] - before.get(queries, 0), 2)  # At least the page's SELECT each time
+        unmatched = 'http_requests_total{view="<unmatched>",method="GET",status="404"}'
+        self.assertEqual(after[unmatched] - before.get(unmatched, 0), 1)
+
+        # Every histogram's +Inf bucket equals its count
+        for series, value in after.items():
+            match = re.match(r'(\w+)_bucket\{(.*),le="\+Inf"\}$', series)
+            if match:
+                name, labels = match.groups()
+                self.assertEqual(value, after[f'{name}_count{{{labels}}}'])
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profile_dir = Path(directory.name)
+        settings_override = override_settings(PROFILING_DIR=self.profile_dir, PROFILING_SAMPLE_RATE=0.0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Career.objects.create(name='Career', category='Test', description='Test career', growth_prospects='high')
+        self.client = Client()
+
+    def _auth(self, username, is_staff):
+        user = User.objects.create(username=username, is_staff=is_staff)
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    def _summaries(self):
+        return [json.loads(path.read_text()) for path in sorted(self.profile_dir.glob('*.json'))]
+
+    def test_only_staff_and_signed_requests_are_profiled(self):
+        self.client.get('/api/quiz/careers/')
+        self.client.get('/api/quiz/careers/?profile=1', headers=self._auth('student', is_staff=False))
+        self.client.get('/api/quiz/careers/', headers={'X-Profile': 'cpu:forged'})
+        self.assertEqual(self._summaries(), [])
+
+        self.client.get('/api/quiz/careers/?profile=1', headers=self._auth('staff', is_staff=True))
+        self.client.get('/api/quiz/careers/', headers={'X-Profile': sign_profile_header(memory=True)})
+        summaries = self._summaries()
+        self.assertEqual([summary['trigger'] for summary in summaries], ['staff', 'header'])
+        self.assertEqual({summary['view'] for summary in summaries}, {'get-all-careers'})
+        self.assertEqual({summary['status'] for summary in summaries}, {200})
+        self.assertIsNone(summaries[0]['top_allocations'])
+        self.assertTrue(summaries[1]['top_allocations'])
+        self.assertEqual(len(list(self.profile_dir.glob('*.prof'))), 2)
+
+        out = StringIO()
+        call_command('request_profiles', '--summary', stdout=out)
+        self.assertIn('get-all-careers: 2 profiles', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # The mirror is a second connection, which only sees committed rows
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        question = Question.objects.create(text='Question', category='interest')
+        self.users = [User.objects.create(username=f'reader{i}') for i in range(2)]
+        for user in self.users:
+            Answer.objects.create(question=question, user=user, choice='like')
+        self.question = question
+
+    def _client(self, user):
+        return Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+
+    def _answer_reads(self, client):
+        """Aliases the user's answer list was read from"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = client.get('/api/quiz/answers/my/')
+        self.assertEqual(response.status_code, 200)
+        return {
+            alias
+            for alias, queries in (('default', primary), ('replica1', replica))
+            if any('FROM "quiz_answer"' in query['sql'] for query in queries)
+        }
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        writer, reader = self._client(self.users[0]), self._client(self.users[1])
+        self.assertEqual(self._answer_reads(writer), {'replica1'})
+
+        response = writer.post('/api/quiz/answers/submit/', {'answers': [{'question': self.question.id, 'choice': 'dislike'}]},
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self._answer_reads(writer), {'default'})
+        self.assertEqual(self._answer_reads(reader), {'replica1'})
+
+        # The pin is the writer's alone and cannot be forged
+        reader.cookies[PIN_COOKIE] = writer.cookies[PIN_COOKIE].value
+        self.assertEqual(self._answer_reads(reader), {'replica1'})
+        writer.cookies[PIN_COOKIE] = f'{self.users[0].pk}:forged:signature'
+        self.assertEqual(self._answer_reads(writer), {'replica1'})
+
+    def test_catalog_reads_leave_the_primary_alone_once_warm(self):
+        Career.objects.create(name='Career', category='Test', description='Test career', growth_prospects='high')
+        client = Client()
+        paths = ['/api/quiz/questions/', '/api/quiz/questions/interest/', '/api/quiz/careers/', '/api/quiz/stats/']
+        for path in paths:
+            client.get(path)
+        for path in paths:
+            with CaptureQueriesContext(connections['default']) as primary:
+                self.assertEqual(client.get(path).status_code, 200)
+            self.assertEqual(primary.captured_queries, [], path)
+
+        # Pages are read straight from the table, on the replica
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = client.get('/api/quiz/careers/?page_size=1')
+        self.assertEqual(len(response.json()['careers']), 1)
+        self.assertEqual(primary.captured_queries, [])
+        self.assertTrue(any('FROM "quiz_career"' in query['sql'] for query in replica.captured_queries))
+
+    def test_reads_without_replicas_stay_on_default(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self._answer_reads(self._client(self.users[0])), {'default'})
+
+
+@override_settings(DATABASE_SHARDS=['shard0', 'shard1'])
+class ShardingTests(TestCase):
+    databases = {'default', 'shard0', 'shard1'}
+
+    def setUp(self):
+        self.questions = [
+            Question.objects.create(text=f'Career {i} topic{i % 2}', category=('interest', 'career')[i % 2])
+            for i in range(4)
+        ]
+        for i in range(3):
+            Career.objects.create(
+                name=f'Career {i}', category='Test', description='Test career',
+                interest_keywords=[f'topic{i % 2}'], growth_prospects='high',
+            )
+        # Users until both shards hold one
+        self.users = {}
+        while len(self.users) < 2:
+            user = User.objects.create(username=f'sharded{User.objects.count()}')
+            self.users.setdefault(shard_for_user(user.pk), user)
+
+    def _rows(self, model, user):
+        return {alias: model.objects.using(alias).filter(user_id=user.pk).count() for alias in ('default', 'shard0', 'shard1')}
+
+    def test_jump_hash_only_moves_keys_to_a_new_shard(self):
+        keys = range(2000)
+        for buckets in range(1, 6):
+            moved = 0
+            for key in keys:
+                before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+                self.assertIn(after, (before, buckets))
+                moved += after != before
+            self.assertAlmostEqual(moved / len(keys), 1 / (buckets + 1), delta=0.05)
+
+    def test_user_rows_live_on_their_shard(self):
+        for alias, user in self.users.items():
+            client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+            response = client.post('/api/quiz/answers/submit/', {'answers': [
+                {'question': question.id, 'choice': 'like'} for question in self.questions
+            ]}, content_type='application/json')
+            self.assertEqual(response.json()['total_submitted'], 4)
+            self.assertEqual(client.post('/api/quiz/analyze/').status_code, 200)
+            self.assertEqual(len(client.get('/api/quiz/answers/my/').json()), 4)
+
+            expected = {'default': 0, 'shard0': 0, 'shard1': 0}
+            self.assertEqual(self._rows(Answer, user), {**expected, alias: 4})
+            self.assertEqual(self._rows(CareerRecommendation, user), {**expected, alias: 3})
+            self.assertEqual(self._rows(UserScoreState, user), {**expected, alias: 1})
+
+            user.delete()
+            self.assertEqual(self._rows(Answer, user), expected)
+            self.assertEqual(self._rows(CareerRecommendation, user), expected)
+
+    def _committing(self):
+        """Run the on-commit callbacks (rollup deltas, catalog versions) of every database at the end of the block"""
+        stack = ExitStack()
+        for alias in ('default', 'shard0', 'shard1'):
+            stack.enter_context(self.captureOnCommitCallbacks(using=alias, execute=True))
+        return stack
+
+    def _answer_everything(self):
+        for user in self.users.values():
+            for question in self.questions:
+                Answer.objects.create(question=question, user=user, choice='dislike')
+            CareerAnalyzer().analyze_user_responses(user)
+
+    def _snapshot(self, user):
+        return (
+            sorted(Answer.objects.for_user(user.pk).values_list('question_id', 'choice', 'created_at')),
+            sorted(CareerRecommendation.objects.for_user(user.pk).values_list('career_id', 'match_score', 'created_at')),
+        )
+
+    def test_rebalance_moves_rows_to_their_shard(self):
+        with override_settings(DATABASE_SHARDS=[]):
+            self._answer_everything()
+            before = {alias: self._snapshot(user) for alias, user in self.users.items()}
+
+        out = StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('Moved 2 users', out.getvalue())
+        for alias, user in self.users.items():
+            self.assertEqual(self._rows(Answer, user), {'default': 0, 'shard0': 0, 'shard1': 0, alias: 4})
+            self.assertEqual(self._rows(UserProfileVector, user)[alias], 1)
+            self.assertEqual(self._snapshot(user), before[alias])  # created_at too
+
+        out = StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('Moved 0 users', out.getvalue())
+
+    def test_rebalance_after_adding_a_shard(self):
+        with override_settings(DATABASE_SHARDS=['shard0']):
+            self._answer_everything()
+            before = {alias: self._snapshot(user) for alias, user in self.users.items()}
+
+        out = StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('Moved 1 users', out.getvalue())
+        moved = self.users['shard1']
+        self.assertEqual(self._rows(Answer, moved), {'default': 0, 'shard0': 0, 'shard1': 4})
+        self.assertEqual(self._rows(UserScoreState, moved), {'default': 0, 'shard0': 0, 'shard1': 1})
+        for alias, user in self.users.items():
+            self.assertEqual(self._snapshot(user), before[alias])
+        # Scoring reads the moved state back
+        analysis_results.clear()
+        recommendations = CareerAnalyzer().analyze_user_responses(moved)
+        self.assertEqual({row['career'].id for row in recommendations}, {row[0] for row in before['shard1'][1]})
+
+    def test_rebalance_keeps_rows_written_after_the_move(self):
+        moved = self.users['shard1']
+        with self._committing(), override_settings(DATABASE_SHARDS=['shard0']):
+            self._answer_everything()
+        with self._committing():
+            # The moved user answers again on their new shard before the rebalance runs
+            Answer.objects.create(question=self.questions[0], user=moved, choice='strongly_like')
+            recommendations = CareerAnalyzer().analyze_user_responses(moved)
+            newer = set(CareerRecommendation.objects.for_user(moved.pk).values_list('career_id', 'match_score'))
+            call_command('rebalance_shards', stdout=StringIO())
+
+        self.assertEqual(
+            dict(Answer.objects.for_user(moved.pk).values_list('question_id', 'choice')),
+            {question.id: 'strongly_like' if question == self.questions[0] else 'dislike' for question in self.questions},
+        )
+        self.assertEqual(set(CareerRecommendation.objects.for_user(moved.pk).values_list('career_id', 'match_score')), newer)
+        self.assertEqual(self._rows(Answer, moved), {'default': 0, 'shard0': 0, 'shard1': 4})
+        # Score state and profile vector are rebuilt from all four answers
+        analysis_results.clear()
+        rescored = CareerAnalyzer().analyze_user_responses(moved)
+        self.assertNotEqual([row['score'] for row in rescored], [row['score'] for row in recommendations])
+        state = UserScoreState.objects.for_user(moved.pk).get()
+        self.assertEqual(len(state.answer_choices), 4)
+
+        out = StringIO()
+        call_command('reconcile_rollups', stdout=out)
+        self.assertEqual(out.getvalue().count('(0 corrected)'), 2, out.getvalue())
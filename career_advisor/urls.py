@@ -6,12 +6,18 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from .metrics import REGISTRY
+
 def home(request):
     return HttpResponse("Django server is running!")
 
+def metrics(request):
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 urlpatterns = [
     path('', home),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('api/users/', include('users.urls')),
     path('api/quiz/', include('quiz.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
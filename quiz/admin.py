@@ -15,7 +15,7 @@ class QuestionAdmin(admin.ModelAdmin):
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'question_short', 'choice', 'created_at']
-    list_filter = ['choice', 'question__category']
+    list_filter = ['choice', 'category']
     search_fields = ['user__username', 'question__text']
     ordering = ['-created_at']
     
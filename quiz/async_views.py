@@ -0,0 +1,171 @@
+"""
+Async variants of the analysis and export endpoints, for deployments served through ``career_advisor.asgi``
+
+DRF views are synchronous, so these are plain Django async views that reuse the
+sync views' helpers and return the same JSON. ORM reads use the async ORM,
+scoring runs on a bounded thread pool, and transactional writes go through
+``sync_to_async`` since Django transactions are sync-only.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated, AuthenticationFailed, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .career_analysis import CareerAnalyzer, format_recommendations
+from .models import Answer
+from .views import (
+    _answered_questions, _check_answer_items, _export_lines, _export_response,
+    _recommendations_data, _save_answers, _user_recommendations, _valid_answers,
+)
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Caps concurrent scoring per process; requests beyond it wait without holding a thread
+scoring_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'QUIZ_SCORING_WORKERS', 4),
+    thread_name_prefix='quiz-scoring',
+)
+
+
+def _json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status_code, headers=headers)
+
+
+async def _authenticate(request):
+    """
+    JWT authentication as in the sync views, with the user lookup on the async ORM
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = header and authenticator.get_raw_token(header)
+    if raw_token is None:
+        raise NotAuthenticated()
+    # Signature and expiry checks are pure CPU
+    token = authenticator.get_validated_token(raw_token)
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise AuthenticationFailed('Token contained no recognizable user identification')
+    user = await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed('User not found')
+    return user
+
+
+def async_api_view(methods):
+    """
+    Async stand-in for ``@api_view`` + ``IsAuthenticated``: method check, JWT auth, DRF error bodies
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                user = await _authenticate(request)
+                drf_request = Request(
+                    request,
+                    parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                    authenticators=(),
+                )
+                drf_request.user = user
+                return await view(drf_request, *args, **kwargs)
+            except APIException as exc:
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                headers = None
+                if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                    headers = {'WWW-Authenticate': JWTAuthentication().authenticate_header(request)}
+                return _json_response(detail, exc.status_code, headers)
+
+        # csrf_exempt() wraps views in a sync function in Django 4.2; the attribute is all it sets
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+@async_api_view(['POST'])
+async def analyze_career_recommendations_async(request):
+    """Async variant of analyze_career_recommendations"""
+    user = request.user
+    if not await Answer.objects.for_user(user.pk).aexists():
+        logger.info("Analysis requested without quiz answers", extra={'user_id': user.pk})
+        return _json_response({
+            'error': 'No quiz responses found. Please complete the quiz first.'
+        }, status.HTTP_400_BAD_REQUEST)
+
+    recommendations = await CareerAnalyzer().aanalyze_user_responses(user, scoring_executor)
+    logger.info("Analysis complete", extra={'user_id': user.pk, 'recommendations': len(recommendations)})
+    return _json_response(format_recommendations(recommendations))
+
+
+@async_api_view(['GET'])
+async def get_user_recommendations_async(request):
+    """Async variant of get_user_recommendations"""
+    recommendations, paginator, fields = _user_recommendations(request, request.user)
+    page = await paginator.apaginate_queryset(recommendations, request)
+    if page is None:
+        page = [recommendation async for recommendation in recommendations.order_by('-match_score')[:5]]
+    return _json_response(_recommendations_data(request, page, paginator, fields))
+
+
+@async_api_view(['POST'])
+async def submit_quiz_answers_async(request):
+    """Async variant of submit_quiz_answers"""
+    user = request.user
+    pending, errors = _check_answer_items(request.data.get('answers', []))
+    questions = await sync_to_async(_answered_questions)(user, pending)
+    valid = _valid_answers(pending, questions, errors)
+    created_answers = await sync_to_async(_save_answers)(user, questions, valid) if valid else []
+
+    return _json_response({
+        'created_answers': created_answers,
+        'errors': errors,
+        'total_submitted': len(created_answers)
+    })
+
+
+async def _streamed(lines, batch_size=500):
+    """
+    Feed a sync line generator to an async response a batch at a time
+
+    Django would otherwise read a sync iterator into a list before sending it.
+    Every batch runs in the same thread, which keeps the database cursor usable.
+    """
+    next_batch = sync_to_async(lambda: list(islice(lines, batch_size)))
+    while True:
+        batch = await next_batch()
+        if not batch:
+            return
+        yield ''.join(batch)
+
+
+async def _export(request, kind):
+    if not request.user.is_staff:
+        raise PermissionDenied()
+    lines, export_format = await sync_to_async(_export_lines)(request, kind)
+    return _export_response(_streamed(lines), kind, export_format)
+
+
+@async_api_view(['GET'])
+async def export_answers_async(request):
+    """Async variant of export_answers"""
+    return await _export(request, 'answers')
+
+
+@async_api_view(['GET'])
+async def export_recommendations_async(request):
+    """Async variant of export_recommendations"""
+    return await _export(request, 'recommendations')
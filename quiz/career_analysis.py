@@ -1,238 +1,403 @@
+from asgiref.sync import sync_to_async
+from career_advisor import metrics
+from career_advisor.sharding import user_db, users_by_db
+from collections import Counter
+from concurrent.futures import Executor
 from django.contrib.auth import get_user_model
-from .models import Answer, Career, CareerRecommendation
-import re
-from typing import List, Dict, Tuple
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import Career, CareerRecommendation, QuestionCareerMatch, UserScoreState
+from .catalog import aget_catalog_version, get_career_catalog, get_question_bank
+from .profile_vector import load_profile_vector, profile_answers
+from .result_cache import analysis_results, answer_fingerprint
+from .rollups import apply_top_career_changes, top_career_deltas, top_career_ids
+from .score_state import accumulators, load_score_state
+from .scoring import CHOICE_WEIGHTS, RankedCareer, get_match_matrix
+from typing import List, Dict, NamedTuple, Optional, Tuple
 
 User = get_user_model()
 
+ANALYZER_PHASE_SECONDS = metrics.histogram(
+    'quiz_analyzer_phase_duration_seconds', 'CareerAnalyzer time per phase (load, score, sort, save)', ['phase']
+)
+ANALYSES = metrics.counter(
+    'quiz_analyses_total', 'Career analyses, scored or answered from the memoized result', ['result']
+)
+
+class PreparedAnswer(NamedTuple):
+    question_id: int
+    choice: str
+
+class UserAnswerSet:
+    """
+    A user's answers loaded once, partitioned by category
+    """
+    
+    def __init__(self, rows):
+        self.by_category = {'interest': [], 'degree': [], 'career': []}
+        for question_id, category, choice in rows:
+            self.by_category.setdefault(category, []).append(PreparedAnswer(question_id, choice))
+    
+    @classmethod
+    def for_user(cls, user: User) -> 'UserAnswerSet':
+        """
+        Load all answers of a user from their profile vector, one primary-key lookup
+        """
+        bank = get_question_bank()
+        return cls(profile_answers(load_profile_vector(user.pk, bank), bank))
+    
+    def __bool__(self):
+        return any(self.by_category.values())
+    
+    def choices(self) -> List[Tuple[int, str]]:
+        """
+        (question_id, choice) pairs across all categories
+        """
+        return [(answer.question_id, answer.choice) for answers in self.by_category.values() for answer in answers]
+
+def format_recommendations(recommendations: List[Dict]) -> Dict:
+    """
+    Response body of the analyze endpoint for ``analyze_user_responses`` output
+    """
+    formatted_recommendations = []
+    for rec in recommendations:
+        career = rec['career']
+        formatted_recommendations.append({
+            'id': career.id,
+            'name': career.name,
+            'category': career.category,
+            'description': career.description,
+            'match_score': round(rec['score'], 1),
+            'reasoning': rec['reasoning'],
+            'required_skills': career.required_skills,
+            'salary_range': career.salary_range,
+            'growth_prospects': career.growth_prospects,
+            'work_environment': career.work_environment
+        })
+    return {
+        'recommendations': formatted_recommendations,
+        'total_analyzed': len(recommendations)
+    }
+
 class CareerAnalyzer:
     """
     Analyzes user quiz responses and provides personalized career recommendations
     """
     
     def __init__(self):
-        self.choice_weights = {
-            'strongly_dislike': -2,
-            'dislike': -1,
-            'neutral': 0,
-            'like': 1,
-            'strongly_like': 2
-        }
+        self.choice_weights = dict(CHOICE_WEIGHTS)
     
     def analyze_user_responses(self, user: User) -> List[Dict]:
         """
         Analyze user's quiz responses and return career recommendations
         """
-        # Get all user answers
-        user_answers = Answer.objects.filter(user=user)
+        state = None
+        fingerprint = None
+        if self.choice_weights == CHOICE_WEIGHTS:
+            with ANALYZER_PHASE_SECONDS.time(phase='load'):
+                state = load_score_state(user.pk)
+            fingerprint = self._fingerprint(state)
+            cached = fingerprint and analysis_results.get(user.pk, fingerprint)
+            if cached is not None:
+                ANALYSES.inc(result='memoized')
+                # Same answers and catalog as last time; the saved rows may still be another
+                # worker's or an earlier answer set's unless they carry this fingerprint
+                if state.saved_fingerprint != fingerprint:
+                    with ANALYZER_PHASE_SECONDS.time(phase='save'):
+                        self._save_recommendations(user, cached, fingerprint)
+                return cached[:5]
+        
+        career_scores = self.score_user(user, state)
+        if career_scores is None:
+            return []
         
-        if not user_answers.exists():
+        # Save recommendations to database
+        with ANALYZER_PHASE_SECONDS.time(phase='save'):
+            self._save_recommendations(user, career_scores[:10], fingerprint)  # Top 10
+        
+        ANALYSES.inc(result='scored')
+        if fingerprint:
+            analysis_results.put(user.pk, fingerprint, career_scores[:10])
+        return career_scores[:5]  # Return top 5 for display
+    
+    async def aanalyze_user_responses(self, user: User, executor: Optional[Executor] = None) -> List[Dict]:
+        """
+        Async form of ``analyze_user_responses``: reads are awaited and scoring runs on ``executor``
+        """
+        state = None
+        fingerprint = None
+        if self.choice_weights == CHOICE_WEIGHTS:
+            with ANALYZER_PHASE_SECONDS.time(phase='load'):
+                state = await UserScoreState.objects.for_user(user.pk).afirst()
+            if state is not None and state.catalog_version == await aget_catalog_version():
+                fingerprint = self._fingerprint(state)
+                cached = fingerprint and analysis_results.get(user.pk, fingerprint)
+                if cached is not None:
+                    ANALYSES.inc(result='memoized')
+                    if state.saved_fingerprint != fingerprint:
+                        with ANALYZER_PHASE_SECONDS.time(phase='save'):
+                            await sync_to_async(self._save_recommendations)(user, cached, fingerprint)
+                    return cached[:5]
+        career_scores = await sync_to_async(
+            self._score_user_in_worker, thread_sensitive=False, executor=executor
+        )(user, state)
+        if career_scores is None:
             return []
         
-        # Get all careers
-        careers = Career.objects.all()
+        # Transactions are sync-only, so the save runs on the shared sync thread
+        with ANALYZER_PHASE_SECONDS.time(phase='save'):
+            await sync_to_async(self._save_recommendations)(user, career_scores[:10], fingerprint)
+        
+        ANALYSES.inc(result='scored')
+        if fingerprint:
+            analysis_results.put(user.pk, fingerprint, career_scores[:10])
+        return career_scores[:5]
+    
+    def _fingerprint(self, state: UserScoreState) -> Optional[str]:
+        """
+        Memoization key for a current score state; None when there is nothing to score
+        """
+        if not state.answer_choices:
+            return None
+        return answer_fingerprint(state.answer_choices, state.catalog_version)
+    
+    def score_user(self, user: User, state: Optional[UserScoreState] = None) -> Optional[List[Dict]]:
+        """
+        Rank careers for a user without saving anything; None when they have no answers
+        
+        ``state`` is a score state the caller already fetched, used if still current.
+        """
+        matrix = get_match_matrix()
+        
+        if self.choice_weights == CHOICE_WEIGHTS:
+            # Accumulators kept current on every answer write; only normalize and sort here
+            if state is None or state.catalog_version != matrix.version:
+                with ANALYZER_PHASE_SECONDS.time(phase='load'):
+                    state = load_score_state(user.pk, matrix)
+            if not state.answer_choices:
+                return None
+            with ANALYZER_PHASE_SECONDS.time(phase='score'):
+                scores, category_scores = matrix.normalize(*accumulators(state, matrix))
+        else:
+            # Custom weights: score all user answers against the cached question x career matrix
+            with ANALYZER_PHASE_SECONDS.time(phase='load'):
+                user_answers = UserAnswerSet.for_user(user)
+            if not user_answers:
+                return None
+            with ANALYZER_PHASE_SECONDS.time(phase='score'):
+                scores, category_scores = matrix.score(user_answers.choices(), self.choice_weights)
+        
+        with ANALYZER_PHASE_SECONDS.time(phase='sort'):
+            ranked = matrix.rank_scores(scores, category_scores, limit=10)
+            career_scores = self._build_career_scores(ranked)
+            
+            # Ensure we have at least some recommendations
+            if not career_scores:
+                career_scores = self._fallback_career_scores()
+        return career_scores
+    
+    def _score_user_in_worker(self, user: User, state: Optional[UserScoreState]) -> Optional[List[Dict]]:
+        # Executor threads outlive requests, so manage their connections like a request would
+        close_old_connections()
+        try:
+            return self.score_user(user, state)
+        finally:
+            close_old_connections()
+    
+    def _fallback_career_scores(self) -> List[Dict]:
+        """
+        If no good matches, return top careers with basic reasoning
+        """
+        top_careers = get_career_catalog().ordered[:5]
+        fallback_recommendations = []
+        for career in top_careers:
+            fallback_recommendations.append({
+                'career': career,
+                'score': 15.0,  # Base score
+                'reasoning': f"General career option based on your responses; {career.description[:100]}..."
+            })
+        return fallback_recommendations
+    
+    def _build_career_scores(self, ranked: List[RankedCareer], careers: Dict[int, Career] = None) -> List[Dict]:
+        """
+        Attach Career rows and reasoning to ranked matrix results
+        """
+        if careers is None:
+            careers = get_career_catalog().careers
         
-        # Calculate scores for each career
         career_scores = []
-        for career in careers:
-            score, reasoning = self._calculate_career_score(user_answers, career)
-            # Include all careers, even with low scores, to provide comprehensive recommendations
+        for item in ranked:
+            career = careers.get(item.career_id)
+            if career is None:
+                continue  # Deleted since the matrix was built
             career_scores.append({
                 'career': career,
-                'score': score,
-                'reasoning': reasoning
+                'score': item.score,
+                'reasoning': self._build_reasoning(*item.category_scores)
             })
-        
-        # Sort by score (highest first)
-        career_scores.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Ensure we have at least some recommendations
-        if not career_scores or all(score['score'] < 10 for score in career_scores):
-            # If no good matches, return top careers with basic reasoning
-            top_careers = Career.objects.all()[:5]
-            fallback_recommendations = []
-            for career in top_careers:
-                fallback_recommendations.append({
-                    'career': career,
-                    'score': 15.0,  # Base score
-                    'reasoning': f"General career option based on your responses; {career.description[:100]}..."
-                })
-            career_scores = fallback_recommendations
-        
-        # Save recommendations to database
-        self._save_recommendations(user, career_scores[:10])  # Top 10
-        
-        return career_scores[:5]  # Return top 5 for display
+        return career_scores
     
-    def _calculate_career_score(self, user_answers: List[Answer], career: Career) -> Tuple[float, str]:
+    def _build_reasoning(self, interest_score: float, degree_score: float, career_score: float) -> str:
         """
-        Calculate match score for a specific career based on user answers
+        Describe the per-category scores behind a career match
         """
-        total_score = 0
         reasoning_parts = []
         
-        # Analyze interest-based answers
-        interest_score = self._analyze_interest_answers(user_answers, career)
-        total_score += interest_score * 0.4  # 40% weight
         if interest_score > 0:
             reasoning_parts.append(f"Interest alignment ({interest_score:.1f}/10)")
         else:
             reasoning_parts.append("Limited interest data")
         
-        # Analyze degree-based answers
-        degree_score = self._analyze_degree_answers(user_answers, career)
-        total_score += degree_score * 0.3  # 30% weight
         if degree_score > 0:
             reasoning_parts.append(f"Educational path match ({degree_score:.1f}/10)")
         else:
             reasoning_parts.append("No specific degree preference")
         
-        # Analyze career-specific answers
-        career_score = self._analyze_career_answers(user_answers, career)
-        total_score += career_score * 0.3  # 30% weight
         if career_score > 0:
             reasoning_parts.append(f"Career preference match ({career_score:.1f}/10)")
         else:
             reasoning_parts.append("No direct career mention")
         
-        # Convert to percentage (0-100), but ensure minimum score of 10%
-        final_score = min(100, max(10, (total_score / 10) * 100))
-        
-        reasoning = "; ".join(reasoning_parts) if reasoning_parts else "Limited data available"
-        
-        return final_score, reasoning
+        return "; ".join(reasoning_parts) if reasoning_parts else "Limited data available"
     
-    def _analyze_interest_answers(self, user_answers: List[Answer], career: Career) -> float:
+    def _save_recommendations(self, user: User, career_scores: List[Dict], fingerprint: Optional[str] = None) -> bool:
         """
-        Analyze interest-based answers against career keywords
-        """
-        interest_answers = [a for a in user_answers if a.question.category == 'interest']
-        if not interest_answers:
-            return 0
-        
-        total_score = 0
-        matched_answers = 0
+        Save career recommendations to database by diffing against the stored rows
         
-        for answer in interest_answers:
-            question_text = answer.question.text.lower()
-            choice_weight = self.choice_weights[answer.choice]
-            
-            # Check if question text contains career-related keywords
-            for keyword in career.interest_keywords:
-                if keyword.lower() in question_text:
-                    total_score += choice_weight
-                    matched_answers += 1
-                    break
-        
-        if matched_answers == 0:
-            # Give a small base score even if no keywords match
-            return 1.0
-        
-        # Normalize to 0-10 scale, but ensure minimum score
-        normalized_score = max(0, (total_score / matched_answers + 2) * 2.5)
-        return max(1.0, normalized_score)  # Minimum score of 1.0
-    
-    def _analyze_degree_answers(self, user_answers: List[Answer], career: Career) -> float:
-        """
-        Analyze degree-based answers against career degree requirements
+        Only rows whose score or reasoning changed are updated, and only they get a
+        new ``created_at``: it tells when that recommendation was last scored
+        differently. ``fingerprint`` is the score state the rows were scored from,
+        recorded on it so a memoized result elsewhere knows whether they are its own.
+        Returns whether any recommendation was written.
         """
-        degree_answers = [a for a in user_answers if a.question.category == 'degree']
-        if not degree_answers:
-            return 0
+        new_scores = {item['career'].id: item for item in career_scores}
+        now = timezone.now()
         
-        total_score = 0
-        matched_answers = 0
+        fingerprint = fingerprint or ''
         
-        for answer in degree_answers:
-            question_text = answer.question.text.lower()
-            choice_weight = self.choice_weights[answer.choice]
+        with transaction.atomic(using=user_db(user.pk)):
+            saved_fingerprint = (
+                UserScoreState.objects.for_user(user.pk).select_for_update()
+                .values_list('saved_fingerprint', flat=True).first()
+            )
+            existing = {
+                recommendation.career_id: recommendation
+                for recommendation in CareerRecommendation.objects.for_user(user.pk).select_for_update()
+            }
+            previous_top = top_career_ids(
+                (career_id, recommendation.match_score) for career_id, recommendation in existing.items()
+            )
             
-            # Check if question text contains career-related degree keywords
-            for degree in career.degree_requirements:
-                if degree.lower() in question_text:
-                    total_score += choice_weight
-                    matched_answers += 1
-                    break
-        
-        if matched_answers == 0:
-            # Give a small base score even if no degree matches
-            return 1.0
-        
-        # Normalize to 0-10 scale, but ensure minimum score
-        normalized_score = max(0, (total_score / matched_answers + 2) * 2.5)
-        return max(1.0, normalized_score)  # Minimum score of 1.0
+            dropped = [career_id for career_id in existing if career_id not in new_scores]
+            changed = []
+            for career_id, recommendation in existing.items():
+                item = new_scores.get(career_id)
+                if item is None:
+                    continue
+                if recommendation.match_score != item['score'] or recommendation.reasoning != item['reasoning']:
+                    recommendation.match_score = item['score']
+                    recommendation.reasoning = item['reasoning']
+                    recommendation.created_at = now
+                    changed.append(recommendation)
+            added = [
+                CareerRecommendation(
+                    user=user,
+                    career=item['career'],
+                    match_score=item['score'],
+                    reasoning=item['reasoning'],
+                    created_at=now
+                )
+                for career_id, item in new_scores.items() if career_id not in existing
+            ]
+            
+            written = bool(dropped or added or changed)
+            if written:
+                # Only rows that fell out of the top list are deleted
+                if dropped:
+                    CareerRecommendation.objects.for_user(user.pk).filter(career_id__in=dropped).delete()
+                if changed:
+                    CareerRecommendation.objects.shard(user.pk).bulk_update(changed, ['match_score', 'reasoning', 'created_at'])
+                if added:
+                    # A concurrent analysis may have inserted the same rows since we read them
+                    CareerRecommendation.objects.shard(user.pk).bulk_create(
+                        added,
+                        update_conflicts=True,
+                        unique_fields=['user', 'career'],
+                        update_fields=['match_score', 'reasoning', 'created_at']
+                    )
+                current_top = top_career_ids((career_id, item['score']) for career_id, item in new_scores.items())
+                apply_top_career_changes(top_career_deltas(previous_top, current_top), using=user_db(user.pk))
+            # Last, since deleting the dropped rows clears it
+            if saved_fingerprint is not None and (dropped or saved_fingerprint != fingerprint):
+                UserScoreState.objects.for_user(user.pk).update(saved_fingerprint=fingerprint)
+        return written
     
-    def _analyze_career_answers(self, user_answers: List[Answer], career: Career) -> float:
-        """
-        Analyze career-specific answers
+    def _save_recommendations_bulk(self, career_scores_by_user: Dict[int, List[Dict]]) -> int:
         """
-        career_answers = [a for a in user_answers if a.question.category == 'career']
-        if not career_answers:
-            return 0
+        Save recommendations for many users with one upsert and one cleanup delete per database
         
-        total_score = 0
-        matched_answers = 0
-        
-        for answer in career_answers:
-            question_text = answer.question.text.lower()
-            choice_weight = self.choice_weights[answer.choice]
+        Returns the number of rows written.
+        """
+        now = timezone.now()
+        written = 0
+        for db, user_ids in users_by_db(career_scores_by_user).items():
+            rows = [
+                CareerRecommendation(
+                    user_id=user_id,
+                    career=item['career'],
+                    match_score=item['score'],
+                    reasoning=item['reasoning'],
+                    created_at=now
+                )
+                for user_id in user_ids
+                for item in career_scores_by_user[user_id]
+            ]
             
-            # Check if question text mentions this career or related terms
-            career_name_lower = career.name.lower()
-            if career_name_lower in question_text:
-                total_score += choice_weight
-                matched_answers += 1
-            else:
-                # Check for related terms
-                for skill in career.required_skills:
-                    if skill.lower() in question_text:
-                        total_score += choice_weight * 0.5  # Half weight for related skills
-                        matched_answers += 1
-                        break
-        
-        if matched_answers == 0:
-            # Give a small base score even if no career matches
-            return 1.0
-        
-        # Normalize to 0-10 scale, but ensure minimum score
-        normalized_score = max(0, (total_score / matched_answers + 2) * 2.5)
-        return max(1.0, normalized_score)  # Minimum score of 1.0
-    
-    def _save_recommendations(self, user: User, career_scores: List[Dict]):
-        """
-        Save career recommendations to database
-        """
-        # Clear existing recommendations for this user
-        CareerRecommendation.objects.filter(user=user).delete()
-        
-        # Save new recommendations
-        for item in career_scores:
-            CareerRecommendation.objects.create(
-                user=user,
-                career=item['career'],
-                match_score=item['score'],
-                reasoning=item['reasoning']
-            )
+            with transaction.atomic(using=db):
+                # The rows being replaced, for the top career counts
+                previous_scores = {user_id: [] for user_id in user_ids}
+                for user_id, career_id, score in CareerRecommendation.objects.using(db).filter(
+                    user_id__in=user_ids
+                ).values_list('user_id', 'career_id', 'match_score'):
+                    previous_scores[user_id].append((career_id, score))
+                top_deltas = Counter()
+                for user_id in user_ids:
+                    top_career_deltas(
+                        top_career_ids(previous_scores[user_id]),
+                        top_career_ids((item['career'].id, item['score']) for item in career_scores_by_user[user_id]),
+                        top_deltas,
+                    )
+                CareerRecommendation.objects.using(db).bulk_create(
+                    rows,
+                    batch_size=1000,
+                    update_conflicts=True,
+                    unique_fields=['user', 'career'],
+                    update_fields=['match_score', 'reasoning', 'created_at']
+                )
+                # Every current row now carries this run's timestamp; anything older dropped out
+                CareerRecommendation.objects.using(db).filter(user_id__in=user_ids, created_at__lt=now).delete()
+                # Scored from the answers rather than a score state: no memoized result may skip its save
+                UserScoreState.objects.using(db).filter(user_id__in=user_ids).exclude(
+                    saved_fingerprint=''
+                ).update(saved_fingerprint='')
+                apply_top_career_changes(top_deltas, using=db)
+            written += len(rows)
+        return written
     
     def get_user_disliked_careers(self, user: User) -> List[str]:
         """
         Get list of careers user has strongly disliked
         """
-        disliked_careers = []
-        
-        # Check career-specific answers for strong dislikes
-        career_answers = Answer.objects.filter(
-            user=user,
-            question__category='career',
-            choice__in=['strongly_dislike', 'dislike']
-        )
+        # Career names only match career questions; the profile vector has the user's choices
+        bank = get_question_bank()
+        disliked_questions = [
+            question_id
+            for question_id, category, choice in profile_answers(load_profile_vector(user.pk, bank), bank)
+            if category == 'career' and choice in ('strongly_dislike', 'dislike')
+        ]
+        disliked_careers = QuestionCareerMatch.objects.filter(
+            match_kind='career_name',
+            question_id__in=disliked_questions
+        ).values_list('career__name', flat=True).distinct()
         
-        for answer in career_answers:
-            question_text = answer.question.text.lower()
-            # Extract career names from question text
-            for career in Career.objects.all():
-                if career.name.lower() in question_text:
-                    disliked_careers.append(career.name)
-        
-        return list(set(disliked_careers))  # Remove duplicates
-
+        return list(disliked_careers)
@@ -0,0 +1,260 @@
+import gzip
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from career_advisor.db_routing import primary_reads
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+CATALOG_VERSION_ID = 1  # Primary key of the one CatalogVersion row
+
+_version_row = None  # (time.monotonic() it expires at, (version, changed_at)) last read by this process
+_local = threading.local()  # .uncommitted: this thread's open transaction wrote the version row
+
+
+def _version_ttl() -> float:
+    return getattr(settings, 'QUIZ_CATALOG_VERSION_TTL', 1.0)
+
+
+def _version_db() -> str:
+    from .models import CatalogVersion
+
+    return router.db_for_write(CatalogVersion)
+
+
+def _wrote_version() -> None:
+    # Until the write commits, only this thread may see the version it wrote
+    _local.uncommitted = True
+    forget_catalog_version()
+    transaction.on_commit(_committed_version, using=_version_db())
+
+
+def _committed_version() -> None:
+    _local.uncommitted = False
+    forget_catalog_version()
+
+
+def _has_uncommitted_version() -> bool:
+    if not getattr(_local, 'uncommitted', False):
+        return False
+    if connections[_version_db()].in_atomic_block:
+        return True
+    _local.uncommitted = False  # Rolled back
+    return False
+
+
+def _read_catalog_version_row() -> Tuple[int, datetime]:
+    # Models are imported here so worker processes can unpickle a matrix without Django set up
+    from .models import CatalogVersion
+
+    # Always the primary: stored score states and vectors are compared against this version
+    with primary_reads():
+        row = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', 'changed_at').first()
+    if row is None:
+        # Normally created by the migration; a flushed table gets a fresh, clock-seeded row
+        catalog_version, created = CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID)
+        if created:
+            _wrote_version()
+        row = (catalog_version.version, catalog_version.changed_at)
+    return row
+
+
+def _catalog_version_row() -> Tuple[int, datetime]:
+    global _version_row
+
+    if _has_uncommitted_version():
+        return _read_catalog_version_row()
+    # Trusted for QUIZ_CATALOG_VERSION_TTL seconds, so warm catalog reads touch no database at all;
+    # other processes see a catalog change that much later
+    now = time.monotonic()
+    cached = _version_row
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    row = _read_catalog_version_row()
+    if not _has_uncommitted_version():
+        _version_row = (now + _version_ttl(), row)
+    return row
+
+
+def forget_catalog_version() -> None:
+    """
+    Read the catalog version from the database again on next use, e.g. after the database was flushed
+    """
+    global _version_row
+    _version_row = None
+
+
+def get_catalog_version() -> int:
+    """
+    Return the current version of the question/career catalog, shared by every process through the database
+    """
+    return _catalog_version_row()[0]
+
+
+async def aget_catalog_version() -> int:
+    """
+    Async form of ``get_catalog_version``
+    """
+    return await sync_to_async(get_catalog_version)()
+
+
+def get_catalog_changed_at() -> datetime:
+    """
+    Return when the catalog last changed
+    """
+    return _catalog_version_row()[1]
+
+
+def bump_catalog_version() -> None:
+    """
+    Invalidate everything derived from the catalog, in every process, as part of the current transaction
+
+    This process sees the new version once the transaction commits, others within ``QUIZ_CATALOG_VERSION_TTL``.
+    """
+    from .models import CatalogVersion
+
+    # Committed (or rolled back) together with the catalog change itself
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(
+        version=F('version') + 1, changed_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID)
+    _wrote_version()
+
+
+class VersionedCache:
+    """
+    A process-local value built by ``build(version)`` and rebuilt whenever the shared catalog version changes
+    """
+
+    def __init__(self, build: Callable):
+        self._build = build
+        self._lock = threading.Lock()
+        self._entry = None  # (version, value)
+
+    def get(self):
+        version = get_catalog_version()
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        with self._lock:
+            if self._entry is None or self._entry[0] != version:
+                # A lagging replica could still hold the previous catalog, which would then be cached as this version
+                with primary_reads():
+                    self._entry = (version, self._build(version))
+            return self._entry[1]
+
+    def reset(self) -> None:
+        self._entry = None
+
+
+class CareerCatalog:
+    """
+    Every career, decoded and pre-rendered, for one catalog version
+
+    ``careers`` maps ids to read-only Career instances in catalog order and
+    ``json_body``/``gzip_body`` are the ready-to-send /api/quiz/careers/ payloads.
+    """
+
+    def __init__(self, version, careers: List, records: List[Dict], json_body: bytes, last_modified: datetime):
+        self.version = version
+        self.careers = {career.id: career for career in careers}
+        self.ordered = careers
+        self.records = records
+        self.json_body = json_body
+        self.gzip_body = gzip.compress(json_body, mtime=0)
+        # Weak: the same entity is served both plain and gzip-encoded
+        self.etag = f'W/"{hashlib.sha1(json_body).hexdigest()}"'
+        self.last_modified = last_modified
+
+    @classmethod
+    def build(cls, version=None) -> 'CareerCatalog':
+        from rest_framework.renderers import JSONRenderer
+
+        from .models import Career
+        from .serializers import CareerSerializer
+
+        last_modified = get_catalog_changed_at()
+        careers = list(Career.objects.all())
+        records = CareerSerializer(careers, many=True).data
+        json_body = JSONRenderer().render({'careers': records})
+        return cls(version, careers, records, json_body, last_modified)
+
+
+_career_catalog = VersionedCache(CareerCatalog.build)
+
+
+def get_career_catalog() -> CareerCatalog:
+    """
+    Return the process-wide career catalog for the current catalog version
+    """
+    return _career_catalog.get()
+
+
+def reset_career_catalog() -> None:
+    _career_catalog.reset()
+
+
+class QuestionBank:
+    """
+    Every question pre-serialized for one catalog version, with seeded per-client orderings
+    """
+
+    def __init__(self, version, records: List[Dict]):
+        self.version = version
+        self.records = records
+        self.by_category = {}
+        self.texts = {}
+        for record in records:
+            self.by_category.setdefault(record['category'], []).append(record)
+            self.texts[record['id']] = record['text']
+        # Profile vector slots: one per question in catalog order, named by a hash of that order
+        # so career-only catalog changes keep stored vectors valid
+        self.slot_ids = [record['id'] for record in records]
+        self.slot_categories = [record['category'] for record in records]
+        self.slots = {question_id: slot for slot, question_id in enumerate(self.slot_ids)}
+        self.layout = hashlib.sha1(
+            ','.join(f'{question_id}:{category}' for question_id, category in zip(self.slot_ids, self.slot_categories)).encode()
+        ).hexdigest()
+
+    @classmethod
+    def build(cls, version=None) -> 'QuestionBank':
+        from .models import Question
+        from .serializers import QuestionSerializer
+
+        return cls(version, QuestionSerializer(Question.objects.all(), many=True).data)
+
+    def shuffled(self, category: Optional[str] = None, seed: Optional[str] = None) -> List[Dict]:
+        """
+        Questions (optionally of one category) in an order fixed by ``seed``; random without one
+        """
+        records = list(self.records if category is None else self.by_category.get(category, []))
+        # String seeds hash the same way in every process, so each worker agrees on the order
+        rng = random.Random(f'{seed}:{category or "all"}') if seed is not None else random
+        rng.shuffle(records)
+        return records
+
+
+_question_bank = VersionedCache(QuestionBank.build)
+
+
+def get_question_bank() -> QuestionBank:
+    """
+    Return the process-wide question bank for the current catalog version
+    """
+    return _question_bank.get()
+
+
+def refresh_question_bank() -> QuestionBank:
+    """
+    Rebuild the question bank from the database now, for questions written without a version bump
+    """
+    _question_bank.reset()
+    return _question_bank.get()
@@ -0,0 +1,110 @@
+"""
+Streaming exports of answers and recommendations for analytics
+
+Rows are read with ``iterator(chunk_size=...)`` (server-side cursors on
+PostgreSQL) one shard after another and encoded line by line, so memory use
+does not grow with the export. The staff views and the ``export_data``
+command share ``export_lines``.
+"""
+import csv
+from datetime import datetime, time as datetime_time, timedelta
+from typing import Iterator, List, Optional
+
+from career_advisor.sharding import is_sharded, shard_aliases
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Answer, Career, CareerRecommendation, Question
+
+EXPORT_COLUMNS = {
+    'answers': ['id', 'user_id', 'question_id', 'category', 'choice', 'created_at'],
+    'recommendations': ['id', 'user_id', 'career_id', 'match_score', 'reasoning', 'created_at'],
+}
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_time_bound(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 date or datetime; a date as ``end`` bound covers that whole day
+
+    Raises ``ValueError`` for anything else.
+    """
+    if not value:
+        return None
+    # Dates first: parse_datetime() also accepts a bare date, as midnight
+    date = parse_date(value)
+    if date is not None:
+        moment = datetime.combine(date + timedelta(days=1) if end else date, datetime_time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Invalid date or datetime: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _export_tables(kind: str, since=None, until=None, category=None) -> List:
+    model = Answer if kind == 'answers' else CareerRecommendation
+    tables = model.objects.on_every_shard()
+    filters = {}
+    if since is not None:
+        filters['created_at__gte'] = since
+    if until is not None:
+        filters['created_at__lt'] = until
+    if category and kind == 'answers':
+        if category not in dict(Question.CATEGORY_CHOICES):
+            raise ValueError(f'Unknown question category: {category}')
+        filters['category'] = category
+    elif category:
+        # Recommendations filter on their career's category; careers stay in the default database
+        career_ids = Career.objects.filter(category=category).values('id')
+        if shard_aliases() and is_sharded(model):
+            career_ids = list(career_ids.values_list('id', flat=True))
+        filters['career_id__in'] = career_ids
+    # Primary key order walks the table without a sort
+    return [table.filter(**filters).order_by('pk') for table in tables]
+
+
+def _csv_lines(columns, rows) -> Iterator[str]:
+    line = _LineBuffer()
+    writer = csv.writer(line)
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(columns, rows) -> Iterator[str]:
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+class _LineBuffer:
+    """A file-like object whose write() hands back the line csv.writer wrote"""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(kind: str, export_format: str = 'ndjson', since=None, until=None, category=None,
+                 chunk_size: int = 2000) -> Iterator[str]:
+    """
+    Yield the encoded lines of an export, including the CSV header
+
+    Filters are validated before the first line, so a ``ValueError`` surfaces
+    when this is called rather than halfway through a response.
+    """
+    columns = EXPORT_COLUMNS[kind]
+    tables = _export_tables(kind, since, until, category)
+    rows = (
+        row
+        for table in tables
+        for row in table.values_list(*columns).iterator(chunk_size=chunk_size)
+    )
+    encode = _csv_lines if export_format == 'csv' else _ndjson_lines
+    return encode(columns, rows)
@@ -0,0 +1,73 @@
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from .career_analysis import CareerAnalyzer, format_recommendations
+from .models import AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_analysis(user) -> AnalysisJob:
+    """
+    Return the user's pending analysis job, creating one if none is waiting
+    """
+    # The partial unique constraint makes a racing insert fail, and get_or_create then returns the winner
+    job, _ = AnalysisJob.objects.get_or_create(user=user, status='pending')
+    return job
+
+
+def claim_analysis_job() -> Optional[AnalysisJob]:
+    """
+    Mark the oldest pending job as running and return it, or None when the queue is empty
+    """
+    while True:
+        with transaction.atomic():
+            # skip_locked lets concurrent workers pass over each other's candidates
+            job = (
+                AnalysisJob.objects.select_for_update(skip_locked=True)
+                .filter(status='pending')
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            # Backends without row locks (SQLite) can hand two workers the same row; only one update wins
+            started_at = timezone.now()
+            claimed = AnalysisJob.objects.filter(pk=job.pk, status='pending').update(
+                status='running', started_at=started_at
+            )
+        if claimed:
+            job.status = 'running'
+            job.started_at = started_at
+            return job
+
+
+def run_analysis_job(job: AnalysisJob) -> AnalysisJob:
+    """
+    Analyze the job's user and store the analyze endpoint's response body on the job
+    """
+    try:
+        recommendations = CareerAnalyzer().analyze_user_responses(job.user)
+    except Exception as e:
+        logger.exception("Analysis job failed", extra={'job_id': job.id, 'user_id': job.user_id})
+        job.status = 'failed'
+        job.error = f"{type(e).__name__}: {e}"
+    else:
+        job.status = 'done'
+        job.result = format_recommendations(recommendations)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+def fail_stale_jobs(timeout: timedelta) -> int:
+    """
+    Fail running jobs whose worker has not finished them within ``timeout``
+    """
+    return AnalysisJob.objects.filter(status='running', started_at__lt=timezone.now() - timeout).update(
+        status='failed', error='Worker stopped before finishing', finished_at=timezone.now()
+    )
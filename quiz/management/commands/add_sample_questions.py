@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from quiz.models import Question
+from quiz.models import Question, question_content_hash
 
 class Command(BaseCommand):
     help = 'Add sample questions for career advisor quiz'
@@ -143,8 +143,8 @@ class Command(BaseCommand):
         created_count = 0
         for question_data in all_questions:
             question, created = Question.objects.get_or_create(
-                text=question_data['text'],
-                defaults={'category': question_data['category']}
+                content_hash=question_content_hash(question_data['text']),
+                defaults={'text': question_data['text'], 'category': question_data['category']}
             )
             if created:
                 created_count += 1
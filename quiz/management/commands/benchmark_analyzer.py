@@ -0,0 +1,213 @@
+import gc
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from itertools import product
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.utils import timezone
+from quiz.career_analysis import CareerAnalyzer
+from quiz.catalog import bump_catalog_version
+from quiz.match_index import rebuild_all_matches
+from quiz.models import Question, Answer, Career, CareerRecommendation
+from quiz.result_cache import analysis_results
+
+User = get_user_model()
+
+CATEGORIES = ['interest', 'degree', 'career']
+CHOICES = [choice for choice, _ in Answer.CHOICE_CHOICES]
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CareerAnalyzer on synthetic catalogs in a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--careers', type=_int_list, default=[100, 1000],
+                            help='Comma-separated catalog sizes (default: 100,1000)')
+        parser.add_argument('--keywords', type=_int_list, default=[5, 20],
+                            help='Comma-separated keywords per career and list (default: 5,20)')
+        parser.add_argument('--answers', type=_int_list, default=[30],
+                            help='Comma-separated answer counts, one question per answer (default: 30)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per benchmark; the median is compared (default: 5)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write machine-readable results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against results previously written with --output')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed median slowdown before flagging a regression (default: 0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # Synthetic rows never touch the configured database
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            cases = [
+                self._run_case(careers, keywords, answers, options['repeat'], options['seed'])
+                for careers, keywords, answers in product(options['careers'], options['keywords'], options['answers'])
+            ]
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'repeat': options['repeat'],
+            },
+            'cases': cases,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self._compare(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError(f'{regressions} benchmark regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+
+    def _run_case(self, careers, keywords, answers, repeat, seed):
+        self.stdout.write(f'Case: {careers} careers x {keywords} keywords, {answers} answers')
+        user = self._build_case(careers, keywords, answers, seed)
+        analyzer = CareerAnalyzer()
+
+        analyze_cold = self._measure(lambda: analyzer.analyze_user_responses(user), 1, before=self._reset_state)
+        career_scores = analyzer.analyze_user_responses(user)
+
+        benchmarks = {
+            'analyze_user_responses (cold)': analyze_cold,
+            'analyze_user_responses': self._measure(
+                lambda: analyzer.analyze_user_responses(user), repeat, before=analysis_results.clear
+            ),
+            'analyze_user_responses (unchanged answers)': self._measure(
+                lambda: analyzer.analyze_user_responses(user), repeat
+            ),
+            'get_user_disliked_careers': self._measure(lambda: analyzer.get_user_disliked_careers(user), repeat),
+            '_save_recommendations': self._measure(lambda: analyzer._save_recommendations(user, career_scores), repeat),
+        }
+        for name, result in benchmarks.items():
+            self.stdout.write(
+                f"  {name:<40} {result['seconds_median'] * 1000:10.2f} ms  "
+                f"{result['queries']:4d} queries  {result['peak_kib']:10.1f} KiB"
+            )
+        return {'careers': careers, 'keywords': keywords, 'answers': answers, 'benchmarks': benchmarks}
+
+    def _build_case(self, careers, keywords, answers, seed):
+        rng = random.Random(seed)
+        vocabulary = [f'term{index}' for index in range(max(50, keywords * 10))]
+
+        for model in (CareerRecommendation, Answer):
+            for rows in model.objects.on_every_shard():
+                rows.delete()
+        Question.objects.all().delete()
+        Career.objects.all().delete()
+        User.objects.filter(username='benchmark').delete()
+
+        Career.objects.bulk_create([
+            Career(
+                name=f'Career {index}',
+                category='Benchmark',
+                description='Synthetic benchmark career',
+                required_skills=rng.sample(vocabulary, keywords),
+                interest_keywords=rng.sample(vocabulary, keywords),
+                degree_requirements=rng.sample(vocabulary, keywords),
+                growth_prospects='medium',
+            )
+            for index in range(careers)
+        ], batch_size=1000)
+        questions = Question.objects.bulk_create([
+            Question(
+                text=f"Career {rng.randrange(careers)} " + ' '.join(rng.sample(vocabulary, 8)),
+                category=CATEGORIES[index % len(CATEGORIES)],
+            )
+            for index in range(answers)
+        ])
+        rebuild_all_matches()
+        bump_catalog_version()
+
+        user = User.objects.create(username='benchmark')
+        Answer.objects.shard(user.pk).bulk_create([
+            Answer(question=question, user=user, category=question.category, choice=rng.choice(CHOICES))
+            for question in questions
+        ])
+        return user
+
+    def _reset_state(self):
+        # Bulk inserts skip signals, and a cold run should rebuild every cache anyway
+        bump_catalog_version()
+
+    def _measure(self, function, repeat, before=None):
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            gc.collect()
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as queries:
+            function()
+
+        if before:
+            before()
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'seconds_median': statistics.median(timings),
+            'seconds_min': min(timings),
+            'queries': len(queries),
+            'peak_kib': peak / 1024,
+        }
+
+    def _compare(self, baseline, results, threshold):
+        def key(case):
+            return case['careers'], case['keywords'], case['answers']
+
+        baseline_cases = {key(case): case for case in baseline['cases']}
+        regressions = 0
+        self.stdout.write('Comparison with baseline (median time, queries):')
+        for case in results['cases']:
+            previous = baseline_cases.get(key(case))
+            if previous is None:
+                self.stdout.write(f'  {key(case)}: not in baseline')
+                continue
+            for name, result in case['benchmarks'].items():
+                old = previous['benchmarks'].get(name)
+                if old is None:
+                    continue
+                ratio = result['seconds_median'] / old['seconds_median'] if old['seconds_median'] else 1.0
+                slower = ratio > 1 + threshold
+                more_queries = result['queries'] > old['queries']
+                line = f"  {key(case)} {name:<40} x{ratio:5.2f}  queries {old['queries']} -> {result['queries']}"
+                if slower or more_queries:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(f'{line}  REGRESSION'))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.exports import EXPORT_COLUMNS, EXPORT_FORMATS, export_lines, parse_time_bound
+
+class Command(BaseCommand):
+    help = 'Stream answers or recommendations as NDJSON or CSV, in constant memory however many rows there are'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORT_COLUMNS))
+        parser.add_argument('--output', choices=list(EXPORT_FORMATS), default='ndjson',
+                            help='Output format (default: ndjson)')
+        parser.add_argument('--file',
+                            help='Write to this file instead of standard output')
+        parser.add_argument('--since',
+                            help='Only rows created at or after this date/datetime (ISO 8601)')
+        parser.add_argument('--until',
+                            help='Only rows created before this datetime, or on or before this date (ISO 8601)')
+        parser.add_argument('--category',
+                            help='Question category for answers, career category for recommendations')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per database round trip (default: 2000)')
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_lines(
+                options['kind'],
+                options['output'],
+                since=parse_time_bound(options['since']),
+                until=parse_time_bound(options['until'], end=True),
+                category=options['category'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        started = time.perf_counter()
+        count = 0
+        if options['file']:
+            with open(options['file'], 'w', newline='', encoding='utf-8') as export_file:
+                for line in lines:
+                    export_file.write(line)
+                    count += 1
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+                count += 1
+
+        if options['output'] == 'csv':
+            count -= 1  # The header
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else 0.0
+        # On stderr, so standard output stays a clean export
+        self.stderr.write(
+            f'Exported {count} {options["kind"]} in {elapsed:.2f}s, {rate:.1f} rows/s',
+            style_func=self.style.SUCCESS,
+        )
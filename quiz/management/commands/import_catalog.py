@@ -0,0 +1,211 @@
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from quiz.catalog import bump_catalog_version
+from quiz.match_index import rebuild_all_matches, rebuild_matches_of_questions
+from quiz.models import Answer, Career, Question, question_content_hash
+
+CAREER_TEXT_FIELDS = ('name', 'category', 'description', 'salary_range', 'growth_prospects', 'work_environment')
+CAREER_LIST_FIELDS = ('required_skills', 'interest_keywords', 'degree_requirements')
+CAREER_FIELDS = CAREER_TEXT_FIELDS + CAREER_LIST_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream careers or questions from a JSONL or CSV file into the catalog. Careers are matched by name, '
+        'questions by a hash of their text; new rows are bulk inserted and changed rows bulk updated'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['careers', 'questions'])
+        parser.add_argument('path', help='JSONL or CSV file, or - for standard input')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows upserted per transaction (default: 1000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self._format_of(path)
+        upsert = self._upsert_careers if options['kind'] == 'careers' else self._upsert_questions
+        parse = self._parse_career if options['kind'] == 'careers' else self._parse_question
+
+        started = time.perf_counter()
+        totals = {'rows': 0, 'created': 0, 'updated': 0, 'invalid': 0}
+        opened = nullcontext(sys.stdin) if path == '-' else open(path, newline='', encoding='utf-8')
+        with opened as source:
+            rows = self._valid_rows(self._read(source, input_format), parse, totals)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                # Bulk writes skip the per-row post_save handlers; the upserts re-index in bulk instead
+                with transaction.atomic():
+                    created, updated = upsert(batch)
+                    if created or updated:
+                        # Committed with the rows, so no process sees a batch's questions under the old version
+                        # (profile vectors lay answers out by the questions of the current version)
+                        bump_catalog_version()
+                totals['created'] += created
+                totals['updated'] += updated
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Read {totals["rows"]} rows, {totals["rows"] / elapsed:.1f} rows/s')
+
+        if totals['created'] or totals['updated']:
+            if options['kind'] == 'careers':
+                # Every question has to be matched against the changed careers anyway, so one
+                # pass over the questions with all careers costs the same as a partial rebuild
+                indexed = rebuild_all_matches(batch_size=options['batch_size'])
+                self.stdout.write(f'Indexed {indexed} question-career matches')
+                # Again now that the index covers the new careers: every server process compares its catalog,
+                # matcher, question bank, match matrix and memoized results against the shared version
+                bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        rate = totals['rows'] / elapsed if elapsed else 0.0
+        unchanged = totals['rows'] - totals['invalid'] - totals['created'] - totals['updated']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {totals["rows"]} {options["kind"]} rows ({totals["created"]} created, '
+                f'{totals["updated"]} updated, {unchanged} unchanged or duplicate, {totals["invalid"]} invalid) '
+                f'in {elapsed:.2f}s, {rate:.1f} rows/s'
+            )
+        )
+
+    def _format_of(self, path):
+        if path.endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        if path.endswith('.csv'):
+            return 'csv'
+        raise CommandError(f'Cannot tell the format of {path}; pass --format')
+
+    def _read(self, source, input_format):
+        """
+        Yield ``(line_number, row dict or error message)`` without loading the whole file
+        """
+        if input_format == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, f'invalid JSON: {error}'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'expected a JSON object'
+
+    def _valid_rows(self, rows, parse, totals):
+        for line_number, row in rows:
+            totals['rows'] += 1
+            try:
+                if isinstance(row, str):
+                    raise ValueError(row)
+                yield parse(row)
+            except ValueError as error:
+                totals['invalid'] += 1
+                self.stderr.write(f'Line {line_number}: {error}')
+
+    def _text(self, row, field):
+        value = row.get(field)
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            raise ValueError(f'{field} must be a string')
+        return value.strip()
+
+    def _parse_question(self, row):
+        text = self._text(row, 'text')
+        category = self._text(row, 'category')
+        if not text:
+            raise ValueError('text is required')
+        if category not in dict(Question.CATEGORY_CHOICES):
+            raise ValueError(f'unknown category {category!r}')
+        return {'text': text, 'category': category}
+
+    def _parse_career(self, row):
+        values = {field: self._text(row, field) for field in CAREER_TEXT_FIELDS}
+        for field in CAREER_LIST_FIELDS:
+            value = row.get(field) or []
+            if isinstance(value, str):
+                value = value.split(';')  # CSV cells hold semicolon-separated lists
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f'{field} must be a list of strings')
+            values[field] = [item.strip() for item in value if item.strip()]
+        if not values['name'] or not values['category']:
+            raise ValueError('name and category are required')
+        if values['growth_prospects'] not in dict(Career._meta.get_field('growth_prospects').choices):
+            raise ValueError(f'unknown growth_prospects {values["growth_prospects"]!r}')
+        for field in CAREER_TEXT_FIELDS:
+            max_length = Career._meta.get_field(field).max_length
+            if max_length is not None and len(values[field]) > max_length:
+                raise ValueError(f'{field} is longer than {max_length} characters')
+        return values
+
+    def _upsert_careers(self, batch):
+        by_name = {values['name']: values for values in batch}  # The last row of a name wins
+        existing = {}
+        for career in Career.objects.filter(name__in=list(by_name)).order_by('id'):
+            existing.setdefault(career.name, career)
+
+        new = [Career(**values) for name, values in by_name.items() if name not in existing]
+        changed = []
+        for name, career in existing.items():
+            values = by_name[name]
+            if any(getattr(career, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(career, field, value)
+                changed.append(career)
+
+        Career.objects.bulk_create(new)
+        self._update_rows(Career, changed, CAREER_FIELDS)
+        return len(new), len(changed)
+
+    def _upsert_questions(self, batch):
+        by_hash = {question_content_hash(values['text']): values for values in batch}
+        existing = {}
+        for question in Question.objects.filter(content_hash__in=list(by_hash)).order_by('id'):
+            existing.setdefault(question.content_hash, question)
+
+        new = [
+            Question(content_hash=content_hash, **values)
+            for content_hash, values in by_hash.items() if content_hash not in existing
+        ]
+        # A known text keeps its wording; only a new category is taken over
+        recategorized = {}
+        for content_hash, question in existing.items():
+            category = by_hash[content_hash]['category']
+            if question.category != category:
+                question.category = category
+                recategorized[question] = category
+
+        Question.objects.bulk_create(new)
+        self._update_rows(Question, list(recategorized), ['category'])
+        if recategorized:
+            self._recategorize_answers(recategorized)
+        rebuild_matches_of_questions(new + list(recategorized))
+        return len(new), len(recategorized)
+
+    def _update_rows(self, model, rows, fields):
+        # An insert that conflicts on the primary key and updates instead: bulk_update()
+        # spends far longer building its CASE WHEN per field and row than the database does
+        model.objects.bulk_create(rows, update_conflicts=True, unique_fields=['id'], update_fields=fields)
+
+    def _recategorize_answers(self, recategorized):
+        # What the update_answer_categories signal does per saved question
+        question_ids_by_category = {}
+        for question, category in recategorized.items():
+            question_ids_by_category.setdefault(category, []).append(question.pk)
+        for answers in Answer.objects.on_every_shard():
+            for category, question_ids in question_ids_by_category.items():
+                answers.filter(question_id__in=question_ids).exclude(category=category).update(category=category)
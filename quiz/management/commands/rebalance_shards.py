@@ -0,0 +1,155 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+from career_advisor.sharding import shard_aliases, user_db
+from quiz.models import Answer, CareerRecommendation, UserProfileVector, UserScoreState
+from quiz.profile_vector import invalidate_profile_vectors
+from quiz.rollups import apply_choice_deltas, apply_top_career_changes, top_career_deltas, top_career_ids
+from quiz.score_state import invalidate_score_states
+
+# (model, unique fields a copied row may conflict on) for every sharded model
+SHARDED_ROWS = [
+    (Answer, ['question', 'user']),
+    (CareerRecommendation, ['user', 'career']),
+    (UserScoreState, ['user']),
+    (UserProfileVector, ['user']),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Move users whose sharded rows (answers, recommendations, score states, profile vectors) are not on the shard '
+        'their user id hashes to, e.g. after appending to DB_SHARDS or when first sharding the default database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=lambda value: [int(user_id) for user_id in value.split(',')],
+                            help='Comma-separated user ids to check instead of every user')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows inserted per statement (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report which users would move')
+
+    def handle(self, *args, **options):
+        shards = shard_aliases()
+        if not shards:
+            raise CommandError('No shards configured; set DB_SHARDS')
+
+        started = time.perf_counter()
+        moved_users = 0
+        moved_rows = 0
+        # 'default' holds the rows written before sharding was turned on
+        for source in ['default', *shards]:
+            for user_id in self._misplaced_users(source, options['users']):
+                target = user_db(user_id)
+                if options['dry_run']:
+                    self.stdout.write(f'User {user_id}: {source} -> {target}')
+                else:
+                    moved_rows += self._move_user(user_id, source, target, options['batch_size'])
+                moved_users += 1
+
+        elapsed = time.perf_counter() - started
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved_users} users ({moved_rows} rows) in {elapsed:.2f}s'))
+
+    def _misplaced_users(self, source, only_users):
+        user_ids = set()
+        for model, _ in SHARDED_ROWS:
+            rows = model.objects.using(source).order_by()
+            if only_users is not None:
+                rows = rows.filter(user_id__in=only_users)
+            user_ids.update(rows.values_list('user_id', flat=True).distinct())
+        return sorted(user_id for user_id in user_ids if user_db(user_id) != source)
+
+    def _move_user(self, user_id, source, target, batch_size):
+        """
+        Copy a user's rows to ``target``, then delete them from ``source``
+
+        The databases share no transaction, so the copy skips rows already on the
+        target: a run stopped between the two steps is finished by running the
+        command again, and rows written to the target since the user's shard
+        changed are newer than the source's and kept.
+        """
+        moved = 0
+        with transaction.atomic(using=target):
+            for model, unique_fields in SHARDED_ROWS:
+                rows = list(model.objects.using(source).filter(user_id=user_id))
+                if rows and not self._keep_newer_rows(model, rows, user_id, target):
+                    self._copy_rows(model, rows, target, unique_fields, batch_size)
+                moved += len(rows)
+        with transaction.atomic(using=source), connections[source].cursor() as cursor:
+            quote_name = connections[source].ops.quote_name
+            for model, _ in SHARDED_ROWS:
+                # Plain SQL: the rows live on, so no delete signals (answer deletes would reset derived state)
+                cursor.execute(
+                    f'DELETE FROM {quote_name(model._meta.db_table)} '
+                    f'WHERE {quote_name(model._meta.get_field("user").column)} = %s',
+                    [user_id],
+                )
+        self.stdout.write(f'User {user_id}: {source} -> {target} ({moved} rows)')
+        return moved
+
+    def _keep_newer_rows(self, model, rows, user_id, target):
+        """
+        Settle what the user wrote to ``target`` after their shard changed; True when ``rows`` are all superseded
+
+        The source's rows were counted in the rollups and are deleted without
+        signals, so whatever newer rows replace is counted out here. Copies left
+        by an interrupted run keep their ``created_at`` and are not newer.
+        """
+        if model is Answer:
+            copies = {(row.question_id, row.choice, row.created_at) for row in rows}
+            newer = {
+                question_id
+                for question_id, choice, created_at in Answer.objects.using(target).filter(user_id=user_id)
+                .values_list('question_id', 'choice', 'created_at')
+                if (question_id, choice, created_at) not in copies
+            }
+            if newer:
+                deltas = Counter((row.question_id, row.choice) for row in rows if row.question_id in newer)
+                apply_choice_deltas({key: -users for key, users in deltas.items()}, using=target)
+                # The merged answers are more than the target's score state and profile vector hold
+                invalidate_score_states([user_id], using=target)
+                invalidate_profile_vectors([user_id], using=target)
+            return False
+        if model is CareerRecommendation:
+            # A newer analysis is a complete set of recommendations; the source's older set is dropped
+            scores = [(row.career_id, row.match_score) for row in rows]
+            copies = {(row.career_id, row.match_score, row.created_at) for row in rows}
+            stored = set(
+                CareerRecommendation.objects.using(target).filter(user_id=user_id)
+                .values_list('career_id', 'match_score', 'created_at')
+            )
+            if not stored - copies:
+                return False
+            apply_top_career_changes(top_career_deltas(top_career_ids(scores), []), using=target)
+            return True
+        return False  # One row per user: a newer one on the target is kept by the copy
+
+    def _copy_rows(self, model, rows, target, unique_fields, batch_size):
+        opts = model._meta
+        connection = connections[target]
+        quote_name = connection.ops.quote_name
+        # Auto ids are per database, so the target assigns its own (score states are keyed by user)
+        fields = [field for field in opts.concrete_fields if field is not opts.auto_field]
+        unique = [opts.get_field(name).column for name in unique_fields]
+        # Plain SQL rather than bulk_create, which would stamp created_at with the current time;
+        # rows conflicting with ones already on the target are skipped, not updated
+        insert = (
+            f'{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {quote_name(opts.db_table)} '
+            f'({", ".join(quote_name(field.column) for field in fields)}) VALUES '
+        )
+        row_sql = f'({", ".join(["%s"] * len(fields))})'
+        skip_existing = connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, unique)
+        batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, rows) or batch_size)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                params = [
+                    field.get_db_prep_save(field.value_from_object(row), connection)
+                    for row in batch for field in fields
+                ]
+                cursor.execute(f'{insert}{", ".join([row_sql] * len(batch))} {skip_existing}', params)
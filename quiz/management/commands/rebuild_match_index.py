@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from quiz.catalog import bump_catalog_version
+from quiz.match_index import rebuild_all_matches
+from quiz.models import Question, Career
+
+class Command(BaseCommand):
+    help = 'Rebuild the question-career match index from the current catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk insert (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created_count = rebuild_all_matches(batch_size=options['batch_size'])
+        bump_catalog_version()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indexed {created_count} matches for {Question.objects.count()} questions '
+                f'x {Career.objects.count()} careers in {elapsed:.2f}s'
+            )
+        )
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as datetime_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from quiz.career_analysis import CareerAnalyzer
+from quiz.catalog import get_career_catalog
+from quiz.models import Answer
+from quiz.scoring import get_match_matrix, init_rank_worker, rank_users
+
+class Command(BaseCommand):
+    help = 'Recompute saved career recommendations for every user who has answered the quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Users loaded, scored and written per batch (default: 500)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Scoring processes; 1 scores in this process (default: CPU count)')
+        parser.add_argument('--since',
+                            help='Only users with an answer created at or after this date/datetime (ISO 8601)')
+        parser.add_argument('--checkpoint',
+                            help='JSON file recording the last user id written, updated after every batch')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the user id stored in --checkpoint')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        since = self._parse_since(options['since'])
+        checkpoint = options['checkpoint']
+        if options['resume'] and not checkpoint:
+            raise CommandError('--resume requires --checkpoint')
+
+        last_user_id = 0
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as checkpoint_file:
+                last_user_id = json.load(checkpoint_file)['last_user_id']
+            self.stdout.write(f'Resuming after user {last_user_id}')
+
+        # Users are found through their answers, which may be spread over several user shards
+        answer_tables = Answer.objects.on_every_shard()
+        if since is not None:
+            answer_tables = [answers.filter(created_at__gte=since) for answers in answer_tables]
+
+        analyzer = CareerAnalyzer()
+        matrix = get_match_matrix()
+        careers = get_career_catalog().careers
+        fallback = None
+
+        pool = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_rank_worker,
+                initargs=(matrix, analyzer.choice_weights),
+            )
+        else:
+            init_rank_worker(matrix, analyzer.choice_weights)
+
+        started = time.perf_counter()
+        total_users = 0
+        total_rows = 0
+        try:
+            while True:
+                user_ids = self._next_user_ids(answer_tables, last_user_id, chunk_size)
+                if not user_ids:
+                    break
+
+                answers_by_user = {user_id: [] for user_id in user_ids}
+                for answers in Answer.objects.for_users(user_ids):
+                    for user_id, question_id, choice in answers.order_by().values_list('user_id', 'question_id', 'choice'):
+                        answers_by_user[user_id].append((question_id, choice))
+                batch = list(answers_by_user.items())
+
+                if pool is not None:
+                    slice_size = max(1, -(-len(batch) // workers))
+                    slices = [batch[i:i + slice_size] for i in range(0, len(batch), slice_size)]
+                    ranked = [item for result in pool.map(rank_users, slices) for item in result]
+                else:
+                    ranked = rank_users(batch)
+
+                career_scores_by_user = {}
+                for user_id, ranked_careers in ranked:
+                    career_scores = analyzer._build_career_scores(ranked_careers, careers)
+                    if not career_scores:
+                        if fallback is None:
+                            fallback = analyzer._fallback_career_scores()
+                        career_scores = fallback
+                    career_scores_by_user[user_id] = career_scores[:10]
+                total_rows += analyzer._save_recommendations_bulk(career_scores_by_user)
+
+                last_user_id = user_ids[-1]
+                total_users += len(user_ids)
+                if checkpoint:
+                    self._write_checkpoint(checkpoint, last_user_id)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Processed {total_users} users (last id {last_user_id}), '
+                    f'{total_users / elapsed:.1f} users/s'
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        rate = total_users / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recomputed {total_users} users ({total_rows} recommendations) '
+                f'in {elapsed:.2f}s, {rate:.1f} users/s'
+            )
+        )
+
+    def _next_user_ids(self, answer_tables, last_user_id, chunk_size):
+        # Keyset pagination keeps every chunk query equally cheap; merging the first
+        # chunk_size ids of every shard gives the next chunk_size ids overall
+        user_ids = set()
+        for answers in answer_tables:
+            user_ids.update(
+                answers.filter(user_id__gt=last_user_id).order_by('user_id')
+                .values_list('user_id', flat=True).distinct()[:chunk_size]
+            )
+        return sorted(user_ids)[:chunk_size]
+
+    def _parse_since(self, value):
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError(f'Invalid --since value: {value}')
+            since = datetime.combine(date, datetime_time.min)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def _write_checkpoint(self, path, last_user_id):
+        # Write then rename so an interrupted run never leaves a truncated checkpoint
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump({'last_user_id': last_user_id, 'updated_at': timezone.now().isoformat()}, checkpoint_file)
+        os.replace(temporary_path, path)
@@ -0,0 +1,67 @@
+import time
+from collections import Counter
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from quiz.models import Answer, Career, CareerRecommendation, CareerTopCount, Question, QuestionChoiceCount
+from quiz.rollups import top_career_ids
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the per-question choice counts and per-career top recommendation counts from the answer '
+        'and recommendation tables, reporting how many counts had drifted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Recommendation rows fetched per database round trip (default: 2000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        choice_counts = Counter()
+        for answers in Answer.objects.on_every_shard():
+            # One GROUP BY per shard; answers hold one row per user and question
+            for question_id, choice, users in answers.order_by().values_list('question_id', 'choice').annotate(Count('id')):
+                choice_counts[question_id, choice] += users
+        question_ids = set(Question.objects.values_list('id', flat=True))
+        choice_fixed = self._replace(
+            QuestionChoiceCount,
+            {key: users for key, users in choice_counts.items() if key[0] in question_ids},
+            lambda row: (row.question_id, row.choice),
+            lambda key, users: QuestionChoiceCount(question_id=key[0], choice=key[1], users=users),
+        )
+
+        top_counts = Counter()
+        for recommendations in CareerRecommendation.objects.on_every_shard():
+            rows = recommendations.order_by('user_id').values_list('user_id', 'career_id', 'match_score')
+            for _, user_rows in groupby(rows.iterator(chunk_size=options['chunk_size']), key=lambda row: row[0]):
+                top_counts.update(top_career_ids((career_id, score) for _, career_id, score in user_rows))
+        career_ids = set(Career.objects.values_list('id', flat=True))
+        top_fixed = self._replace(
+            CareerTopCount,
+            {career_id: users for career_id, users in top_counts.items() if career_id in career_ids},
+            lambda row: row.career_id,
+            lambda career_id, users: CareerTopCount(career_id=career_id, users=users),
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {len(choice_counts)} question choice counts ({choice_fixed} corrected) and '
+                f'{len(top_counts)} career top counts ({top_fixed} corrected) in {elapsed:.2f}s'
+            )
+        )
+
+    def _replace(self, model, counts, key_of, build):
+        """
+        Swap the table's rows for ``counts`` in one transaction; returns how many counts differed
+        """
+        with transaction.atomic():
+            stored = {key_of(row): row.users for row in model.objects.select_for_update()}
+            model.objects.all().delete()
+            model.objects.bulk_create([build(key, users) for key, users in counts.items()], batch_size=1000)
+        keys = set(stored) | set(counts)
+        return sum(1 for key in keys if stored.get(key, 0) != counts.get(key, 0))
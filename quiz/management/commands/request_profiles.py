@@ -0,0 +1,99 @@
+import io
+import json
+import pstats
+from collections import defaultdict
+from statistics import median
+
+from django.core.management.base import BaseCommand, CommandError
+from career_advisor.profiling import profile_dir, sign_profile_header
+
+
+class Command(BaseCommand):
+    help = 'List, summarize and inspect request profiles saved by the profiling middleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile', nargs='?',
+                            help='Profile name (or unique prefix) to show the top functions and allocations of')
+        parser.add_argument('--view', help='Only profiles of this URL name')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Profiles listed, or functions shown for one profile (default: 20)')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+                            help='pstats sort key when showing one profile (default: cumulative)')
+        parser.add_argument('--summary', action='store_true',
+                            help='Per-view count and median/max duration instead of a listing')
+        parser.add_argument('--sign-header', action='store_true',
+                            help='Print a signed X-Profile header value and exit')
+        parser.add_argument('--memory', action='store_true',
+                            help='With --sign-header: also trace allocations')
+
+    def handle(self, *args, **options):
+        if options['sign_header']:
+            self.stdout.write(f"X-Profile: {sign_profile_header(memory=options['memory'])}")
+            return
+
+        profiles = self._load(options['view'])
+        if options['profile']:
+            self._show(profiles, options['profile'], options['sort'], options['limit'])
+        elif options['summary']:
+            self._summarize(profiles)
+        else:
+            self._list(profiles, options['limit'])
+
+    def _load(self, view):
+        directory = profile_dir()
+        if not directory.is_dir():
+            return []
+        profiles = []
+        for path in sorted(directory.glob('*.json'), reverse=True):
+            with open(path) as summary_file:
+                summary = json.load(summary_file)
+            if view and summary['view'] != view:
+                continue
+            summary['name'] = path.stem
+            summary['pstats'] = path.with_suffix('.prof')
+            profiles.append(summary)
+        return profiles
+
+    def _list(self, profiles, limit):
+        if not profiles:
+            self.stdout.write(f'No profiles in {profile_dir()}')
+            return
+        for summary in profiles[:limit]:
+            memory = ' +memory' if summary['top_allocations'] else ''
+            self.stdout.write(
+                f"{summary['name']}  {summary['method']} {summary['path']} -> {summary['status']}  "
+                f"{summary['duration_ms']:.1f}ms  ({summary['trigger']}{memory})"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Showing {min(limit, len(profiles))} of {len(profiles)} profiles'))
+
+    def _summarize(self, profiles):
+        durations = defaultdict(list)
+        for summary in profiles:
+            durations[summary['view']].append(summary['duration_ms'])
+        for view, values in sorted(durations.items(), key=lambda item: -median(item[1])):
+            self.stdout.write(
+                f'{view}: {len(values)} profiles, median {median(values):.1f}ms, max {max(values):.1f}ms'
+            )
+        self.stdout.write(self.style.SUCCESS(f'{len(profiles)} profiles across {len(durations)} views'))
+
+    def _show(self, profiles, name, sort, limit):
+        matches = [summary for summary in profiles if summary['name'].startswith(name)]
+        if len(matches) != 1:
+            raise CommandError(f"{len(matches)} profiles match '{name}'")
+        summary = matches[0]
+
+        self.stdout.write(
+            f"{summary['method']} {summary['path']} ({summary['view']}) -> {summary['status']} "
+            f"in {summary['duration_ms']:.1f}ms, {summary['trigger']} at {summary['created_at']}"
+        )
+        output = io.StringIO()
+        stats = pstats.Stats(str(summary['pstats']), stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        self.stdout.write(output.getvalue())
+
+        if summary['top_allocations']:
+            self.stdout.write('Top allocations:')
+            for allocation in summary['top_allocations'][:limit]:
+                self.stdout.write(
+                    f"  {allocation['size_kib']:>10.1f} KiB  {allocation['count']:>8} blocks  {allocation['location']}"
+                )
@@ -0,0 +1,81 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from quiz.jobs import claim_analysis_job, fail_stale_jobs, run_analysis_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued career analysis jobs (POST /api/quiz/analyze/ in background mode)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Jobs run at once by this process (default: 4)')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle worker waits before checking the queue again (default: 1)')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Fail jobs left running this many seconds by a dead worker (default: 600)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for new jobs')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if connection.vendor == 'sqlite' and concurrency > 1:
+            # SQLite allows one writer at a time; parallel jobs would only fail with "database is locked"
+            self.stdout.write(self.style.WARNING('SQLite serializes writes, running one job at a time'))
+            concurrency = 1
+
+        # Finish the jobs in hand on Ctrl-C / SIGTERM, then exit
+        self.stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stopping.set())
+
+        failed = fail_stale_jobs(timedelta(seconds=options['stale_after']))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed {failed} stale running job(s)'))
+
+        self.stdout.write(f'Running analysis jobs with concurrency {concurrency}')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='analysis-worker') as pool:
+            workers = [pool.submit(self._work, options['poll_interval'], options['once']) for _ in range(concurrency)]
+            processed = sum(worker.result() for worker in workers)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs in {elapsed:.2f}s'))
+
+    def _work(self, poll_interval, once):
+        processed = 0
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim_analysis_job()
+                except DatabaseError as e:
+                    # Keep the worker alive through lock timeouts and dropped connections
+                    self.stderr.write(f'Could not claim a job: {e}')
+                    self.stopping.wait(poll_interval)
+                    continue
+                if job is None:
+                    if once:
+                        break
+                    self.stopping.wait(poll_interval)
+                    continue
+
+                job_started = time.perf_counter()
+                job = run_analysis_job(job)
+                processed += 1
+                line = f'Job {job.id} for user {job.user_id}: {job.status} in {time.perf_counter() - job_started:.2f}s'
+                if job.status == 'failed':
+                    self.stderr.write(f'{line} ({job.error})')
+                else:
+                    self.stdout.write(line)
+        finally:
+            # Each worker thread holds its own connection
+            connection.close()
+        return processed
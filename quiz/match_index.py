@@ -0,0 +1,101 @@
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from .matcher import CareerMatcher, get_career_matcher
+from .models import Question, Career, QuestionCareerMatch
+
+MATCH_FIELDS = ('id', 'name', 'interest_keywords', 'degree_requirements', 'required_skills')
+
+
+def question_career_match(category: str, question_text: str, career) -> Optional[Tuple[str, float]]:
+    """
+    Match a lowercased question text against one career
+
+    Reference definition of a match; ``CareerMatcher.match`` computes the same
+    thing for all careers in a single pass.
+
+    Returns ``(match_kind, weight)`` or ``None``. ``career`` only needs ``name``,
+    ``interest_keywords``, ``degree_requirements`` and ``required_skills``.
+    """
+    if category == 'interest':
+        for keyword in career.interest_keywords:
+            if keyword.lower() in question_text:
+                return 'interest_keyword', 1.0
+    elif category == 'degree':
+        for degree in career.degree_requirements:
+            if degree.lower() in question_text:
+                return 'degree', 1.0
+    elif category == 'career':
+        if career.name.lower() in question_text:
+            return 'career_name', 1.0
+        for skill in career.required_skills:
+            if skill.lower() in question_text:
+                return 'skill', 0.5  # Half weight for related skills
+    return None
+
+
+def _matches(questions: Iterable[Question], matcher: CareerMatcher):
+    # One automaton pass per question instead of every keyword of every career
+    for question in questions:
+        matches = matcher.match(question.category, question.text.lower())
+        for career_id, (match_kind, weight) in matches.items():
+            yield QuestionCareerMatch(
+                question_id=question.id,
+                career_id=career_id,
+                category=question.category,
+                match_kind=match_kind,
+                weight=weight,
+            )
+
+
+def _bulk_insert(matches, batch_size: int = 1000) -> int:
+    # bulk_create() materializes its input, so feed it one batch at a time
+    created = 0
+    while True:
+        batch = list(islice(matches, batch_size))
+        if not batch:
+            return created
+        QuestionCareerMatch.objects.bulk_create(batch)
+        created += len(batch)
+
+
+def rebuild_question_matches(question: Question) -> int:
+    """
+    Replace the index rows of one question
+    """
+    with transaction.atomic():
+        QuestionCareerMatch.objects.filter(question_id=question.id).delete()
+        return _bulk_insert(_matches([question], get_career_matcher()))
+
+
+def rebuild_matches_of_questions(questions: List[Question], batch_size: int = 1000) -> int:
+    """
+    Replace the index rows of many questions, e.g. a batch of imported ones
+    """
+    with transaction.atomic():
+        QuestionCareerMatch.objects.filter(question_id__in=[question.id for question in questions]).delete()
+        return _bulk_insert(_matches(questions, get_career_matcher()), batch_size)
+
+
+def rebuild_career_matches(career: Career) -> int:
+    """
+    Replace the index rows of one career
+    """
+    with transaction.atomic():
+        QuestionCareerMatch.objects.filter(career_id=career.id).delete()
+        return _bulk_insert(_matches(Question.objects.only('id', 'text', 'category'), CareerMatcher([career])))
+
+
+def rebuild_all_matches(batch_size: int = 1000) -> int:
+    """
+    Rebuild the whole index from the current catalog
+    """
+    with transaction.atomic():
+        QuestionCareerMatch.objects.all().delete()
+        return _bulk_insert(
+            _matches(Question.objects.only('id', 'text', 'category').iterator(),
+                     CareerMatcher(Career.objects.only(*MATCH_FIELDS))),
+            batch_size,
+        )
@@ -0,0 +1,150 @@
+from collections import deque
+from typing import Dict, Hashable, Iterable, Set, Tuple
+
+from .catalog import VersionedCache
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher: one pass over a text finds every added pattern in it
+
+    Each pattern carries one or more values; ``search`` returns the values of all
+    patterns that occur anywhere in the text, exactly like ``pattern in text``.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._output_link = [0]  # Nearest proper suffix node that has output
+        self._always = []  # Values of empty patterns, which occur in every text
+        self._built = False
+
+    def add(self, pattern: str, value: Hashable) -> None:
+        if not pattern:
+            self._always.append(value)
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(0)
+                self._goto[node][char] = next_node
+            node = next_node
+        self._output[node].append(value)
+        self._built = False
+
+    def build(self) -> 'AhoCorasick':
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+            self._output_link[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                if node:
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                fail = self._fail[child]
+                self._output_link[child] = fail if self._output[fail] else self._output_link[fail]
+                queue.append(child)
+        self._built = True
+        return self
+
+    def search(self, text: str) -> Set[Hashable]:
+        if not self._built:
+            self.build()
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        found = set(self._always)
+        seen_nodes = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if output[node] else output_link[node]
+            # Every suffix chain is reported once, however often it recurs in the text
+            while match and match not in seen_nodes:
+                seen_nodes.add(match)
+                found.update(output[match])
+                match = output_link[match]
+        return found
+
+
+class CareerMatcher:
+    """
+    Every career name, interest keyword, degree requirement and skill compiled into one automaton
+
+    ``match`` reproduces ``match_index.question_career_match`` for all careers at
+    once, in time linear in the question text rather than in the number of keywords.
+    """
+
+    def __init__(self, careers: Iterable, version=None):
+        self.version = version
+        self._automaton = AhoCorasick()
+        for career in careers:
+            self._automaton.add(career.name.lower(), (career.id, 'career_name'))
+            for keyword in career.interest_keywords:
+                self._automaton.add(keyword.lower(), (career.id, 'interest_keyword'))
+            for degree in career.degree_requirements:
+                self._automaton.add(degree.lower(), (career.id, 'degree'))
+            for skill in career.required_skills:
+                self._automaton.add(skill.lower(), (career.id, 'skill'))
+        self._automaton.build()
+
+    def hits(self, question_text: str) -> Set[Tuple[int, str]]:
+        """
+        Every (career_id, match_kind) found in a lowercased question text
+        """
+        return self._automaton.search(question_text)
+
+    def match(self, category: str, question_text: str) -> Dict[int, Tuple[str, float]]:
+        """
+        career_id -> (match_kind, weight) for a lowercased question text of one category
+        """
+        matches = {}
+        if category == 'interest':
+            for career_id, kind in self.hits(question_text):
+                if kind == 'interest_keyword':
+                    matches[career_id] = (kind, 1.0)
+        elif category == 'degree':
+            for career_id, kind in self.hits(question_text):
+                if kind == 'degree':
+                    matches[career_id] = (kind, 1.0)
+        elif category == 'career':
+            for career_id, kind in self.hits(question_text):
+                if kind == 'career_name':
+                    matches[career_id] = (kind, 1.0)
+                elif kind == 'skill':
+                    matches.setdefault(career_id, ('skill', 0.5))  # Half weight for related skills
+        return matches
+
+
+def _build_career_matcher(version) -> CareerMatcher:
+    from .match_index import MATCH_FIELDS
+    from .models import Career
+
+    return CareerMatcher(Career.objects.only(*MATCH_FIELDS), version)
+
+
+_career_matcher = VersionedCache(_build_career_matcher)
+
+
+def get_career_matcher() -> CareerMatcher:
+    """
+    Return the process-wide matcher over all careers, rebuilding it when the catalog version changes
+    """
+    return _career_matcher.get()
+
+
+def reset_career_matcher() -> None:
+    """
+    Drop this process's matcher right away; other processes follow the version bump on commit
+    """
+    _career_matcher.reset()
@@ -0,0 +1,71 @@
+# Generated by Django 4.2 on 2026-10-18 20:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def question_career_match(category, question_text, career):
+    # The matching rules as of this migration, frozen here: later edits to
+    # quiz.match_index must not change what this migration builds
+    if category == 'interest':
+        for keyword in career.interest_keywords:
+            if keyword.lower() in question_text:
+                return 'interest_keyword', 1.0
+    elif category == 'degree':
+        for degree in career.degree_requirements:
+            if degree.lower() in question_text:
+                return 'degree', 1.0
+    elif category == 'career':
+        if career.name.lower() in question_text:
+            return 'career_name', 1.0
+        for skill in career.required_skills:
+            if skill.lower() in question_text:
+                return 'skill', 0.5
+    return None
+
+
+def build_match_index(apps, schema_editor):
+    Question = apps.get_model('quiz', 'Question')
+    Career = apps.get_model('quiz', 'Career')
+    QuestionCareerMatch = apps.get_model('quiz', 'QuestionCareerMatch')
+
+    careers = list(Career.objects.all())
+    matches = []
+    for question in Question.objects.all():
+        question_text = question.text.lower()
+        for career in careers:
+            match = question_career_match(question.category, question_text, career)
+            if match is not None:
+                matches.append(QuestionCareerMatch(
+                    question_id=question.id,
+                    career_id=career.id,
+                    category=question.category,
+                    match_kind=match[0],
+                    weight=match[1],
+                ))
+    QuestionCareerMatch.objects.bulk_create(matches, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_career_careerrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionCareerMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('interest', 'Interest'), ('degree', 'Degree'), ('career', 'Career')], max_length=20)),
+                ('match_kind', models.CharField(choices=[('interest_keyword', 'Interest Keyword'), ('degree', 'Degree Requirement'), ('career_name', 'Career Name'), ('skill', 'Required Skill')], max_length=20)),
+                ('weight', models.FloatField()),
+                ('career', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_matches', to='quiz.career')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='career_matches', to='quiz.question')),
+            ],
+            options={
+                'unique_together': {('question', 'career')},
+            },
+        ),
+        migrations.RunPython(build_match_index, migrations.RunPython.noop),
+    ]
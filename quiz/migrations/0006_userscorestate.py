@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('quiz', '0005_questioncareermatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScoreState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('catalog_version', models.BigIntegerField(default=0)),
+                ('answer_choices', models.JSONField(default=dict)),
+                ('totals', models.BinaryField(default=bytes)),
+                ('matched', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
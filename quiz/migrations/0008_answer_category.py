@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 21:15
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_question_category(apps, schema_editor):
+    Answer = apps.get_model('quiz', 'Answer')
+    Question = apps.get_model('quiz', 'Question')
+    # One UPDATE with a correlated subquery, before the indexes exist to slow it down
+    Answer.objects.update(category=Subquery(Question.objects.filter(pk=OuterRef('question_id')).values('category')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='category',
+            field=models.CharField(choices=[('interest', 'Interest'), ('degree', 'Degree'), ('career', 'Career')], default='', editable=False, max_length=20),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_question_category, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user', 'category'], name='quiz_answer_user_id_ed6287_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user', 'created_at'], name='quiz_answer_user_id_56c9bf_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 21:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0008_answer_category'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='question',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quiz.question'),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='answers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='careerrecommendation',
+            name='career',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='quiz.career'),
+        ),
+        migrations.AlterField(
+            model_name='careerrecommendation',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='career_recommendations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userscorestate',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_state', serialize=False, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
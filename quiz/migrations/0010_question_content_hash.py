@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 21:24
+
+import hashlib
+
+from django.db import migrations, models, router
+
+
+def hash_question_texts(apps, schema_editor):
+    Question = apps.get_model('quiz', 'Question')
+    if not router.allow_migrate_model(schema_editor.connection.alias, Question):
+        return  # A user shard has no catalog tables
+    # Same normalization as quiz.models.question_content_hash, frozen here
+    questions = list(Question.objects.only('id', 'text'))
+    for question in questions:
+        question.content_hash = hashlib.sha256(' '.join(question.text.split()).casefold().encode()).hexdigest()
+    Question.objects.bulk_update(questions, ['content_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_sharded_user_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_question_texts, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='career',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 21:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CareerTopCount',
+            fields=[
+                ('career', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='top_count', serialize=False, to='quiz.career')),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionChoiceCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('choice', models.CharField(choices=[('strongly_dislike', 'Strongly Dislike'), ('dislike', 'Dislike'), ('neutral', 'Neutral'), ('like', 'Like'), ('strongly_like', 'Strongly Like')], max_length=20)),
+                ('users', models.IntegerField(default=0)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_counts', to='quiz.question')),
+            ],
+            options={
+                'unique_together': {('question', 'choice')},
+            },
+        ),
+    ]
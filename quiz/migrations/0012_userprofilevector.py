@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 21:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('quiz', '0011_population_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfileVector',
+            fields=[
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='profile_vector', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('layout', models.CharField(blank=True, max_length=40)),
+                ('preferences', models.BinaryField(default=bytes)),
+                ('category_summaries', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
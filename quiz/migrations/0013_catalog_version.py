@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 21:59
+
+from django.db import migrations, models, router
+import django.utils.timezone
+import time
+
+
+def create_catalog_version(apps, schema_editor):
+    CatalogVersion = apps.get_model('quiz', 'CatalogVersion')
+    if not router.allow_migrate_model(schema_editor.connection.alias, CatalogVersion):
+        return  # A user shard has no catalog tables
+    # The row quiz.catalog reads; created here so the first request after deploying does not write it
+    CatalogVersion.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_userprofilevector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=time.time_ns)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_catalog_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userscorestate',
+            name='saved_fingerprint',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 22:32
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_userscorestate_saved_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='quiz_answer_user_id_ed6287_idx',
+        ),
+    ]
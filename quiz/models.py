@@ -1,10 +1,17 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
+from career_advisor.sharding import ShardedManager
 from django.utils import timezone
+import hashlib
 import json
+import time
 
 User = get_user_model()
 
+def question_content_hash(text):
+    """SHA-256 of a question text with case and whitespace normalized, used to deduplicate imports"""
+    return hashlib.sha256(' '.join(text.split()).casefold().encode()).hexdigest()
+
 class Question(models.Model):
     CATEGORY_CHOICES = [
         ('interest', 'Interest'),
@@ -12,15 +19,44 @@ class Question(models.Model):
         ('career', 'Career'),
     ]
     text = models.TextField()
+    content_hash = models.CharField(max_length=64, db_index=True, editable=False)  # question_content_hash(text)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.text[:50]
 
+    def save(self, *args, **kwargs):
+        self.content_hash = question_content_hash(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['category', 'id']
 
+class CatalogVersion(models.Model):
+    # One row (quiz.catalog.CATALOG_VERSION_ID) every process compares its catalog caches and stored score states against
+    version = models.BigIntegerField(default=time.time_ns)  # Seeded from the clock so a recreated row never reuses a version
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+class AnswerQuerySet(models.QuerySet):
+    def delete(self):
+        # No per-row delete signals on Answer, so cascades from users and questions stay fast deletes;
+        # receivers of answers_deleted update what derives from the rows in bulk instead
+        from .signals import answers_deleted  # quiz.signals imports this module
+
+        with transaction.atomic(using=self.db):
+            answers_deleted.send(sender=Answer, answers=self)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 class Answer(models.Model):
     CHOICE_CHOICES = [
         ('strongly_dislike', 'Strongly Dislike'),
@@ -30,20 +66,47 @@ class Answer(models.Model):
         ('strongly_like', 'Strongly Like'),
     ]
     
-    question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE)
-    user = models.ForeignKey(User, related_name='answers', on_delete=models.CASCADE)
+    # Answers may live on a user shard apart from questions and users, so no database-level foreign keys
+    question = models.ForeignKey(Question, related_name='answers', on_delete=models.CASCADE, db_constraint=False)
+    user = models.ForeignKey(User, related_name='answers', on_delete=models.CASCADE, db_constraint=False)
+    category = models.CharField(max_length=20, choices=Question.CATEGORY_CHOICES, editable=False)  # Copied from the question
     choice = models.CharField(max_length=20, choices=CHOICE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager.from_queryset(AnswerQuerySet)()
+
     def __str__(self):
         return f"{self.user.username} - {self.choice}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored choice a later save replaces, so the choice counts need not read it back
+        instance._stored_choice = instance.__dict__.get('choice')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self.category:
+            self.category = self.question.category
+        super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        from .signals import answers_deleted
+
+        using = using or router.db_for_write(Answer, instance=self)
+        with transaction.atomic(using=using):
+            answers_deleted.send(sender=Answer, answers=Answer.objects.using(using).filter(pk=self.pk))
+            return super().delete(using=using, keep_parents=keep_parents)
+
     class Meta:
         unique_together = ['question', 'user']  # One answer per user per question
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),  # A user's answers newest first, and --since filters
+        ]
 
 class Career(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     category = models.CharField(max_length=50)
     description = models.TextField()
     required_skills = models.JSONField(default=list)  # List of skills
@@ -65,16 +128,120 @@ class Career(models.Model):
     class Meta:
         ordering = ['name']
 
+class CareerRecommendationQuerySet(models.QuerySet):
+    def delete(self):
+        # Whatever is left no longer matches the fingerprint it was saved with
+        with transaction.atomic(using=self.db):
+            UserScoreState.objects.using(self.db).filter(
+                user_id__in=self.order_by().values('user_id')
+            ).exclude(saved_fingerprint='').update(saved_fingerprint='')
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
 class CareerRecommendation(models.Model):
-    user = models.ForeignKey(User, related_name='career_recommendations', on_delete=models.CASCADE)
-    career = models.ForeignKey(Career, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='career_recommendations', on_delete=models.CASCADE, db_constraint=False)
+    career = models.ForeignKey(Career, on_delete=models.CASCADE, db_constraint=False)
     match_score = models.FloatField()  # 0-100
     reasoning = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager.from_queryset(CareerRecommendationQuerySet)()
+
     def __str__(self):
         return f"{self.user.username} - {self.career.name} ({self.match_score}%)"
 
     class Meta:
         unique_together = ['user', 'career']
         ordering = ['-match_score']
+
+class QuestionCareerMatch(models.Model):
+    MATCH_KIND_CHOICES = [
+        ('interest_keyword', 'Interest Keyword'),
+        ('degree', 'Degree Requirement'),
+        ('career_name', 'Career Name'),
+        ('skill', 'Required Skill'),
+    ]
+
+    question = models.ForeignKey(Question, related_name='career_matches', on_delete=models.CASCADE)
+    career = models.ForeignKey(Career, related_name='question_matches', on_delete=models.CASCADE)
+    category = models.CharField(max_length=20, choices=Question.CATEGORY_CHOICES)  # Copied from the question
+    match_kind = models.CharField(max_length=20, choices=MATCH_KIND_CHOICES)
+    weight = models.FloatField()  # Multiplier applied to the answer's choice weight
+
+    def __str__(self):
+        return f"Q{self.question_id} -> {self.career_id} ({self.match_kind})"
+
+    class Meta:
+        unique_together = ['question', 'career']  # At most one match per question per career
+
+class UserScoreState(models.Model):
+    user = models.OneToOneField(User, related_name='score_state', on_delete=models.CASCADE, primary_key=True, db_constraint=False)
+    catalog_version = models.BigIntegerField(default=0)  # Accumulators are only valid for this catalog
+    answer_choices = models.JSONField(default=dict)  # question_id -> choice already applied
+    totals = models.BinaryField(default=bytes)  # float32 (3 categories x careers) choice-weighted sums
+    matched = models.BinaryField(default=bytes)  # float32 (3 categories x careers) matched answer counts
+    saved_fingerprint = models.CharField(max_length=40, blank=True)  # answer_fingerprint of the saved recommendations
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShardedManager()
+
+    def __str__(self):
+        return f"{self.user_id} score state ({len(self.answer_choices)} answers)"
+
+class UserProfileVector(models.Model):
+    user = models.OneToOneField(User, related_name='profile_vector', on_delete=models.CASCADE, primary_key=True, db_constraint=False)
+    layout = models.CharField(max_length=40, blank=True)  # QuestionBank.layout the slots follow; blank when stale
+    preferences = models.BinaryField(default=bytes)  # float32 choice weight per question slot, NaN when unanswered
+    category_summaries = models.JSONField(default=dict)  # category -> {'answered': n, 'mean': mean choice weight}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShardedManager()
+
+    def __str__(self):
+        return f"{self.user_id} profile vector"
+
+class AnalysisJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    user = models.ForeignKey(User, related_name='analysis_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(null=True, blank=True)  # The analyze endpoint's response body once done
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Analysis job {self.id} for {self.user_id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]  # Workers claim the oldest pending job
+        constraints = [
+            # Repeated requests while a job waits are merged into it
+            models.UniqueConstraint(fields=['user'], condition=models.Q(status='pending'), name='one_pending_analysis_job_per_user'),
+        ]
+
+class QuestionChoiceCount(models.Model):
+    question = models.ForeignKey(Question, related_name='choice_counts', on_delete=models.CASCADE)
+    choice = models.CharField(max_length=20, choices=Answer.CHOICE_CHOICES)
+    users = models.IntegerField(default=0)  # Users whose answer to the question is this choice
+
+    def __str__(self):
+        return f"Q{self.question_id} {self.choice}: {self.users}"
+
+    class Meta:
+        unique_together = ['question', 'choice']
+
+class CareerTopCount(models.Model):
+    career = models.OneToOneField(Career, related_name='top_count', on_delete=models.CASCADE, primary_key=True)
+    users = models.IntegerField(default=0)  # Users with the career among their top 5 recommendations
+
+    def __str__(self):
+        return f"{self.career_id} in {self.users} top recommendations"
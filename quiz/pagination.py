@@ -0,0 +1,136 @@
+import base64
+import json
+from datetime import datetime
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in cursor pagination over a unique ``ordering`` set by subclasses
+
+    The cursor carries the ordering values of the last row on the page, so the
+    next page is one indexed range filter however deep it is. Requests without
+    ``cursor`` or ``page_size`` stay unpaginated.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+
+    @property
+    def ordering_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def is_requested(self, request) -> bool:
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        ``paginate_queryset`` for async views, fetching the page with the async ORM
+        """
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.current_page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+            except (TypeError, ValueError, ValidationError):
+                # Well-formed JSON whose values do not fit the ordering fields, e.g. a tampered cursor
+                raise NotFound('Invalid cursor')
+        # One extra row tells whether another page exists
+        return queryset[:self.current_page_size + 1]
+
+    def _page(self, rows):
+        page = rows[:self.current_page_size]
+        self.next_cursor = None
+        if len(rows) > self.current_page_size:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor([getattr(last, field) for field in self.ordering_fields])
+        return page
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, values) -> str:
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        if any(isinstance(value, (dict, list)) for value in values):
+            raise NotFound('Invalid cursor')  # Ordering values are scalars
+        # Datetimes stay ISO strings; the field lookups parse them back
+        return values
+
+    def _after(self, values) -> Q:
+        # (a, b, c) > (x, y, z) spelled out per column so mixed directions work
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {self.ordering_fields[i]: values[i] for i in range(index)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+        return reduce(or_, conditions)
+
+
+class AnswerPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class CareerPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class RecommendationPagination(KeysetPagination):
+    ordering = ('-match_score', 'id')
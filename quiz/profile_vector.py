@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from career_advisor.sharding import user_db
+from django.db import transaction
+
+from .catalog import QuestionBank, get_question_bank, refresh_question_bank
+from .models import Answer, UserProfileVector
+from .scoring import CHOICE_WEIGHTS, CATEGORY_ORDER
+
+# Choice weights are distinct, so a slot's weight also says which choice it was
+CHOICES_BY_WEIGHT = {float(weight): choice for choice, weight in CHOICE_WEIGHTS.items()}
+
+
+def decode_preferences(vector: UserProfileVector) -> np.ndarray:
+    """
+    The vector's float32 slots: the choice weight per question of its layout, NaN when unanswered
+    """
+    return np.frombuffer(bytes(vector.preferences), dtype=np.float32)
+
+
+def _summaries(preferences: np.ndarray, bank: QuestionBank) -> Dict:
+    categories = np.array(bank.slot_categories)
+    summaries = {}
+    for category in CATEGORY_ORDER:
+        answered = preferences[(categories == category) & ~np.isnan(preferences)]
+        summaries[category] = {
+            'answered': int(answered.size),
+            'mean': float(answered.mean()) if answered.size else 0.0,
+        }
+    return summaries
+
+
+def _store(vector: UserProfileVector, preferences: np.ndarray, bank: QuestionBank) -> None:
+    vector.layout = bank.layout
+    vector.preferences = preferences.astype(np.float32).tobytes()
+    vector.category_summaries = _summaries(preferences, bank)
+    vector.save()
+
+
+def _rebuild(vector: UserProfileVector, bank: QuestionBank) -> UserProfileVector:
+    preferences = np.full(len(bank.slot_ids), np.nan, dtype=np.float32)
+    for question_id, choice in Answer.objects.for_user(vector.user_id).order_by().values_list('question_id', 'choice'):
+        slot = bank.slots.get(question_id)
+        if slot is not None:
+            preferences[slot] = CHOICE_WEIGHTS[choice]
+    _store(vector, preferences, bank)
+    return vector
+
+
+def load_profile_vector(user_id: int, bank: Optional[QuestionBank] = None) -> UserProfileVector:
+    """
+    Return the user's profile vector, rebuilding it from their answers when missing or laid out for other questions
+    """
+    bank = bank or get_question_bank()
+    vector = UserProfileVector.objects.for_user(user_id).first()
+    if vector is not None and vector.layout == bank.layout:
+        return vector
+    with transaction.atomic(using=user_db(user_id)):
+        vector, _ = UserProfileVector.objects.shard(user_id).select_for_update().get_or_create(user_id=user_id)
+        if vector.layout == bank.layout:
+            return vector  # Rebuilt by a concurrent request
+        return _rebuild(vector, bank)
+
+
+def apply_profile_changes(user_id: int, changes: Iterable[Tuple[int, Optional[str]]]) -> None:
+    """
+    Write answers' new choices (None clears one) into their question slots
+    """
+    changes = list(changes)
+    bank = get_question_bank()
+    if any(question_id not in bank.slots for question_id, _ in changes):
+        # An answer to a question this process's bank has not seen: lay the vector out by the database's questions
+        bank = refresh_question_bank()
+    with transaction.atomic(using=user_db(user_id)):
+        vector, _ = UserProfileVector.objects.shard(user_id).select_for_update().get_or_create(user_id=user_id)
+        if vector.layout != bank.layout:
+            _rebuild(vector, bank)  # Reads the answer table, which already holds these writes
+            return
+
+        preferences = decode_preferences(vector).copy()
+        for question_id, choice in changes:
+            slot = bank.slots.get(question_id)
+            if slot is not None:
+                preferences[slot] = np.nan if choice is None else CHOICE_WEIGHTS[choice]
+        _store(vector, preferences, bank)
+
+
+def invalidate_profile_vectors(user_ids, using: str) -> None:
+    """
+    Force a rebuild on next read, for writes that bypass ``apply_profile_changes``
+
+    ``user_ids`` may be a list or a ``values('user_id')`` queryset of rows on database ``using``.
+    """
+    UserProfileVector.objects.using(using).filter(user_id__in=user_ids).update(layout='')
+
+
+def profile_answers(vector: UserProfileVector, bank: QuestionBank) -> List[Tuple[int, str, str]]:
+    """
+    ``(question_id, category, choice)`` of every answered slot of a current vector
+    """
+    preferences = decode_preferences(vector)
+    return [
+        (bank.slot_ids[slot], bank.slot_categories[slot], CHOICES_BY_WEIGHT[float(preferences[slot])])
+        for slot in np.flatnonzero(~np.isnan(preferences))
+    ]
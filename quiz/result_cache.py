@@ -0,0 +1,57 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+from django.conf import settings
+
+
+def answer_fingerprint(answer_choices: Dict[str, str], catalog_version: int) -> str:
+    """
+    Digest of a user's (question_id, choice) pairs and the catalog version they were scored against
+    """
+    digest = hashlib.sha1(str(catalog_version).encode())
+    for question_id, choice in sorted(answer_choices.items(), key=lambda item: int(item[0])):
+        digest.update(f'|{question_id}:{choice}'.encode())
+    return digest.hexdigest()
+
+
+class AnalysisResultCache:
+    """
+    Process-local LRU of each user's last analysis result, valid only for the fingerprint it was stored with
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (fingerprint, result)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: Hashable, fingerprint: str):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != fingerprint:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id: Hashable, fingerprint: str, result) -> None:
+        with self._lock:
+            self._entries[user_id] = (fingerprint, result)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+analysis_results = AnalysisResultCache(getattr(settings, 'QUIZ_ANALYSIS_CACHE_SIZE', 10000))
+
@@ -0,0 +1,182 @@
+"""
+Population rollups kept up to date as deltas of answer and recommendation writes
+
+``QuestionChoiceCount`` counts users per question and choice, ``CareerTopCount``
+users per career among their top ``TOP_CAREERS`` recommendations. Writers report
+what changed and the deltas are applied once their transaction commits, as short
+``users = users + delta`` updates, so a popular question's row is never locked
+for the length of a submission. ``reconcile_rollups`` rebuilds both tables.
+"""
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+
+from .catalog import get_career_catalog, get_question_bank
+from .models import CareerRecommendation, CareerTopCount, QuestionChoiceCount
+from .scoring import get_match_matrix, rank_career_ids
+
+TOP_CAREERS = 5
+
+
+def top_career_ids(scores: Iterable[Tuple[int, float]]) -> List[int]:
+    """
+    Career ids of the top recommendations among ``(career_id, match_score)`` pairs
+
+    Ranked like the analyzer ranks them, so these are the careers the user was shown.
+    """
+    return rank_career_ids(scores, get_match_matrix().career_columns)[:TOP_CAREERS]
+
+
+def _apply_deltas(model, key_fields: Tuple[str, ...], deltas: Dict, using: str) -> None:
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(partial(_write_deltas, model, key_fields, deltas), using=using)
+
+
+def _write_deltas(model, key_fields: Tuple[str, ...], deltas: Dict) -> None:
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            _upsert_deltas(model, key_fields, deltas)
+    except IntegrityError:
+        # A question or career was deleted between the write and its commit: its counts went with it
+        with transaction.atomic(using=router.db_for_write(model)):
+            _upsert_deltas(model, key_fields, _deltas_of_existing_rows(model, key_fields, deltas))
+
+
+def _upsert_deltas(model, key_fields: Tuple[str, ...], deltas: Dict) -> None:
+    # Rows appear on their first increment; a decrement without a row has nothing to undo
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key, delta in deltas.items() if delta > 0],
+        ignore_conflicts=True,
+    )
+    # One UPDATE per distinct delta and leading key, e.g. +1/-1 per choice for a submission
+    grouped = defaultdict(list)
+    for key, delta in deltas.items():
+        grouped[delta, key[:-1]].append(key[-1])
+    for (delta, prefix), last in grouped.items():
+        filters = dict(zip(key_fields[:-1], prefix))
+        filters[f'{key_fields[-1]}__in'] = last
+        model.objects.filter(**filters).update(users=F('users') + delta)
+
+
+def _deltas_of_existing_rows(model, key_fields: Tuple[str, ...], deltas: Dict) -> Dict:
+    for index, name in enumerate(key_fields):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            ids = {key[index] for key in deltas}
+            existing = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            deltas = {key: delta for key, delta in deltas.items() if key[index] in existing}
+    return deltas
+
+
+def apply_choice_changes(changes: Iterable[Tuple[int, Optional[str], Optional[str]]], using: str) -> None:
+    """
+    Move users between choices for ``(question_id, previous choice, choice)`` changes; None is no answer
+    """
+    deltas = Counter()
+    for question_id, previous, choice in changes:
+        if previous == choice:
+            continue
+        if previous is not None:
+            deltas[question_id, previous] -= 1
+        if choice is not None:
+            deltas[question_id, choice] += 1
+    apply_choice_deltas(deltas, using)
+
+
+def apply_choice_deltas(deltas: Dict[Tuple[int, str], int], using: str) -> None:
+    """
+    Add ``(question_id, choice) -> delta`` to the choice counts
+    """
+    _apply_deltas(
+        QuestionChoiceCount,
+        ('choice', 'question_id'),
+        {(choice, question_id): delta for (question_id, choice), delta in deltas.items()},
+        using,
+    )
+
+
+def apply_top_career_changes(deltas: Dict[int, int], using: str) -> None:
+    """
+    Add ``career_id -> delta`` to the careers' top recommendation counts
+    """
+    _apply_deltas(CareerTopCount, ('career_id',), {(career_id,): delta for career_id, delta in deltas.items()}, using)
+
+
+def top_career_deltas(previous: Iterable[int], current: Iterable[int], deltas: Optional[Counter] = None) -> Counter:
+    """
+    Count one user's top careers moving from ``previous`` to ``current`` into ``deltas``
+    """
+    deltas = Counter() if deltas is None else deltas
+    previous, current = set(previous), set(current)
+    for career_id in previous - current:
+        deltas[career_id] -= 1
+    for career_id in current - previous:
+        deltas[career_id] += 1
+    return deltas
+
+
+def forget_top_careers(user_id: int, using: str) -> None:
+    """
+    Take a user about to be deleted out of the top recommendation counts
+    """
+    scores = CareerRecommendation.objects.for_user(user_id).values_list('career_id', 'match_score')
+    apply_top_career_changes(top_career_deltas(top_career_ids(scores), []), using)
+
+
+def promote_next_careers(career_ids: Iterable[int], using: str) -> None:
+    """
+    Count the careers moving up for every user who had any of ``career_ids``, about to be deleted, among their top ones
+    """
+    career_ids = set(career_ids)
+    deltas = Counter()
+    for recommendations in CareerRecommendation.objects.on_every_shard():
+        affected = recommendations.filter(career_id__in=career_ids).values('user_id')
+        rows = (
+            recommendations.filter(user_id__in=affected).order_by('user_id')
+            .values_list('user_id', 'career_id', 'match_score').iterator(chunk_size=2000)
+        )
+        for _, user_rows in groupby(rows, key=lambda row: row[0]):
+            scores = [(other_id, score) for _, other_id, score in user_rows]
+            top = top_career_ids(scores)
+            if career_ids.intersection(top):
+                remaining = top_career_ids(score for score in scores if score[0] not in career_ids)
+                top_career_deltas(top, remaining, deltas)
+    # The deleted careers' own counts go with them
+    apply_top_career_changes({career_id: delta for career_id, delta in deltas.items() if career_id not in career_ids}, using)
+
+
+def get_population_stats() -> Dict:
+    """
+    Users per choice of every answered question and per career among top recommendations
+    """
+    texts = get_question_bank().texts
+    questions = {}
+    for question_id, choice, users in QuestionChoiceCount.objects.filter(users__gt=0).values_list('question_id', 'choice', 'users'):
+        questions.setdefault(question_id, {})[choice] = users
+
+    careers = get_career_catalog().careers
+    top_counts = CareerTopCount.objects.filter(users__gt=0).order_by('-users', 'career_id').values_list('career_id', 'users')
+    return {
+        'questions': [
+            {
+                'question_id': question_id,
+                'text': texts.get(question_id, ''),
+                'choices': choices,
+                'total': sum(choices.values()),
+            }
+            for question_id, choices in sorted(questions.items())
+        ],
+        'careers': [
+            {
+                'career_id': career_id,
+                'name': careers[career_id].name if career_id in careers else '',
+                'top_recommendations': users,
+            }
+            for career_id, users in top_counts
+        ],
+    }
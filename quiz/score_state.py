@@ -0,0 +1,112 @@
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from career_advisor.sharding import user_db
+from django.db import transaction
+
+from .catalog import get_question_bank
+from .models import Answer, UserScoreState
+from .profile_vector import load_profile_vector, profile_answers
+from .scoring import CHOICE_WEIGHTS, CATEGORY_ORDER, MatchMatrix, get_match_matrix
+
+# float32 keeps the sums exact: choice weights are multiples of 0.5 far below 2**23
+
+
+def _decode(data, careers: int) -> np.ndarray:
+    return np.frombuffer(bytes(data), dtype=np.float32).reshape(len(CATEGORY_ORDER), careers).astype(np.float64)
+
+
+def _encode(array: np.ndarray) -> bytes:
+    return array.astype(np.float32).tobytes()
+
+
+def accumulators(state: UserScoreState, matrix: MatchMatrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode a current state into the (totals, matched, answered) arguments of ``MatchMatrix.normalize``
+    """
+    careers = len(matrix.career_ids)
+    return (
+        _decode(state.totals, careers),
+        _decode(state.matched, careers),
+        matrix.answered_categories(int(question_id) for question_id in state.answer_choices),
+    )
+
+
+def _rebuild(state: UserScoreState, matrix: MatchMatrix, answers: Optional[List[Tuple[int, str]]] = None) -> UserScoreState:
+    if answers is None:
+        answers = list(Answer.objects.for_user(state.user_id).order_by().values_list('question_id', 'choice'))
+    totals, matched, _ = matrix.accumulate(answers, CHOICE_WEIGHTS)
+    state.catalog_version = matrix.version
+    state.answer_choices = {str(question_id): choice for question_id, choice in answers}
+    state.totals = _encode(totals)
+    state.matched = _encode(matched)
+    state.save()
+    return state
+
+
+def load_score_state(user_id: int, matrix: Optional[MatchMatrix] = None) -> UserScoreState:
+    """
+    Return the user's score state, rebuilding it from their answers when missing or stale
+    """
+    matrix = matrix or get_match_matrix()
+    state = UserScoreState.objects.for_user(user_id).first()
+    if state is not None and state.catalog_version == matrix.version:
+        return state
+    with transaction.atomic(using=user_db(user_id)):
+        state, _ = UserScoreState.objects.shard(user_id).select_for_update().get_or_create(user_id=user_id)
+        if state.catalog_version == matrix.version:
+            return state  # Rebuilt by a concurrent request
+        # Catalog changes mostly leave the questions alone, and with them the profile vector
+        bank = get_question_bank()
+        answers = [(question_id, choice) for question_id, _, choice in profile_answers(load_profile_vector(user_id, bank), bank)]
+        return _rebuild(state, matrix, answers)
+
+
+def apply_answer_changes(user_id: int, changes: Iterable[Tuple[int, Optional[str]]]) -> None:
+    """
+    Move answers' contributions to new choices (None removes one) by subtracting the old weight and adding the new
+    """
+    matrix = get_match_matrix()
+    with transaction.atomic(using=user_db(user_id)):
+        # get_or_create so concurrent first answers serialize on the same row
+        state, _ = UserScoreState.objects.shard(user_id).select_for_update().get_or_create(user_id=user_id)
+        if state.catalog_version != matrix.version:
+            _rebuild(state, matrix)  # Reads the answer table, which already holds these writes
+            return
+
+        totals = matched = None
+        for question_id, choice in changes:
+            key = str(question_id)
+            old_choice = state.answer_choices.get(key)
+            if old_choice == choice:
+                continue
+            if totals is None:
+                totals, matched, _ = accumulators(state, matrix)
+            if old_choice is not None:
+                matrix.apply_answer(totals, matched, question_id, CHOICE_WEIGHTS[old_choice], sign=-1)
+                del state.answer_choices[key]
+            if choice is not None:
+                matrix.apply_answer(totals, matched, question_id, CHOICE_WEIGHTS[choice])
+                state.answer_choices[key] = choice
+
+        if totals is None:
+            return
+        state.totals = _encode(totals)
+        state.matched = _encode(matched)
+        state.save(update_fields=['answer_choices', 'totals', 'matched', 'updated_at'])
+
+
+def apply_answer_change(user_id: int, question_id: int, choice: Optional[str]) -> None:
+    """
+    Single-answer form of ``apply_answer_changes``
+    """
+    apply_answer_changes(user_id, [(question_id, choice)])
+
+
+def invalidate_score_states(user_ids, using: str) -> None:
+    """
+    Force a rebuild on next read, for writes that bypass ``apply_answer_changes``
+
+    ``user_ids`` may be a list or a ``values('user_id')`` queryset of rows on database ``using``.
+    """
+    UserScoreState.objects.using(using).filter(user_id__in=user_ids).update(catalog_version=0)
@@ -0,0 +1,200 @@
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+import numpy as np
+
+from .catalog import VersionedCache
+
+CATEGORY_ORDER = ('interest', 'degree', 'career')
+CATEGORY_WEIGHTS = np.array([0.4, 0.3, 0.3])
+CHOICE_WEIGHTS = {
+    'strongly_dislike': -2,
+    'dislike': -1,
+    'neutral': 0,
+    'like': 1,
+    'strongly_like': 2
+}
+
+
+class RankedCareer(NamedTuple):
+    career_id: int
+    score: float  # Clamped to 10-100
+    category_scores: Tuple[float, float, float]  # Interest, degree, career
+
+
+class MatchMatrix:
+    """
+    Dense question x career match weights for one catalog version
+
+    Rows follow ``question_ids`` and columns follow ``career_ids`` (catalog order).
+    Scoring a user is a (categories x questions) choice-weight matrix times this
+    matrix followed by the per-category normalization of ``CareerAnalyzer``.
+    """
+
+    def __init__(self, version, question_ids: List[int], question_categories: List[str],
+                 career_ids: List[int], weights: np.ndarray):
+        self.version = version
+        self.question_ids = question_ids
+        self.question_index = {question_id: row for row, question_id in enumerate(question_ids)}
+        self.question_categories = np.array(
+            [CATEGORY_ORDER.index(category) for category in question_categories], dtype=np.intp
+        )
+        self.career_ids = np.array(career_ids, dtype=np.int64)
+        self.career_columns = {career_id: column for column, career_id in enumerate(career_ids)}
+        self.weights = weights
+        self.matched = (weights != 0).astype(np.float64)
+
+    @classmethod
+    def build(cls, version=None) -> 'MatchMatrix':
+        """
+        Build the matrix from the persisted QuestionCareerMatch index
+        """
+        # Imported here so worker processes can unpickle a matrix without Django set up
+        from .models import Question, Career, QuestionCareerMatch
+
+        questions = list(Question.objects.filter(category__in=CATEGORY_ORDER).values_list('id', 'category'))
+        career_ids = list(Career.objects.values_list('id', flat=True))
+        question_rows = {question_id: row for row, (question_id, _) in enumerate(questions)}
+        career_columns = {career_id: column for column, career_id in enumerate(career_ids)}
+
+        weights = np.zeros((len(questions), len(career_ids)), dtype=np.float64)
+        matches = QuestionCareerMatch.objects.values_list('question_id', 'career_id', 'weight')
+        for question_id, career_id, weight in matches.iterator(chunk_size=10000):
+            row = question_rows.get(question_id)
+            column = career_columns.get(career_id)
+            if row is not None and column is not None:
+                weights[row, column] = weight
+
+        return cls(
+            version,
+            [question_id for question_id, _ in questions],
+            [category for _, category in questions],
+            career_ids,
+            weights,
+        )
+
+    def accumulate(self, answers: Iterable[Tuple[int, str]], choice_weights: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sum one user's (question_id, choice) answers into per-category accumulators
+
+        Returns the (3 x careers) choice-weighted match sums, the (3 x careers)
+        matched answer counts and which of the 3 categories have any answers.
+        """
+        choice_vector = np.zeros((len(CATEGORY_ORDER), len(self.question_ids)), dtype=np.float64)
+        answered = np.zeros_like(choice_vector)
+        for question_id, choice in answers:
+            row = self.question_index.get(question_id)
+            if row is None:
+                continue
+            category = self.question_categories[row]
+            choice_vector[category, row] = choice_weights[choice]
+            answered[category, row] = 1.0
+
+        return choice_vector @ self.weights, answered @ self.matched, answered.any(axis=1)
+
+    def apply_answer(self, totals: np.ndarray, matched: np.ndarray, question_id: int, choice_weight: float, sign: int = 1) -> bool:
+        """
+        Add (``sign=1``) or subtract (``sign=-1``) one answer in place; False for unknown questions
+        """
+        row = self.question_index.get(question_id)
+        if row is None:
+            return False
+        category = self.question_categories[row]
+        totals[category] += sign * choice_weight * self.weights[row]
+        matched[category] += sign * self.matched[row]
+        return True
+
+    def answered_categories(self, question_ids: Iterable[int]) -> np.ndarray:
+        """
+        Which of the 3 categories the given questions cover
+        """
+        answered = np.zeros(len(CATEGORY_ORDER), dtype=bool)
+        for question_id in question_ids:
+            row = self.question_index.get(question_id)
+            if row is not None:
+                answered[self.question_categories[row]] = True
+        return answered
+
+    def normalize(self, totals: np.ndarray, matched: np.ndarray, answered: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Turn accumulators into the unclamped 0-100 scores and the (3 x careers) category scores
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = np.maximum(0, (totals / matched + 2) * 2.5)
+        # Unmatched categories get a small base score, unanswered ones get nothing
+        category_scores = np.where(matched > 0, np.maximum(1.0, normalized), 1.0)
+        category_scores[~answered] = 0.0
+
+        total = category_scores[0] * CATEGORY_WEIGHTS[0]
+        total = total + category_scores[1] * CATEGORY_WEIGHTS[1]
+        total = total + category_scores[2] * CATEGORY_WEIGHTS[2]
+        return (total / 10) * 100, category_scores
+
+    def score(self, answers: Iterable[Tuple[int, str]], choice_weights: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every career for one user's (question_id, choice) answers
+        """
+        return self.normalize(*self.accumulate(answers, choice_weights))
+
+    def rank(self, answers: Iterable[Tuple[int, str]], choice_weights: Dict[str, int], limit: int = 10) -> List[RankedCareer]:
+        """
+        Return the ``limit`` best careers for one user's answers, highest score first
+        """
+        return self.rank_scores(*self.score(answers, choice_weights), limit=limit)
+
+    def rank_scores(self, scores: np.ndarray, category_scores: np.ndarray, limit: int = 10) -> List[RankedCareer]:
+        """
+        Return the ``limit`` best careers for already computed scores, highest score first
+        """
+        # Rank on the clamped scores, stable so ties keep catalog order: rank_career_ids, vectorized
+        ranking = np.argsort(-np.clip(scores, 10, 100), kind='stable')[:limit]
+        return [
+            RankedCareer(
+                int(self.career_ids[column]),
+                min(100, max(10, float(scores[column]))),
+                tuple(float(value) for value in category_scores[:, column]),
+            )
+            for column in ranking
+        ]
+
+
+def rank_career_ids(scores: Iterable[Tuple[int, float]], career_columns: Dict[int, int]) -> List[int]:
+    """
+    Career ids of ``(career_id, score)`` pairs in ``MatchMatrix.rank_scores`` order
+
+    Highest clamped score first, ties in catalog order (``MatchMatrix.career_columns``);
+    careers no longer in the catalog after every other, by id.
+    """
+    unknown = len(career_columns)
+    ranked = sorted(
+        scores, key=lambda item: (-min(100, max(10, item[1])), career_columns.get(item[0], unknown), item[0])
+    )
+    return [career_id for career_id, _ in ranked]
+
+
+_match_matrix = VersionedCache(MatchMatrix.build)
+
+
+def get_match_matrix() -> MatchMatrix:
+    """
+    Return the process-wide match matrix, rebuilding it when the catalog version changes
+    """
+    return _match_matrix.get()
+
+_worker_state = {}
+
+
+def init_rank_worker(matrix: MatchMatrix, choice_weights: Dict[str, int]) -> None:
+    """
+    Process pool initializer: receive the shared matrix once per worker
+    """
+    _worker_state['matrix'] = matrix
+    _worker_state['choice_weights'] = choice_weights
+
+
+def rank_users(batch: List[Tuple[int, List[Tuple[int, str]]]], limit: int = 10) -> List[Tuple[int, List[RankedCareer]]]:
+    """
+    Rank careers for (user_id, answers) pairs inside a worker process
+    """
+    matrix = _worker_state['matrix']
+    choice_weights = _worker_state['choice_weights']
+    return [(user_id, matrix.rank(answers, choice_weights, limit)) for user_id, answers in batch]
@@ -1,27 +1,55 @@
 from rest_framework import serializers
 from .models import Question, Answer, Career, CareerRecommendation
 
+class SparseFieldsMixin:
+    """
+    Serialize only the names passed as ``fields=[...]``, and say which columns they need
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    def get_only_fields(self):
+        """
+        ``only()`` paths and ``select_related()`` relations read by the remaining fields
+        """
+        columns = []
+        related = set()
+        for field in self.fields.values():
+            if field.source == '*':
+                continue
+            path = field.source.replace('.', '__')
+            columns.append(path)
+            if '__' in path:
+                related.add(path.rsplit('__', 1)[0])
+        # A relation that is followed must be loaded too, even if its own field was dropped
+        columns += [relation for relation in sorted(related) if relation not in columns]
+        return columns, sorted(related)
+
 class QuestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
         fields = ['id', 'text', 'category', 'created_at']
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     question_text = serializers.CharField(source='question.text', read_only=True)
-    question_category = serializers.CharField(source='question.category', read_only=True)
+    question_category = serializers.CharField(source='category', read_only=True)
     
     class Meta:
         model = Answer
         fields = ['id', 'question', 'question_text', 'question_category', 'user', 'choice', 'created_at']
         read_only_fields = ['user']
 
-class CareerSerializer(serializers.ModelSerializer):
+class CareerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Career
         fields = ['id', 'name', 'category', 'description', 'required_skills', 'interest_keywords', 
                  'degree_requirements', 'salary_range', 'growth_prospects', 'work_environment', 'created_at']
 
-class CareerRecommendationSerializer(serializers.ModelSerializer):
+class CareerRecommendationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     career_name = serializers.CharField(source='career.name', read_only=True)
     career_category = serializers.CharField(source='career.category', read_only=True)
     career_description = serializers.CharField(source='career.description', read_only=True)
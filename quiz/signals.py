@@ -0,0 +1,210 @@
+import weakref
+
+from career_advisor.sharding import shard_aliases, user_db
+from django.conf import settings
+from django.db.models import Count, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import Signal, receiver
+
+from .catalog import bump_catalog_version, forget_catalog_version
+from .match_index import rebuild_question_matches, rebuild_career_matches
+from .matcher import reset_career_matcher
+from .models import Question, Answer, Career, CareerRecommendation, UserProfileVector, UserScoreState
+from .profile_vector import apply_profile_changes, invalidate_profile_vectors
+from .result_cache import analysis_results
+from .rollups import apply_choice_changes, apply_choice_deltas, forget_top_careers, promote_next_careers
+from .score_state import apply_answer_change, apply_answer_changes, invalidate_score_states
+
+# Sent by bulk answer writes that bypass post_save, with user_id and
+# changes=[(question_id, previous_choice or None, choice)]
+answers_saved = Signal()
+# Sent by Answer deletes (instance and queryset) right before the rows go, with
+# answers=the queryset of rows being deleted; Answer has no per-row delete signals
+answers_deleted = Signal()
+
+QUESTION_MATCH_FIELDS = {'text', 'category'}
+CAREER_MATCH_FIELDS = {'name', 'interest_keywords', 'degree_requirements', 'required_skills'}
+
+
+@receiver(post_save, sender=Question)
+def update_question_matches(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-index one question against every career when its text or category changes"""
+    if raw:
+        return
+    if update_fields is None or QUESTION_MATCH_FIELDS & set(update_fields):
+        rebuild_question_matches(instance)
+    bump_catalog_version()
+    analysis_results.clear()
+
+
+@receiver(post_save, sender=Question)
+def update_answer_categories(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Keep the category copied onto answers in step with a recategorized question"""
+    if raw or created or (update_fields is not None and 'category' not in update_fields):
+        return
+    for answers in Answer.objects.on_every_shard():
+        answers.filter(question=instance).exclude(category=instance.category).update(category=instance.category)
+
+
+@receiver(post_save, sender=Career)
+def update_career_matches(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-index one career against every question when its match terms change"""
+    if raw:
+        return
+    if update_fields is None or CAREER_MATCH_FIELDS & set(update_fields):
+        reset_career_matcher()
+        rebuild_career_matches(instance)
+    bump_catalog_version()
+    analysis_results.clear()
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Career)
+def invalidate_catalog(sender, **kwargs):
+    """Index rows of deleted rows go with the CASCADE; only the version needs a bump"""
+    if sender is Career:
+        reset_career_matcher()
+    bump_catalog_version()
+    analysis_results.clear()
+
+
+@receiver(post_migrate)
+def reread_catalog_version(sender, **kwargs):
+    """A migrated or flushed database may hold a different version row than the one last read"""
+    forget_catalog_version()
+
+
+@receiver(post_save, sender=Answer)
+def update_profile_vector(sender, instance, raw=False, **kwargs):
+    """Write a created or changed answer into the user's profile vector"""
+    if raw:
+        return
+    apply_profile_changes(instance.user_id, [(instance.question_id, instance.choice)])
+
+
+@receiver(answers_saved, sender=Answer)
+def update_profile_vector_bulk(sender, user_id, changes, **kwargs):
+    """Write a bulk answer submission into the user's profile vector in one write"""
+    apply_profile_changes(user_id, [(question_id, choice) for question_id, _, choice in changes])
+
+
+@receiver(post_save, sender=Answer)
+def update_score_state(sender, instance, raw=False, **kwargs):
+    """Fold a created or changed answer into the user's score accumulators"""
+    if raw:
+        return
+    apply_answer_change(instance.user_id, instance.question_id, instance.choice)
+
+
+@receiver(answers_saved, sender=Answer)
+def update_score_state_bulk(sender, user_id, changes, **kwargs):
+    """Fold a bulk answer submission into the user's score accumulators in one write"""
+    apply_answer_changes(user_id, [(question_id, choice) for question_id, _, choice in changes])
+
+
+@receiver(answers_deleted, sender=Answer)
+def reset_derived_answer_state(sender, answers, **kwargs):
+    """Mark the score states and profile vectors of every user losing answers stale, one update each"""
+    user_ids = answers.order_by().values('user_id')
+    invalidate_score_states(user_ids, using=answers.db)
+    invalidate_profile_vectors(user_ids, using=answers.db)
+
+
+@receiver(pre_save, sender=Answer)
+def remember_previous_choice(sender, instance, raw=False, **kwargs):
+    """Note the stored choice a save replaces, for the choice counts"""
+    instance._previous_choice = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_choice = getattr(instance, '_stored_choice', None)
+    if instance._previous_choice is None:
+        # Built by hand rather than loaded (or loaded without its choice): read it back
+        instance._previous_choice = (
+            Answer.objects.shard(instance.user_id).filter(pk=instance.pk).values_list('choice', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Answer)
+def count_saved_choice(sender, instance, raw=False, **kwargs):
+    """Move the user to the answer's new choice in the question's choice counts"""
+    if raw:
+        return
+    changes = [(instance.question_id, getattr(instance, '_previous_choice', None), instance.choice)]
+    apply_choice_changes(changes, using=instance._state.db)
+    instance._stored_choice = instance.choice
+
+
+@receiver(answers_deleted, sender=Answer)
+def count_deleted_choices(sender, answers, **kwargs):
+    """Take deleted answers out of the choice counts with one grouped count"""
+    deltas = {
+        (question_id, choice): -users
+        for question_id, choice, users in answers.order_by().values_list('question_id', 'choice').annotate(Count('id'))
+    }
+    apply_choice_deltas(deltas, using=answers.db)
+
+
+@receiver(answers_saved, sender=Answer)
+def count_saved_choices(sender, user_id, changes, **kwargs):
+    """Apply a bulk answer submission to the choice counts"""
+    apply_choice_changes(changes, using=user_db(user_id))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_answers(sender, instance, **kwargs):
+    """Delete the user's answers in bulk up front, so the cascade finds nothing left to do per row"""
+    Answer.objects.for_user(instance.pk).delete()
+    analysis_results.discard(instance.pk)
+
+
+@receiver(pre_delete, sender=Question)
+def delete_question_answers(sender, instance, **kwargs):
+    """Delete the question's answers on every shard in bulk; the ORM cascade only reaches its own database"""
+    for answers in Answer.objects.on_every_shard():
+        answers.filter(question_id=instance.pk).delete()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def uncount_user_top_careers(sender, instance, **kwargs):
+    """The user's recommendations go next; count them out of the top careers while they can be read"""
+    forget_top_careers(instance.pk, using=instance._state.db)
+
+
+# Deletes whose careers were already counted out, so a queryset delete is handled once for the batch
+_promoted_deletes = weakref.WeakSet()
+
+
+@receiver(pre_delete, sender=Career)
+def count_promoted_careers(sender, instance, origin=None, **kwargs):
+    """Users who had deleted careers among their top ones see their next careers move up"""
+    if isinstance(origin, QuerySet) and origin.model is Career:
+        if origin in _promoted_deletes:
+            return
+        _promoted_deletes.add(origin)
+        career_ids = origin.values_list('pk', flat=True)  # The batch's rows are all still there
+    else:
+        career_ids = [instance.pk]
+    promote_next_careers(career_ids, using=instance._state.db)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(answers_saved, sender=Answer)
+def forget_analysis_result(sender, **kwargs):
+    """A changed answer set never matches the stored fingerprint again; free its slot now"""
+    instance = kwargs.get('instance')
+    analysis_results.discard(instance.user_id if instance is not None else kwargs['user_id'])
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=Career)
+def delete_sharded_rows(sender, instance, **kwargs):
+    """The ORM cascade only reaches rows in the deleted row's database; repeat it on the user shards"""
+    if not shard_aliases():
+        return
+    if sender is Career:
+        for recommendations in CareerRecommendation.objects.on_every_shard():
+            recommendations.filter(career_id=instance.pk).delete()
+    else:
+        # Answers already went in bulk before the delete
+        for model in (CareerRecommendation, UserScoreState, UserProfileVector):
+            model.objects.for_user(instance.pk).delete()
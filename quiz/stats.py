@@ -0,0 +1,65 @@
+from typing import Dict
+
+from career_advisor.sharding import shard_aliases
+from django.core.cache import cache
+from django.db.models import Count, F, Func, IntegerField, Q, Subquery
+
+from .catalog import get_catalog_version
+
+# Keyed by the shared catalog version, so question and career counts follow a
+# catalog change in any process within QUIZ_CATALOG_VERSION_TTL; answer
+# and recommendation counts move with every submission, so they are only as
+# fresh as this timeout
+QUIZ_STATS_KEY = 'quiz:stats:{version}'
+QUIZ_STATS_TIMEOUT = 60
+
+
+class _RowCount(Subquery):
+    """
+    ``(SELECT COUNT(id) FROM ...)`` of a queryset, which ``aggregate()`` accepts next to its ``Count``s
+    """
+    contains_aggregate = True
+
+    def __init__(self, queryset):
+        rows = Func(F('id'), function='COUNT', output_field=IntegerField())
+        super().__init__(queryset.order_by().annotate(rows=rows).values('rows'), output_field=IntegerField())
+
+
+def _compute_quiz_stats() -> Dict:
+    from .models import Question, Answer, Career, CareerRecommendation
+
+    categories = [category for category, _ in Question.CATEGORY_CHOICES]
+    counts = {
+        'total_questions': Count('id'),
+        **{category: Count('id', filter=Q(category=category)) for category in categories},
+        'total_careers': _RowCount(Career.objects.all()),
+    }
+    sharded = bool(shard_aliases())
+    if not sharded:
+        counts['total_answers'] = _RowCount(Answer.objects.all())
+        counts['total_recommendations'] = _RowCount(CareerRecommendation.objects.all())
+    # One query for every count in 'default'
+    counts = Question.objects.aggregate(**counts)
+    if sharded:
+        # Answers and recommendations also live on the user shards: one count per shard and model
+        counts['total_answers'] = sum(answers.count() for answers in Answer.objects.on_every_shard())
+        counts['total_recommendations'] = sum(rows.count() for rows in CareerRecommendation.objects.on_every_shard())
+    return {
+        'total_questions': counts['total_questions'],
+        'questions_by_category': {category: counts[category] for category in categories},
+        'total_careers': counts['total_careers'],
+        'total_answers': counts['total_answers'],
+        'total_recommendations': counts['total_recommendations'],
+    }
+
+
+def get_quiz_stats() -> Dict:
+    """
+    Return question, career, answer and recommendation counts, cached per catalog version
+    """
+    key = QUIZ_STATS_KEY.format(version=get_catalog_version())
+    stats = cache.get(key)
+    if stats is None:
+        stats = _compute_quiz_stats()
+        cache.set(key, stats, timeout=QUIZ_STATS_TIMEOUT)
+    return stats
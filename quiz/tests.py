@@ -1,3 +1,1255 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import signal
+import tempfile
+from collections import Counter
+from importlib import import_module
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .career_analysis import CareerAnalyzer
+from .catalog import get_career_catalog, get_catalog_version, get_question_bank
+from .jobs import claim_analysis_job, enqueue_analysis, fail_stale_jobs, run_analysis_job
+from .match_index import question_career_match
+from .models import (
+    AnalysisJob, Question, Answer, Career, CareerRecommendation, CareerTopCount, QuestionCareerMatch, QuestionChoiceCount,
+    UserProfileVector, UserScoreState,
+)
+from .pagination import AnswerPagination
+from .profile_vector import load_profile_vector, profile_answers
+from .result_cache import AnalysisResultCache, analysis_results
+from .rollups import apply_top_career_changes, top_career_ids
+from .score_state import accumulators, load_score_state
+from .scoring import CHOICE_WEIGHTS, get_match_matrix
+from .stats import get_quiz_stats
+
+User = get_user_model()
+
+
+def _reference_category_score(answers, matches):
+    """The pre-matrix per-category loop: average matched choice weight scaled to 1-10, 0 without answers"""
+    if not answers:
+        return 0
+    total_score = 0
+    matched_answers = 0
+    for question_text, choice in answers:
+        weight = matches(question_text)
+        if weight is not None:
+            total_score += CHOICE_WEIGHTS[choice] * weight
+            matched_answers += 1
+    if matched_answers == 0:
+        return 1.0
+    return max(1.0, max(0, (total_score / matched_answers + 2) * 2.5))
+
+
+def _reference_career_score(answers_by_category, career):
+    """
+    Score one career by substring matching every answer's question text, as CareerAnalyzer did before the match matrix
+
+    Returns ``(score clamped to 10-100, (interest, degree, career) category scores)``.
+    """
+    def first_hit(terms, weight=1.0):
+        return lambda text: weight if any(term.lower() in text for term in terms) else None
+
+    def career_hit(text):
+        if career.name.lower() in text:
+            return 1.0
+        return first_hit(career.required_skills, 0.5)(text)
+
+    category_scores = (
+        _reference_category_score(answers_by_category['interest'], first_hit(career.interest_keywords)),
+        _reference_category_score(answers_by_category['degree'], first_hit(career.degree_requirements)),
+        _reference_category_score(answers_by_category['career'], career_hit),
+    )
+    total = category_scores[0] * 0.4 + category_scores[1] * 0.3 + category_scores[2] * 0.3
+    return min(100, max(10, (total / 10) * 100)), category_scores
+
+
+class AnswerCategoryTests(TestCase):
+    """The question category copied onto answers: backfilled by migration 0008, then kept in step"""
+
+    def setUp(self):
+        self.questions = [
+            Question.objects.create(text=f'Question {i}', category=category)
+            for i, category in enumerate(['interest', 'degree', 'career'])
+        ]
+        self.users = [User.objects.create(username=f'categorized{i}') for i in range(2)]
+        for user in self.users:
+            for question in self.questions:
+                Answer.objects.create(question=question, user=user, choice='like')
+
+    def _categories(self):
+        return {(answer.user_id, answer.question_id): answer.category for answer in Answer.objects.all()}
+
+    def _expected(self):
+        categories = dict(Question.objects.values_list('id', 'category'))
+        return {(user.pk, question.pk): categories[question.pk] for user in self.users for question in self.questions}
+
+    def test_new_answers_copy_their_question_category(self):
+        self.assertEqual(self._categories(), self._expected())
+
+    def test_migration_backfills_the_category(self):
+        backfill = import_module('quiz.migrations.0008_answer_category').copy_question_category
+        Answer.objects.update(category='')
+
+        backfill(django_apps, None)
+        self.assertEqual(self._categories(), self._expected())
+
+    def test_recategorized_questions_carry_their_answers_along(self):
+        question = self.questions[0]
+        question.category = 'career'
+        question.save()
+        self.assertEqual(self._categories(), self._expected())
+
+        question.category = 'degree'
+        question.save(update_fields=['category'])
+        self.assertEqual(self._categories(), self._expected())
+        self.assertEqual(Answer.objects.filter(category='degree').count(), 4)
+
+    def test_saves_without_the_category_leave_answers_alone(self):
+        question = self.questions[1]
+        question.text = 'Question renamed'
+        with CaptureQueriesContext(connection) as queries:
+            question.save(update_fields=['text'])
+        self.assertFalse([query for query in queries if 'quiz_answer' in query['sql']])
+        self.assertEqual(self._categories(), self._expected())
+
+
+class CareerAnalyzerQueryCountTests(TestCase):
+    def _build_catalog(self, careers, questions):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(careers):
+                Career.objects.create(
+                    name=f'Career {i}',
+                    category='Test',
+                    description='Test career',
+                    required_skills=[f'skill{i}'],
+                    interest_keywords=[f'topic{i}'],
+                    degree_requirements=[f'degree{i}'],
+                    growth_prospects='high',
+                )
+            for i in range(questions):
+                category = ('interest', 'degree', 'career')[i % 3]
+                Question.objects.create(text=f'Question about topic{i} degree{i} skill{i}', category=category)
+
+    def _count_analysis_queries(self, answers):
+        user = User.objects.create(username=f'user{answers}')
+        for question in Question.objects.all()[:answers]:
+            Answer.objects.create(question=question, user=user, choice='like')
+
+        analyzer = CareerAnalyzer()
+        analyzer.analyze_user_responses(user)  # Warm the catalog matrix
+        analysis_results.clear()  # Score again rather than reuse the memoized result
+        with CaptureQueriesContext(connection) as queries:
+            analyzer.analyze_user_responses(user)
+        return len(queries)
+
+    def test_query_count_is_independent_of_catalog_and_answer_size(self):
+        self._build_catalog(careers=12, questions=6)
+        small = self._count_analysis_queries(answers=3)
+
+        self._build_catalog(careers=200, questions=60)
+        large = self._count_analysis_queries(answers=60)
+
+        self.assertEqual(small, large)
+
+
+class AsyncViewParityTests(TransactionTestCase):
+    def setUp(self):
+        for i in range(8):
+            Career.objects.create(
+                name=f'Career {i}',
+                category='Test',
+                description='Test career',
+                required_skills=[f'skill{i % 3}'],
+                interest_keywords=[f'topic{i % 4}'],
+                degree_requirements=[f'degree{i % 2}'],
+                growth_prospects='high',
+            )
+        self.questions = [
+            Question.objects.create(
+                text=f'Career {i} topic{i % 4} degree{i % 2} skill{i % 3}',
+                category=('interest', 'degree', 'career')[i % 3],
+            )
+            for i in range(9)
+        ]
+
+    def _auth(self, username):
+        user = User.objects.create(username=username)
+        return {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    async def test_async_views_match_sync_views(self):
+        answers = {'answers': [
+            {'question': question.id, 'choice': ('like', 'dislike', 'strongly_like')[i % 3]}
+            for i, question in enumerate(self.questions)
+        ] + [{'question': 0, 'choice': 'like'}]}
+        sync_headers = await sync_to_async(self._auth)('sync')
+        async_headers = await sync_to_async(self._auth)('async')
+        client = Client()
+        async_client = AsyncClient()
+
+        for path, method, data in [
+            ('answers/submit/', 'post', answers),
+            ('analyze/', 'post', None),
+            ('recommendations/', 'get', None),
+        ]:
+            kwargs = {'data': data, 'content_type': 'application/json'} if data else {}
+            sync_response = await sync_to_async(getattr(client, method))(
+                f'/api/quiz/{path}', headers=sync_headers, **kwargs
+            )
+            async_response = await getattr(async_client, method)(
+                f'/api/quiz/async/{path}', headers=async_headers, **kwargs
+            )
+            self.assertEqual(sync_response.status_code, async_response.status_code)
+            self.assertEqual(self._comparable(sync_response.json()), self._comparable(async_response.json()))
+
+    def _comparable(self, data):
+        # Row ids, owners and timestamps differ between the two users; everything else must match
+        for item in data.get('created_answers', []) + data.get('recommendations', []):
+            for field in ('id', 'user', 'created_at'):
+                item.pop(field, None)
+        return data
+
+
+class MatchMatrixParityTests(TestCase):
+    """The match matrix and score states must score exactly like the substring loop they replaced"""
+
+    VOCABULARY = ['design', 'Finance', 'biology', 'law', 'B.Tech', 'MBBS', 'teaching', 'data', 'art', 'sales']
+
+    def _build_catalog(self, rng):
+        Question.objects.all().delete()
+        Career.objects.all().delete()
+        for i in range(rng.randint(8, 20)):
+            Career.objects.create(
+                name=rng.choice(['Engineer', 'Lawyer', 'Doctor', 'Designer', 'Analyst']) + f' {i}',
+                category='Test',
+                description='Test career',
+                required_skills=rng.sample(self.VOCABULARY, rng.randint(0, 3)),
+                interest_keywords=rng.sample(self.VOCABULARY, rng.randint(0, 3)),
+                degree_requirements=rng.sample(self.VOCABULARY, rng.randint(0, 2)),
+                growth_prospects='high',
+            )
+        names = list(Career.objects.values_list('name', flat=True))
+        for i in range(rng.randint(6, 24)):
+            words = rng.sample(self.VOCABULARY + names, rng.randint(0, 3))
+            Question.objects.create(
+                text=f'Question {i}: {" and ".join(words).upper() if i % 4 == 0 else " and ".join(words)}?',
+                category=rng.choice(['interest', 'degree', 'career']),
+            )
+
+    def _reference(self, user):
+        answers_by_category = {'interest': [], 'degree': [], 'career': []}
+        for answer in Answer.objects.filter(user=user).select_related('question'):
+            answers_by_category[answer.question.category].append((answer.question.text.lower(), answer.choice))
+        return {career.id: _reference_career_score(answers_by_category, career) for career in Career.objects.all()}
+
+    def _assert_parity(self, user, analyzer):
+        reference = self._reference(user)
+        matrix = get_match_matrix()
+        scores, category_scores = matrix.normalize(*accumulators(load_score_state(user.pk, matrix), matrix))
+        for column, career_id in enumerate(matrix.career_ids):
+            expected_score, expected_categories = reference[int(career_id)]
+            self.assertAlmostEqual(min(100, max(10, scores[column])), expected_score, places=9)
+            for value, expected in zip(category_scores[:, column], expected_categories):
+                self.assertAlmostEqual(value, expected, places=9)
+            self.assertEqual(
+                analyzer._build_reasoning(*category_scores[:, column]),
+                analyzer._build_reasoning(*expected_categories),
+            )
+
+        # Ties keep catalog order, as the stable sort over Career.objects.all() did
+        ranked = sorted(reference, key=lambda career_id: reference[career_id][0], reverse=True)
+        career_scores = analyzer.score_user(user)
+        self.assertEqual([item['career'].id for item in career_scores], ranked[:10])
+
+    def test_scores_match_the_substring_loop(self):
+        analyzer = CareerAnalyzer()
+        for seed in range(6):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                self._build_catalog(rng)
+                user = User.objects.create(username=f'parity{seed}')
+                answers = [
+                    Answer.objects.create(question=question, user=user, choice=rng.choice(list(CHOICE_WEIGHTS)))
+                    for question in Question.objects.all() if rng.random() < 0.8
+                ]
+                self._assert_parity(user, analyzer)
+
+                # Edits and deletes go through the incremental score state
+                for answer in rng.sample(answers, len(answers) // 3):
+                    answer.choice = rng.choice(list(CHOICE_WEIGHTS))
+                    answer.save()
+                self._assert_parity(user, analyzer)
+                for answer in rng.sample(answers, len(answers) // 4):
+                    answer.delete()
+                self._assert_parity(user, analyzer)
+
+
+class MatchIndexTests(TestCase):
+    """Catalog saves re-index only their own rows, and rebuild_match_index reproduces the same index"""
+
+    def setUp(self):
+        self.careers = [
+            Career.objects.create(
+                name=name, category='Test', description='Test career', growth_prospects='high',
+                required_skills=skills, interest_keywords=keywords, degree_requirements=degrees,
+            )
+            for name, skills, keywords, degrees in [
+                ('Engineer', ['math'], ['building'], ['B.Tech']),
+                ('Lawyer', ['debate'], ['justice'], ['LLB']),
+                ('Doctor', ['biology'], ['healing'], ['MBBS']),
+            ]
+        ]
+        self.questions = [
+            Question.objects.create(text=text, category=category)
+            for text, category in [
+                ('Do you enjoy building things?', 'interest'),
+                ('Do you care about justice and healing?', 'interest'),
+                ('Would you study for a B.Tech or an LLB?', 'degree'),
+                ('Could you work as a Lawyer, using math?', 'career'),
+            ]
+        ]
+
+    def _index(self):
+        return {
+            (row.question_id, row.career_id): (row.id, row.category, row.match_kind, row.weight)
+            for row in QuestionCareerMatch.objects.all()
+        }
+
+    def _expected(self):
+        expected = {}
+        for question in Question.objects.all():
+            for career in Career.objects.all():
+                match = question_career_match(question.category, question.text.lower(), career)
+                if match is not None:
+                    expected[question.id, career.id] = (question.category, *match)
+        return expected
+
+    def _assert_index_matches_catalog(self):
+        self.assertEqual({key: row[1:] for key, row in self._index().items()}, self._expected())
+
+    def _assert_only_rebuilt(self, before, affected):
+        after = self._index()
+        self._assert_index_matches_catalog()
+        for key, row in before.items():
+            if not affected(key):
+                self.assertEqual(after.get(key), row)
+        for key, row in after.items():
+            if not affected(key):
+                self.assertEqual(before.get(key), row)
+
+    def test_saving_a_question_reindexes_only_that_question(self):
+        self._assert_index_matches_catalog()
+        question = self.questions[1]
+        before = self._index()
+
+        question.text = 'Do you care about building justice?'
+        question.save()
+        self._assert_only_rebuilt(before, lambda key: key[0] == question.id)
+
+        # A recategorized question matches by another rule
+        before = self._index()
+        question.category = 'career'
+        question.text = 'Would you like to be a Doctor?'
+        question.save(update_fields=['text', 'category'])
+        self._assert_only_rebuilt(before, lambda key: key[0] == question.id)
+        self.assertEqual(self._index()[question.id, self.careers[2].id][2:], ('career_name', 1.0))
+
+    def test_saving_a_career_reindexes_only_that_career(self):
+        career = self.careers[0]
+        before = self._index()
+
+        # Renamed: the career question now matches it by name, no longer by its skill
+        career.name = 'Lawyer Engineer'
+        career.save()
+        self._assert_only_rebuilt(before, lambda key: key[1] == career.id)
+        self.assertEqual(self._index()[self.questions[3].id, career.id][2:], ('skill', 0.5))
+
+        before = self._index()
+        career.interest_keywords = ['justice']
+        career.degree_requirements = []
+        career.save(update_fields=['interest_keywords', 'degree_requirements'])
+        self._assert_only_rebuilt(before, lambda key: key[1] == career.id)
+        self.assertNotIn((self.questions[0].id, career.id), self._index())
+        self.assertIn((self.questions[1].id, career.id), self._index())
+
+    def test_saves_of_other_fields_leave_the_index_alone(self):
+        before = self._index()
+        self.careers[1].description = 'Argues cases'
+        self.careers[1].save(update_fields=['description'])
+        self.questions[0].save(update_fields=['created_at'])
+        self.assertEqual(self._index(), before)
+
+    def test_rebuild_match_index_reproduces_the_index(self):
+        before = {key: row[1:] for key, row in self._index().items()}
+        self.assertTrue(before)
+        QuestionCareerMatch.objects.all().delete()
+
+        call_command('rebuild_match_index', batch_size=2, stdout=StringIO())
+        self.assertEqual({key: row[1:] for key, row in self._index().items()}, before)
+        self._assert_index_matches_catalog()
+
+
+class SaveRecommendationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='saver')
+        self.careers = [
+            Career.objects.create(name=f'Career {i}', category='Test', description='Test career', growth_prospects='high')
+            for i in range(4)
+        ]
+
+    def _scores(self, *scores):
+        return [
+            {'career': career, 'score': score, 'reasoning': f'score {score}'}
+            for career, score in zip(self.careers, scores) if score is not None
+        ]
+
+    def _stored(self):
+        return {
+            recommendation.career_id: (recommendation.match_score, recommendation.created_at)
+            for recommendation in CareerRecommendation.objects.filter(user=self.user)
+        }
+
+    def test_only_changed_rows_are_written(self):
+        analyzer = CareerAnalyzer()
+        self.assertTrue(analyzer._save_recommendations(self.user, self._scores(90, 80, 70)))
+        before = self._stored()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(analyzer._save_recommendations(self.user, self._scores(90, 80, 70)))
+        self.assertFalse([query for query in queries if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))])
+        self.assertEqual(self._stored(), before)
+
+        # One score changes, one career drops out and one comes in
+        self.assertTrue(analyzer._save_recommendations(self.user, self._scores(90, 85, None, 60)))
+        after = self._stored()
+        self.assertEqual(set(after), {self.careers[0].id, self.careers[1].id, self.careers[3].id})
+        self.assertEqual(after[self.careers[0].id], before[self.careers[0].id])
+        self.assertEqual(after[self.careers[1].id][0], 85)
+        self.assertGreater(after[self.careers[1].id][1], before[self.careers[1].id][1])
+
+
+class AnalysisMemoTests(TestCase):
+    def setUp(self):
+        analysis_results.clear()
+        self.addCleanup(analysis_results.clear)
+        for i in range(12):
+            Career.objects.create(
+                name=f'Career {i}', category='Test', description='Test career',
+                interest_keywords=[f'topic{i % 4}'], growth_prospects='high',
+            )
+        self.questions = [Question.objects.create(text=f'Question topic{i}', category='interest') for i in range(4)]
+        self.user = User.objects.create(username='memoized')
+        self.answers = [
+            Answer.objects.create(question=question, user=self.user, choice=choice)
+            for question, choice in zip(self.questions, ('strongly_like', 'like', 'dislike', 'neutral'))
+        ]
+        self.analyzer = CareerAnalyzer()
+
+    def _analyze(self):
+        """Recommended career ids, and whether the memoized result answered"""
+        with patch.object(CareerAnalyzer, 'score_user', side_effect=CareerAnalyzer.score_user, autospec=True) as scored:
+            recommendations = self.analyzer.analyze_user_responses(self.user)
+        return [row['career'].id for row in recommendations], not scored.called
+
+    def _stored(self):
+        return set(CareerRecommendation.objects.filter(user=self.user).values_list('career_id', 'match_score'))
+
+    def _choose(self, index, choice):
+        self.answers[index].choice = choice
+        self.answers[index].save()
+
+    def test_unchanged_answers_reuse_the_result_without_writes(self):
+        first, memoized = self._analyze()
+        self.assertFalse(memoized)
+        with CaptureQueriesContext(connection) as queries:
+            again, memoized = self._analyze()
+        self.assertTrue(memoized)
+        self.assertEqual(again, first)
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+
+    def test_answer_writes_and_catalog_changes_invalidate_the_result(self):
+        self._analyze()
+        self._choose(0, 'strongly_dislike')
+        self.assertFalse(self._analyze()[1])
+
+        self._analyze()
+        self.assertEqual(len(analysis_results), 1)
+        Career.objects.create(name='Career new', category='Test', description='Test career', growth_prospects='high')
+        self.assertEqual(len(analysis_results), 0)
+        self.assertFalse(self._analyze()[1])
+
+    def test_result_held_by_another_worker_still_saves_its_rows(self):
+        self._analyze()
+        first = self._stored()
+        fingerprint = UserScoreState.objects.get(user=self.user).saved_fingerprint
+        held = analysis_results.get(self.user.pk, fingerprint)
+
+        # X -> Y scored on another worker, then back to X on this one, which still holds X
+        self._choose(0, 'strongly_dislike')
+        self._analyze()
+        self.assertNotEqual(self._stored(), first)
+        self._choose(0, 'strongly_like')
+        analysis_results.put(self.user.pk, fingerprint, held)
+        self.assertTrue(self._analyze()[1])
+        self.assertEqual(self._stored(), first)
+
+        # Rows deleted behind the analyzer's back come back too
+        CareerRecommendation.objects.filter(user=self.user).delete()
+        recommendations, memoized = self._analyze()
+        self.assertTrue(memoized)
+        self.assertEqual(len(recommendations), 5)
+        self.assertEqual(self._stored(), first)
+
+    def test_cache_keeps_the_most_recently_used_entries(self):
+        cache = AnalysisResultCache(max_entries=2)
+        cache.put(1, 'a', 'one')
+        cache.put(2, 'b', 'two')
+        self.assertEqual(cache.get(1, 'a'), 'one')  # Now the most recent
+        cache.put(3, 'c', 'three')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(2, 'b'))
+        self.assertEqual(cache.get(1, 'a'), 'one')
+        self.assertIsNone(cache.get(1, 'other fingerprint'))
+        cache.put(1, 'd', 'four')
+        self.assertEqual((len(cache), cache.get(1, 'a'), cache.get(1, 'd')), (2, None, 'four'))
+
+
+class RecomputeRecommendationsTests(TestCase):
+    def setUp(self):
+        analysis_results.clear()
+        self.addCleanup(analysis_results.clear)
+        for i in range(12):
+            Career.objects.create(
+                name=f'Career {i}',
+                category='Test',
+                description='Test career',
+                required_skills=[f'skill{i % 3}'],
+                interest_keywords=[f'topic{i % 4}'],
+                degree_requirements=[f'degree{i % 2}'],
+                growth_prospects='high',
+            )
+        questions = [
+            Question.objects.create(
+                text=f'Career {i} topic{i % 4} degree{i % 2} skill{i % 3}',
+                category=('interest', 'degree', 'career')[i % 3],
+            )
+            for i in range(12)
+        ]
+        rng = random.Random(5)
+        self.users = [User.objects.create(username=f'recomputed{i}') for i in range(5)]
+        for user in self.users:
+            for question in rng.sample(questions, rng.randint(1, len(questions))):
+                Answer.objects.create(question=question, user=user, choice=rng.choice(list(CHOICE_WEIGHTS)))
+
+    def _stored(self):
+        return {
+            user.pk: {
+                (row.career_id, row.match_score, row.reasoning)
+                for row in CareerRecommendation.objects.filter(user=user)
+            }
+            for user in self.users
+        }
+
+    def _recompute(self, checkpoint, *args):
+        call_command('recompute_recommendations', '--chunk-size', '2', '--checkpoint', checkpoint, *args,
+                     stdout=StringIO())
+
+    def test_recomputed_rows_match_the_analyzer(self):
+        analyzer = CareerAnalyzer()
+        for user in self.users:
+            analyzer.analyze_user_responses(user)
+        expected = self._stored()
+        self.assertTrue(all(expected.values()))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in ['1', '2']:
+                with self.subTest(workers=workers):
+                    CareerRecommendation.objects.all().delete()
+                    checkpoint = f'{directory}/checkpoint-{workers}.json'
+                    self._recompute(checkpoint, '--workers', workers)
+                    self.assertEqual(self._stored(), expected)
+                    with open(checkpoint) as checkpoint_file:
+                        self.assertEqual(json.load(checkpoint_file)['last_user_id'], self.users[-1].pk)
+
+    def test_resume_skips_users_up_to_the_checkpoint(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = f'{directory}/checkpoint.json'
+            with open(checkpoint, 'w') as checkpoint_file:
+                json.dump({'last_user_id': self.users[2].pk}, checkpoint_file)
+
+            self._recompute(checkpoint, '--workers', '1', '--resume')
+            stored = self._stored()
+            self.assertEqual([bool(stored[user.pk]) for user in self.users], [False, False, False, True, True])
+
+            # A finished run resumes to nothing
+            CareerRecommendation.objects.all().delete()
+            self._recompute(checkpoint, '--workers', '1', '--resume')
+            self.assertFalse(any(self._stored().values()))
+
+
+class ScoreStateMaintenanceTests(TestCase):
+    def setUp(self):
+        for i in range(6):
+            Career.objects.create(
+                name=f'Career {i}',
+                category='Test',
+                description='Test career',
+                required_skills=[f'skill{i % 2}'],
+                interest_keywords=[f'topic{i % 3}'],
+                degree_requirements=[f'degree{i % 2}'],
+                growth_prospects='high',
+            )
+        self.questions = [
+            Question.objects.create(
+                text=f'Career {i} topic{i % 3} degree{i % 2} skill{i % 2}',
+                category=('interest', 'degree', 'career')[i % 3],
+            )
+            for i in range(12)
+        ]
+        self.user = User.objects.create(username='scored')
+
+    def _assert_state_matches_answers(self, incremental=True):
+        matrix = get_match_matrix()
+        state = UserScoreState.objects.get(user=self.user)
+        if incremental:
+            self.assertEqual(state.catalog_version, matrix.version)  # Kept current, not marked for a rebuild
+        state = load_score_state(self.user.pk, matrix)
+        answers = list(Answer.objects.filter(user=self.user).values_list('question_id', 'choice'))
+        self.assertEqual(state.answer_choices, {str(question_id): choice for question_id, choice in answers})
+        totals, matched, answered = matrix.accumulate(answers, CHOICE_WEIGHTS)
+        stored_totals, stored_matched, stored_answered = accumulators(state, matrix)
+        self.assertTrue((stored_totals == totals).all())
+        self.assertTrue((stored_matched == matched).all())
+        self.assertTrue((stored_answered == answered).all())
+
+    def test_answer_writes_update_the_state_incrementally(self):
+        answers = [
+            Answer.objects.create(question=question, user=self.user, choice='like')
+            for question in self.questions[:6]
+        ]
+        self._assert_state_matches_answers()
+
+        answers[0].choice = 'strongly_dislike'
+        answers[0].save()
+        answers[3].choice = 'neutral'
+        answers[3].save()
+        self._assert_state_matches_answers()
+
+        client = Client()
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        response = client.post('/api/quiz/answers/submit/', {'answers': [
+            {'question': question.id, 'choice': 'dislike'} for question in self.questions[4:10]
+        ]}, content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self._assert_state_matches_answers()
+
+    def test_deletes_mark_the_state_for_a_rebuild(self):
+        answers = [
+            Answer.objects.create(question=question, user=self.user, choice='strongly_like')
+            for question in self.questions
+        ]
+        answers[1].delete()
+        self._assert_state_matches_answers(incremental=False)
+
+        Answer.objects.filter(user=self.user, question__in=self.questions[5:8]).delete()
+        self._assert_state_matches_answers(incremental=False)
+
+        self.questions[9].delete()
+        self._assert_state_matches_answers(incremental=False)
+
+    def _count_user_delete_queries(self, answers):
+        user = User.objects.create(username=f'deleted{answers}')
+        for question in self.questions[:answers]:
+            Answer.objects.create(question=question, user=user, choice='like')
+        with CaptureQueriesContext(connection) as queries:
+            user.delete()
+        self.assertFalse(Answer.objects.filter(user_id=user.pk).exists())
+        return len(queries)
+
+    def test_user_delete_does_not_run_queries_per_answer(self):
+        self.assertEqual(self._count_user_delete_queries(2), self._count_user_delete_queries(12))
+
+
+class CareerCatalogConditionalTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            Career.objects.create(name=f'Career {i}', category='Test', description='Test career', growth_prospects='high')
+        self.client = Client()
+
+    def test_validators_only_describe_the_full_catalog(self):
+        response = self.client.get('/api/quiz/careers/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get('/api/quiz/careers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        for query in ('?fields=name', '?page_size=2', '?fields=nope'):
+            response = self.client.get(f'/api/quiz/careers/{query}', HTTP_IF_NONE_MATCH=etag)
+            self.assertIn(response.status_code, (200, 400), query)
+            self.assertFalse(response.has_header('ETag'), query)
+            self.assertFalse(response.has_header('Last-Modified'), query)
+        self.assertEqual(response.status_code, 400)
+
+        Career.objects.create(name='Career new', category='Test', description='Test career', growth_prospects='high')
+        response = self.client.get('/api/quiz/careers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        # Committed, as a catalog change only reaches the shared version cache once it commits
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                Question.objects.create(text=f'Question {i}', category=('interest', 'degree', 'career')[i % 3])
+            Career.objects.create(name='Career', category='Test', description='Test career', growth_prospects='high')
+        self.client = Client()
+
+    def _order(self, path='/api/quiz/questions/', user=None):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'} if user else {}
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return [question['id'] for question in response.json()]
+
+    def test_each_user_keeps_one_order(self):
+        first, second = User.objects.create(username='first'), User.objects.create(username='second')
+        order = self._order(user=first)
+        self.assertEqual(sorted(order), sorted(Question.objects.values_list('id', flat=True)))
+        self.assertEqual(self._order(user=first), order)
+        self.assertNotEqual(self._order(user=second), order)
+        self.assertEqual(self._order('/api/quiz/questions/?seed=abc'), self._order('/api/quiz/questions/?seed=abc'))
+
+        interest = self._order('/api/quiz/questions/interest/', user=first)
+        self.assertEqual(set(interest), set(Question.objects.filter(category='interest').values_list('id', flat=True)))
+        self.assertEqual(self._order('/api/quiz/questions/interest/', user=first), interest)
+
+    def test_warm_catalog_reads_run_no_queries(self):
+        paths = ['/api/quiz/questions/?seed=abc', '/api/quiz/questions/degree/', '/api/quiz/careers/', '/api/quiz/stats/']
+        for path in paths:
+            self.client.get(path)
+        for path in paths:
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+        # A committed catalog change reaches this process on the next request
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(text='Question new', category='degree')
+        self.assertIn(question.id, self._order('/api/quiz/questions/degree/'))
+
+
+class SubmitQuizAnswersTests(TestCase):
+    def setUp(self):
+        self.questions = [Question.objects.create(text=f'Question {i}', category='interest') for i in range(12)]
+        self.user = User.objects.create(username='submitter')
+        self.client = Client()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def _submit(self, answers):
+        return self.client.post(
+            '/api/quiz/answers/submit/', {'answers': answers}, content_type='application/json', headers=self.headers
+        )
+
+    def _stored(self):
+        return {
+            answer.question_id: answer
+            for answer in Answer.objects.filter(user=self.user)
+        }
+
+    def test_submit_upserts_every_answer(self):
+        existing = Answer.objects.create(question=self.questions[0], user=self.user, choice='like')
+
+        response = self._submit([
+            {'question': self.questions[0].id, 'choice': 'dislike'},
+            {'question': self.questions[1].id, 'choice': 'like'},
+            {'question': self.questions[1].id, 'choice': 'strongly_like'},  # Later items win
+            {'question': self.questions[2].id, 'choice': 'maybe'},
+            {'question': 999999, 'choice': 'like'},
+            {'choice': 'like'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_submitted'], 3)
+        self.assertEqual(len(data['errors']), 3)
+        self.assertTrue(any('999999' in error for error in data['errors']))
+
+        stored = self._stored()
+        self.assertEqual(
+            {question_id: answer.choice for question_id, answer in stored.items()},
+            {self.questions[0].id: 'dislike', self.questions[1].id: 'strongly_like'},
+        )
+        self.assertEqual(stored[self.questions[0].id].pk, existing.pk)
+        self.assertEqual(stored[self.questions[0].id].created_at, existing.created_at)
+        for answer in data['created_answers']:
+            self.assertEqual(answer['id'], stored[answer['question']].pk)
+
+    def _count_submit_queries(self, questions):
+        Answer.objects.filter(user=self.user).delete()
+        for question in questions[::2]:
+            Answer.objects.create(question=question, user=self.user, choice='neutral')
+        with CaptureQueriesContext(connection) as queries:
+            response = self._submit([{'question': question.id, 'choice': 'like'} for question in questions])
+        self.assertEqual(response.json()['total_submitted'], len(questions))
+        return len(queries)
+
+    def test_query_count_is_independent_of_answer_count(self):
+        self.assertEqual(self._count_submit_queries(self.questions[:4]), self._count_submit_queries(self.questions))
+
+
+class QuizStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_come_from_one_query_and_follow_the_catalog(self):
+        career = Career.objects.create(name='Career', category='Test', description='Test career', growth_prospects='high')
+        user = User.objects.create(username='counted')
+        with CaptureQueriesContext(connection) as queries:
+            stats = get_quiz_stats()
+        self.assertEqual(len(queries), 2)  # The catalog version and every count
+        self.assertEqual(stats['total_questions'], 0)  # No question rows, yet the other counts are there
+        self.assertEqual(stats['total_careers'], 1)
+
+        questions = [Question.objects.create(text=f'Question {i}', category=('interest', 'degree')[i % 2]) for i in range(3)]
+        for question in questions:
+            Answer.objects.create(question=question, user=user, choice='like')
+        CareerRecommendation.objects.create(user=user, career=career, match_score=50, reasoning='')
+        stats = get_quiz_stats()
+        self.assertEqual(stats['total_questions'], 3)
+        self.assertEqual(stats['questions_by_category'], {'interest': 2, 'degree': 1, 'career': 0})
+        self.assertEqual(stats['total_careers'], 1)
+        self.assertEqual(stats['total_answers'], 3)
+        self.assertEqual(stats['total_recommendations'], 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_quiz_stats(), stats)
+        self.assertEqual(len(queries), 1)  # Only the catalog version
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='paged')
+        self.client = Client()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        questions = [Question.objects.create(text=f'Question {i}', category='interest') for i in range(7)]
+        for question in questions:
+            Answer.objects.create(question=question, user=self.user, choice='like')
+        # Ties on the leading ordering column are broken by id
+        Answer.objects.filter(question__in=questions[2:5]).update(created_at=Answer.objects.get(question=questions[2]).created_at)
+        for i in range(7):
+            career = Career.objects.create(name=f'Career {i // 2}', category='Test', description=f'Career number {i}', growth_prospects='high')
+            CareerRecommendation.objects.create(user=self.user, career=career, match_score=10 * (i // 3), reasoning='')
+
+    def _walk(self, url, key, page_size=3):
+        rows = []
+        url = f'{url}?page_size={page_size}'
+        while url:
+            response = self.client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data[key]), page_size)
+            rows += data[key]
+            url = data['next']
+        return rows
+
+    def test_pages_cover_every_row_once_in_order(self):
+        answers = self._walk('/api/quiz/answers/my/', 'results')
+        expected = Answer.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual([answer['id'] for answer in answers], list(expected))
+
+        careers = self._walk('/api/quiz/careers/', 'careers')
+        self.assertEqual([career['id'] for career in careers], list(Career.objects.order_by('name', 'id').values_list('id', flat=True)))
+
+        recommendations = self._walk('/api/quiz/recommendations/', 'recommendations', page_size=2)
+        expected = CareerRecommendation.objects.filter(user=self.user).order_by('-match_score', 'id').values_list('id', flat=True)
+        self.assertEqual([recommendation['id'] for recommendation in recommendations], list(expected))
+
+        # Unpaginated requests keep their old shapes
+        self.assertEqual(len(self.client.get('/api/quiz/recommendations/', headers=self.headers).json()['recommendations']), 5)
+        self.assertEqual(len(self.client.get('/api/quiz/answers/my/', headers=self.headers).json()), 7)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/quiz/answers/my/?cursor=bm90IGpzb24', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+        # Tampered cursors: values that do not fit the ordering fields
+        paginator = AnswerPagination()
+        for path, cursors in [
+            ('/api/quiz/answers/my/', [['x', 1], ['2026-01-01T00:00:00+00:00', 'x']]),
+            ('/api/quiz/async/recommendations/', [['x', 1], [None, 1]]),
+            ('/api/quiz/careers/', [['Career 1', 'x']]),
+        ]:
+            for values in cursors + [[{'a': 1}, 1], ['Career 1', [1]], [1]]:
+                response = self.client.get(f'{path}?cursor={paginator.encode_cursor(values)}', headers=self.headers)
+                self.assertEqual(response.status_code, 404, (path, values))
+
+    def test_sparse_fields_load_only_what_they_return(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/quiz/answers/my/?fields=id,question_text&page_size=4', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([set(answer) for answer in results], [{'id', 'question_text'}] * 4)
+        selects = [query['sql'] for query in queries if 'quiz_answer' in query['sql']]
+        self.assertEqual(len(selects), 1)  # The question text is joined, not fetched per row
+        self.assertNotIn('"quiz_answer"."choice"', selects[0])
+
+        response = self.client.get('/api/quiz/recommendations/?fields=career_name,match_score', headers=self.headers)
+        self.assertEqual([set(row) for row in response.json()['recommendations']], [{'career_name', 'match_score'}] * 5)
+
+        response = self.client.get('/api/quiz/answers/my/?fields=id,nope', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class AnalysisJobTests(TransactionTestCase):
+    def setUp(self):
+        for i in range(4):
+            Career.objects.create(
+                name=f'Career {i}',
+                category='Test',
+                description='Test career',
+                required_skills=[f'skill{i % 2}'],
+                interest_keywords=[f'topic{i % 2}'],
+                growth_prospects='high',
+            )
+        self.questions = [
+            Question.objects.create(text=f'Career {i} topic{i % 2} skill{i % 2}', category=('interest', 'career')[i % 2])
+            for i in range(4)
+        ]
+        self.client = Client()
+
+    def _user_with_answers(self, username):
+        user = User.objects.create(username=username)
+        for i, question in enumerate(self.questions):
+            Answer.objects.create(question=question, user=user, choice=('like', 'dislike')[i % 2])
+        return user, {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+
+    def test_background_analysis_matches_the_synchronous_response(self):
+        user, headers = self._user_with_answers('queued')
+        response = self.client.post('/api/quiz/analyze/?background=1', headers=headers)
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'pending')
+        self.assertEqual(response['Location'], job['status_url'])
+        # Repeated requests while the job waits are merged into it
+        self.assertEqual(self.client.post('/api/quiz/analyze/?background=1', headers=headers).json()['job_id'], job['job_id'])
+
+        out = StringIO()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))  # The command installs its own
+        call_command('run_analysis_workers', '--once', '--concurrency=1', stdout=out)
+        self.assertIn('Processed 1 jobs', out.getvalue())
+
+        finished = self.client.get(job['status_url'], headers=headers).json()
+        self.assertEqual(finished['status'], 'done')
+        expected = self.client.post('/api/quiz/analyze/?background=0', headers=headers).json()
+        self.assertEqual(finished['result'], expected)
+
+        other_user, other_headers = self._user_with_answers('other')
+        self.assertEqual(self.client.get(job['status_url'], headers=other_headers).status_code, 404)
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        first, _ = self._user_with_answers('first')
+        second, _ = self._user_with_answers('second')
+        jobs = [enqueue_analysis(first), enqueue_analysis(second)]
+
+        claimed = [claim_analysis_job(), claim_analysis_job()]
+        self.assertEqual([job.pk for job in claimed], [job.pk for job in jobs])
+        self.assertIsNone(claim_analysis_job())
+        self.assertEqual(set(AnalysisJob.objects.values_list('status', flat=True)), {'running'})
+        # A new request while the first job runs queues another one
+        self.assertNotEqual(enqueue_analysis(first).pk, jobs[0].pk)
+
+        with patch.object(CareerAnalyzer, 'analyze_user_responses', side_effect=RuntimeError('boom')), \
+                self.assertLogs('quiz.jobs', 'ERROR'):
+            failed = run_analysis_job(claimed[0])
+        self.assertEqual(failed.status, 'failed')
+        self.assertEqual(AnalysisJob.objects.get(pk=failed.pk).error, 'RuntimeError: boom')
+
+        AnalysisJob.objects.filter(pk=claimed[1].pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(fail_stale_jobs(timedelta(minutes=10)), 1)
+        self.assertEqual(AnalysisJob.objects.get(pk=claimed[1].pk).status, 'failed')
+
+
+class ImportCatalogTests(TestCase):
+    def test_imported_careers_reach_catalog_and_analysis(self):
+        Career.objects.create(name='Old career', category='Test', description='Test career', growth_prospects='low')
+        question = Question.objects.create(text='Would you enjoy robotics?', category='interest')
+        user = User.objects.create(username='importer')
+        Answer.objects.create(question=question, user=user, choice='strongly_like')
+        analyzer = CareerAnalyzer()
+        self.assertEqual([row['career'].name for row in analyzer.analyze_user_responses(user)], ['Old career'])
+        version = get_catalog_version()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(json.dumps({
+                'name': 'Robotics Engineer', 'category': 'Engineering', 'growth_prospects': 'high',
+                'interest_keywords': ['robotics'],
+            }) + '\n')
+            source.flush()
+            call_command('import_catalog', 'careers', source.name, stdout=StringIO())
+
+        # Only the shared version moves; no process-local cache is reset by hand
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertIn('Robotics Engineer', [career.name for career in get_career_catalog().ordered])
+        names = [row['career'].name for row in analyzer.analyze_user_responses(user)]
+        self.assertEqual(names[0], 'Robotics Engineer')
+
+    def _import(self, kind, rows):
+        out, err = StringIO(), StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(''.join(json.dumps(row) + '\n' for row in rows))
+            source.flush()
+            call_command('import_catalog', kind, source.name, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_rows_with_wrongly_typed_fields_are_reported_as_invalid(self):
+        out, err = self._import('questions', [
+            {'text': 42, 'category': 'interest'},
+            {'text': 'Do you like maths?', 'category': ['interest']},
+            {'text': 'Do you like art?', 'category': 'interest'},
+        ])
+        self.assertIn('3 questions rows (1 created, 0 updated, 0 unchanged or duplicate, 2 invalid)', out)
+        self.assertIn('Line 1: text must be a string', err)
+        self.assertIn('Line 2: category must be a string', err)
+        self.assertEqual(list(Question.objects.values_list('text', flat=True)), ['Do you like art?'])
+
+        career = {'name': 'Painter', 'category': 'Arts', 'growth_prospects': 'low'}
+        out, err = self._import('careers', [
+            {**career, 'description': {'text': 'Paints'}},
+            {**career, 'interest_keywords': {'art': 1}},
+            {**career, 'required_skills': ['drawing', 3]},
+            career,
+        ])
+        self.assertIn('4 careers rows (1 created, 0 updated, 0 unchanged or duplicate, 3 invalid)', out)
+        self.assertIn('Line 2: interest_keywords must be a list of strings', err)
+        self.assertEqual(Career.objects.get().name, 'Painter')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='exported')
+        questions = [
+            Question.objects.create(text=f'Question {i}', category=('interest', 'degree')[i % 2]) for i in range(4)
+        ]
+        days = ['2025-01-10T08:00:00Z', '2025-01-10T23:30:00Z', '2025-01-11T00:00:00Z', '2025-01-12T12:00:00Z']
+        self.answers = []
+        for question, day in zip(questions, days):
+            answer = Answer.objects.create(question=question, user=self.user, choice='like')
+            Answer.objects.filter(pk=answer.pk).update(created_at=day)
+            self.answers.append(answer)
+        for i, category in enumerate(['Tech', 'Health', 'Tech']):
+            career = Career.objects.create(name=f'Career {i}', category=category, description='Test career', growth_prospects='high')
+            CareerRecommendation.objects.create(user=self.user, career=career, match_score=10 * i, reasoning=f'reason, {i}')
+        staff = User.objects.create(username='analyst', is_staff=True)
+        self.client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(staff)}'})
+
+    def _export(self, path, **params):
+        response = self.client.get(f'/api/quiz/exports/{path}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def _answer_ids(self, **params):
+        return [json.loads(line)['id'] for line in self._export('answers', **params).splitlines()]
+
+    def test_answers_stream_as_ndjson_with_filters(self):
+        ids = [answer.pk for answer in self.answers]
+        self.assertEqual(self._answer_ids(), ids)
+        row = json.loads(self._export('answers').splitlines()[0])
+        self.assertEqual(set(row), {'id', 'user_id', 'question_id', 'category', 'choice', 'created_at'})
+        self.assertEqual(self._answer_ids(category='degree'), ids[1::2])
+        # A date until includes that whole day; a datetime is exclusive
+        self.assertEqual(self._answer_ids(until='2025-01-10'), ids[:2])
+        self.assertEqual(self._answer_ids(until='2025-01-11T00:00:00Z'), ids[:2])
+        self.assertEqual(self._answer_ids(since='2025-01-11', until='2025-01-11'), ids[2:3])
+        self.assertEqual(self._answer_ids(since='2025-01-10T23:00:00+00:00'), ids[1:])
+
+    def test_recommendations_stream_as_csv(self):
+        response = self.client.get('/api/quiz/exports/recommendations/', {'output': 'csv', 'category': 'Tech'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="recommendations.csv"')
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['id', 'user_id', 'career_id', 'match_score', 'reasoning', 'created_at'])
+        self.assertEqual([row[4] for row in rows[1:]], ['reason, 0', 'reason, 2'])
+
+        out = StringIO()
+        call_command('export_data', 'recommendations', '--output=csv', '--category=Health', stdout=out, stderr=StringIO())
+        self.assertEqual([row[4] for row in csv.reader(StringIO(out.getvalue()))][1:], ['reason, 1'])
+
+    def test_exports_are_staff_only_and_validated(self):
+        self.assertEqual(Client().get('/api/quiz/exports/answers/').status_code, 401)
+        student = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'})
+        self.assertEqual(student.get('/api/quiz/exports/answers/').status_code, 403)
+        for params in ({'output': 'xml'}, {'since': 'last week'}, {'category': 'nope'}):
+            self.assertEqual(self.client.get('/api/quiz/exports/answers/', params).status_code, 400, params)
+
+
+class RollupMaintenanceTests(TransactionTestCase):
+    def setUp(self):
+        self.careers = [
+            Career.objects.create(
+                name=f'Career {i}',
+                category='Test',
+                description='Test career',
+                interest_keywords=[f'topic{i}'],
+                growth_prospects='high',
+            )
+            for i in range(8)
+        ]
+        self.questions = [
+            Question.objects.create(text=f'Question about topic{i}', category='interest') for i in range(8)
+        ]
+        self.users = [User.objects.create(username=f'counted{i}') for i in range(3)]
+
+    def _expected_counts(self):
+        choices = Counter(Answer.objects.values_list('question_id', 'choice'))
+        tops = Counter()
+        for user in self.users:
+            scores = CareerRecommendation.objects.filter(user_id=user.pk).values_list('career_id', 'match_score')
+            tops.update(top_career_ids(scores))
+        return choices, tops
+
+    def _assert_rollups_match(self):
+        choices, tops = self._expected_counts()
+        stored_choices = {
+            (question_id, choice): users
+            for question_id, choice, users in QuestionChoiceCount.objects.filter(users__gt=0).values_list('question_id', 'choice', 'users')
+        }
+        self.assertEqual(stored_choices, dict(choices))
+        self.assertEqual(dict(CareerTopCount.objects.filter(users__gt=0).values_list('career_id', 'users')), dict(tops))
+        out = StringIO()
+        call_command('reconcile_rollups', stdout=out)
+        self.assertEqual(out.getvalue().count('(0 corrected)'), 2, out.getvalue())
+
+    def _answer(self, user, choices):
+        for question, choice in zip(self.questions, choices):
+            Answer.objects.create(question=question, user=user, choice=choice)
+        CareerAnalyzer().analyze_user_responses(user)
+
+    def test_writes_and_deletes_keep_rollups_current(self):
+        choices = ['strongly_like', 'like', 'neutral', 'dislike', 'strongly_dislike', 'like', 'neutral', 'dislike']
+        for i, user in enumerate(self.users):
+            self._answer(user, choices[i:] + choices[:i])
+        self._assert_rollups_match()
+
+        answer = Answer.objects.get(user=self.users[0], question=self.questions[0])
+        answer.choice = 'strongly_dislike'
+        answer.save()
+        client = Client(headers={'Authorization': f'Bearer {AccessToken.for_user(self.users[1])}'})
+        client.post('/api/quiz/answers/submit/', {'answers': [
+            {'question': question.id, 'choice': 'strongly_like'} for question in self.questions[4:]
+        ]}, content_type='application/json')
+        for user in self.users[:2]:
+            CareerAnalyzer().analyze_user_responses(user)
+        self._assert_rollups_match()
+
+        Answer.objects.filter(user=self.users[2], question__in=self.questions[:2]).delete()
+        self._assert_rollups_match()
+
+        # Top careers of every user together with the careers next in line, in one batch
+        top = top_career_ids(CareerRecommendation.objects.filter(user=self.users[0]).values_list('career_id', 'match_score'))
+        Career.objects.filter(pk__in=top[:2] + [career.pk for career in self.careers[-2:]]).delete()
+        self._assert_rollups_match()
+        Career.objects.exclude(pk__in=top[:2]).first().delete()
+        self._assert_rollups_match()
+
+        self.users[0].delete()
+        self.users = self.users[1:]
+        self._assert_rollups_match()
+
+    def test_tied_scores_count_the_careers_users_were_shown(self):
+        # Catalog (name) order runs against id order, and no career matches the answer: every score ties
+        for i, career in enumerate(self.careers):
+            career.name = f'Career {len(self.careers) - i}'
+            career.save(update_fields=['name'])
+        question = Question.objects.create(text='Do you enjoy chess?', category='interest')
+        Answer.objects.create(question=question, user=self.users[0], choice='like')
+
+        shown = [row['career'].id for row in CareerAnalyzer().analyze_user_responses(self.users[0])]
+        self.assertEqual(shown, [career.pk for career in reversed(self.careers)][:5])
+        self.assertEqual(dict(CareerTopCount.objects.filter(users__gt=0).values_list('career_id', 'users')), dict.fromkeys(shown, 1))
+        self._assert_rollups_match()
+
+    def test_reconcile_corrects_drift(self):
+        self._answer(self.users[0], ['like'] * 8)
+        QuestionChoiceCount.objects.filter(question=self.questions[0]).update(users=5)
+        CareerTopCount.objects.all().delete()
+        out = StringIO()
+        call_command('reconcile_rollups', stdout=out)
+        self.assertIn('(1 corrected)', out.getvalue())
+        self.assertNotIn('career top counts (0 corrected)', out.getvalue())
+        self._assert_rollups_match()
+
+    def test_deltas_for_deleted_careers_are_dropped(self):
+        career_id = self.careers[0].pk
+        with transaction.atomic():
+            apply_top_career_changes({career_id: 1, self.careers[1].pk: 1}, using='default')
+            self.careers[0].delete()  # Gone before the deltas are written on commit
+        self.assertEqual(dict(CareerTopCount.objects.values_list('career_id', 'users')), {self.careers[1].pk: 1})
+
+
+class ProfileVectorTests(TestCase):
+    def setUp(self):
+        self.questions = [
+            Question.objects.create(text=f'Question {i}', category=('interest', 'degree', 'career')[i % 3]) for i in range(6)
+        ]
+        self.user = User.objects.create(username='vectored')
+
+    def _assert_vector_matches_answers(self):
+        bank = get_question_bank()
+        vector = load_profile_vector(self.user.pk, bank)
+        self.assertEqual(vector.layout, bank.layout)
+        self.assertEqual(
+            sorted((question_id, choice) for question_id, _, choice in profile_answers(vector, bank)),
+            sorted(Answer.objects.filter(user=self.user).values_list('question_id', 'choice')),
+        )
+
+    def test_vector_follows_answer_writes(self):
+        for question in self.questions[:4]:
+            Answer.objects.create(question=question, user=self.user, choice='like')
+        self._assert_vector_matches_answers()
+        answer = Answer.objects.get(user=self.user, question=self.questions[0])
+        answer.choice = 'strongly_dislike'
+        answer.save()
+        Answer.objects.filter(user=self.user, question=self.questions[1]).delete()
+        self._assert_vector_matches_answers()
+
+    def test_new_questions_change_the_layout(self):
+        Answer.objects.create(question=self.questions[0], user=self.user, choice='like')
+        layout = UserProfileVector.objects.get(user=self.user).layout
+
+        # Signalled: the version moves and stored vectors are laid out again on their next read
+        question = Question.objects.create(text='Question new', category='interest')
+        self.assertNotEqual(get_question_bank().layout, layout)
+        self._assert_vector_matches_answers()
+        Answer.objects.create(question=question, user=self.user, choice='dislike')
+        self._assert_vector_matches_answers()
+
+    def test_answers_to_questions_unknown_to_the_bank_are_kept(self):
+        Answer.objects.create(question=self.questions[0], user=self.user, choice='like')
+        get_question_bank()
+        # Bulk inserts skip post_save, so the catalog version does not move
+        question, = Question.objects.bulk_create([Question(text='Question bulk', category='career')])
+        Answer.objects.create(question=question, user=self.user, choice='strongly_like')
+
+        vector = UserProfileVector.objects.get(user=self.user)
+        bank = get_question_bank()
+        self.assertIn(question.pk, bank.slots)
+        self.assertEqual(vector.layout, bank.layout)
+        self.assertIn((question.pk, 'career', 'strongly_like'), profile_answers(vector, bank))
+        self._assert_vector_matches_answers()
@@ -5,13 +5,24 @@ from .views import (
     AnswerCreateView, 
     UserAnswersView,
     quiz_stats,
+    population_stats,
     submit_quiz_answers,
     analyze_career_recommendations,
+    get_analysis_job,
     get_user_recommendations,
     get_all_careers,
     get_disliked_careers,
+    export_answers,
+    export_recommendations,
     test_endpoint
 )
+from .async_views import (
+    analyze_career_recommendations_async,
+    get_user_recommendations_async,
+    submit_quiz_answers_async,
+    export_answers_async,
+    export_recommendations_async
+)
 
 urlpatterns = [
     # Questions
@@ -25,11 +36,24 @@ urlpatterns = [
     
     # Stats
     path('stats/', quiz_stats, name='quiz-stats'),
+    path('stats/population/', population_stats, name='population-stats'),
     
     # Career Analysis
     path('analyze/', analyze_career_recommendations, name='analyze-career-recommendations'),
+    path('analyze/jobs/<int:job_id>/', get_analysis_job, name='analysis-job-status'),
     path('recommendations/', get_user_recommendations, name='get-user-recommendations'),
     path('careers/', get_all_careers, name='get-all-careers'),
     path('disliked-careers/', get_disliked_careers, name='get-disliked-careers'),
     path('test/', test_endpoint, name='test-endpoint'),
+    
+    # Staff exports, streamed as NDJSON or CSV
+    path('exports/answers/', export_answers, name='export-answers'),
+    path('exports/recommendations/', export_recommendations, name='export-recommendations'),
+    
+    # Async variants, for ASGI deployments
+    path('async/answers/submit/', submit_quiz_answers_async, name='submit-quiz-answers-async'),
+    path('async/analyze/', analyze_career_recommendations_async, name='analyze-career-recommendations-async'),
+    path('async/recommendations/', get_user_recommendations_async, name='get-user-recommendations-async'),
+    path('async/exports/answers/', export_answers_async, name='export-answers-async'),
+    path('async/exports/recommendations/', export_recommendations_async, name='export-recommendations-async'),
 ]
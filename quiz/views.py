@@ -1,34 +1,86 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-import random
-from .models import Question, Answer, Career, CareerRecommendation
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from calendar import timegm
+import logging
+import re
+from career_advisor.db_routing import use_read_replica
+from career_advisor.sharding import is_sharded, shard_aliases, shard_for_user, user_db
+from .models import Question, Answer, Career, CareerRecommendation, AnalysisJob
 from .serializers import QuestionSerializer, AnswerSerializer, CareerSerializer, CareerRecommendationSerializer
-from .career_analysis import CareerAnalyzer
+from .career_analysis import CareerAnalyzer, format_recommendations
+from .catalog import get_career_catalog, get_question_bank
+from .exports import EXPORT_FORMATS, export_lines, parse_time_bound
+from .jobs import enqueue_analysis
+from .pagination import AnswerPagination, CareerPagination, RecommendationPagination
+from .rollups import get_population_stats
+from .signals import answers_saved
+from .stats import get_quiz_stats
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
+GZIP_RE = re.compile(r'\bgzip\b')
+
+def _question_order_seed(request):
+    """Seed that keeps one user's (or client session's) question order stable across reloads"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    seed = request.query_params.get('seed')
+    if seed:
+        return f'seed:{seed}'
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f'session:{session.session_key}'
+    return None
+
+def _sparse_fields(request, serializer_class):
+    """Field names asked for with ?fields=a,b,c, or None for all of them"""
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(serializer_class().fields)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"})
+    return fields
+
+def _sparse_queryset(queryset, serializer, paginator):
+    """Load only the columns the serializer and the pagination cursor read"""
+    columns, related = serializer.get_only_fields()
+    if shard_aliases() and is_sharded(queryset.model):
+        # Related catalog rows live in another database: a second query instead of a join
+        columns = [column for column in columns if '__' not in column]
+        return queryset.prefetch_related(*related).only(*columns, *paginator.ordering_fields)
+    return queryset.select_related(*related).only(*columns, *paginator.ordering_fields)
+
+@method_decorator(use_read_replica, name='list')
 class QuestionListView(generics.ListAPIView):
     serializer_class = QuestionSerializer
     
-    def get_queryset(self):
-        questions = list(Question.objects.all())
-        # Randomize the order of all questions
-        random.shuffle(questions)
-        return questions
+    def list(self, request, *args, **kwargs):
+        # Served from the pre-serialized question bank; no ORM or serializer work after warmup
+        return Response(get_question_bank().shuffled(seed=_question_order_seed(request)))
 
+@method_decorator(use_read_replica, name='list')
 class QuestionByCategoryView(generics.ListAPIView):
     serializer_class = QuestionSerializer
     
-    def get_queryset(self):
+    def list(self, request, *args, **kwargs):
         category = self.kwargs['category']
-        questions = list(Question.objects.filter(category=category))
-        # Randomize the order of questions within the category
-        random.shuffle(questions)
-        return questions
+        return Response(get_question_bank().shuffled(category, seed=_question_order_seed(request)))
 
 class AnswerCreateView(generics.CreateAPIView):
     queryset = Answer.objects.all()
@@ -38,39 +90,41 @@ class AnswerCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+@method_decorator(use_read_replica, name='list')
 class UserAnswersView(generics.ListAPIView):
     serializer_class = AnswerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AnswerPagination
     
     def get_queryset(self):
-        return Answer.objects.filter(user=self.request.user)
+        queryset = Answer.objects.for_user(self.request.user.pk)
+        return _sparse_queryset(queryset, self.get_serializer(), self.paginator)
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', _sparse_fields(self.request, self.serializer_class))
+        return super().get_serializer(*args, **kwargs)
 
 @api_view(['GET'])
+@use_read_replica
 def quiz_stats(request):
     """Get quiz statistics"""
-    total_questions = Question.objects.count()
-    questions_by_category = {}
-    
-    for category, _ in Question.CATEGORY_CHOICES:
-        count = Question.objects.filter(category=category).count()
-        questions_by_category[category] = count
-    
+    stats = get_quiz_stats()
     return Response({
-        'total_questions': total_questions,
-        'questions_by_category': questions_by_category,
+        **stats,
         'choice_options': [choice[0] for choice in Answer.CHOICE_CHOICES]
     })
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def submit_quiz_answers(request):
-    """Submit multiple quiz answers at once"""
-    answers_data = request.data.get('answers', [])
-    user = request.user
-    
-    created_answers = []
+@api_view(['GET'])
+@use_read_replica
+def population_stats(request):
+    """Get users per choice of every question and per career among top-5 recommendations"""
+    return Response(get_population_stats())
+
+def _check_answer_items(answers_data):
+    """Check every submitted item's shape and choice; returns (pending, errors)"""
+    valid_choices = {choice for choice, _ in Answer.CHOICE_CHOICES}
+    pending = []
     errors = []
-    
     for answer_data in answers_data:
         try:
             question_id = answer_data.get('question')
@@ -79,23 +133,103 @@ def submit_quiz_answers(request):
             if not question_id or not choice:
                 errors.append(f"Missing question or choice for answer: {answer_data}")
                 continue
-                
-            # Get or create answer
-            answer, created = Answer.objects.get_or_create(
-                question_id=question_id,
-                user=user,
-                defaults={'choice': choice}
-            )
             
-            if not created:
-                # Update existing answer
-                answer.choice = choice
-                answer.save()
+            if choice not in valid_choices:
+                errors.append(f"Invalid choice for answer: {answer_data}")
+                continue
             
-            created_answers.append(AnswerSerializer(answer).data)
+            pending.append((answer_data, int(question_id), choice))
             
         except Exception as e:
             errors.append(f"Error processing answer {answer_data}: {str(e)}")
+    return pending, errors
+
+def _answered_questions(user, pending):
+    """Submitted questions by id, each carrying the user's existing answer_id/answer_choice/answer_created_at"""
+    questions = Question.objects.filter(id__in={question_id for _, question_id, _ in pending}).only('id', 'text', 'category')
+    if shard_for_user(user.pk) is None:
+        # One query validating every question id and fetching the user's existing answers
+        existing = Answer.objects.filter(question=OuterRef('pk'), user=user)
+        questions = questions.annotate(
+            answer_id=Subquery(existing.values('id')[:1]),
+            answer_choice=Subquery(existing.values('choice')[:1]),
+            answer_created_at=Subquery(existing.values('created_at')[:1]),
+        )
+        return {question.id: question for question in questions}
+    
+    # The user's answers live on their shard: one query there for the existing ones
+    questions = {question.id: question for question in questions}
+    existing = {
+        question_id: (answer_id, choice, created_at)
+        for question_id, answer_id, choice, created_at in Answer.objects.for_user(user.pk).filter(
+            question_id__in=list(questions)
+        ).values_list('question_id', 'id', 'choice', 'created_at')
+    }
+    for question_id, question in questions.items():
+        question.answer_id, question.answer_choice, question.answer_created_at = existing.get(question_id, (None, None, None))
+    return questions
+
+def _valid_answers(pending, questions, errors):
+    valid = []
+    for answer_data, question_id, choice in pending:
+        if question_id not in questions:
+            errors.append(f"Error processing answer {answer_data}: Question {question_id} does not exist")
+            continue
+        valid.append((question_id, choice))
+    return valid
+
+def _save_answers(user, questions, valid):
+    """Upsert valid (question_id, choice) pairs and return them serialized"""
+    # Later items for the same question win, as with one save per item
+    final_choices = dict(valid)
+    with transaction.atomic(using=user_db(user.pk)):
+        Answer.objects.shard(user.pk).bulk_create(
+            [
+                Answer(question_id=question_id, user=user, category=questions[question_id].category, choice=choice)
+                for question_id, choice in final_choices.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['question', 'user'],
+            update_fields=['choice']
+        )
+        new_question_ids = [question_id for question_id in final_choices if questions[question_id].answer_id is None]
+        created = {}
+        if new_question_ids:
+            created = {
+                question_id: (answer_id, created_at)
+                for question_id, answer_id, created_at in Answer.objects.for_user(user.pk).filter(
+                    question_id__in=new_question_ids
+                ).values_list('question_id', 'id', 'created_at')
+            }
+        answers_saved.send(
+            sender=Answer,
+            user_id=user.pk,
+            changes=[
+                (question_id, questions[question_id].answer_choice, choice)
+                for question_id, choice in final_choices.items()
+            ]
+        )
+    
+    answers = []
+    for question_id, choice in valid:
+        question = questions[question_id]
+        answer_id, created_at = created.get(question_id, (question.answer_id, question.answer_created_at))
+        answers.append(Answer(
+            id=answer_id, question=question, user=user, category=question.category, choice=choice, created_at=created_at
+        ))
+    return AnswerSerializer(answers, many=True).data
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_quiz_answers(request):
+    """Submit multiple quiz answers at once"""
+    user = request.user
+    
+    # Check every item's shape before touching the database
+    pending, errors = _check_answer_items(request.data.get('answers', []))
+    questions = _answered_questions(user, pending)
+    valid = _valid_answers(pending, questions, errors)
+    created_answers = _save_answers(user, questions, valid) if valid else []
     
     return Response({
         'created_answers': created_answers,
@@ -103,81 +237,130 @@ def submit_quiz_answers(request):
         'total_submitted': len(created_answers)
     })
 
+def _analysis_in_background(request):
+    """?background=1/0 picks the mode per request; QUIZ_ANALYSIS_JOBS is the default"""
+    value = request.query_params.get('background')
+    if value is None:
+        return getattr(settings, 'QUIZ_ANALYSIS_JOBS', False)
+    return value.lower() in ('1', 'true', 'yes')
+
+def _job_data(request, job):
+    data = {
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('analysis-job-status', args=[job.id])),
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == 'done':
+        data['result'] = job.result
+    elif job.status == 'failed':
+        data['error'] = job.error
+    return data
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def analyze_career_recommendations(request):
     """Analyze user's quiz responses and return career recommendations"""
     user = request.user
-    print(f"Analyzing career recommendations for user: {user.username}")
+    logger.debug("Analyzing career recommendations", extra={'user_id': user.pk})
     
     # Check if user has completed the quiz
-    user_answers = Answer.objects.filter(user=user)
-    print(f"Found {user_answers.count()} answers for user")
-    
-    if not user_answers.exists():
-        print("No answers found for user")
+    if not Answer.objects.for_user(user.pk).exists():
+        logger.info("Analysis requested without quiz answers", extra={'user_id': user.pk})
         return Response({
             'error': 'No quiz responses found. Please complete the quiz first.'
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    if _analysis_in_background(request):
+        job = enqueue_analysis(user)
+        logger.info("Queued analysis job", extra={'user_id': user.pk, 'job_id': job.id})
+        data = _job_data(request, job)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+    
     # Analyze responses
-    print("Starting career analysis...")
     analyzer = CareerAnalyzer()
     recommendations = analyzer.analyze_user_responses(user)
-    print(f"Analysis complete. Found {len(recommendations)} recommendations")
+    logger.info("Analysis complete", extra={'user_id': user.pk, 'recommendations': len(recommendations)})
     
-    # Format response
-    formatted_recommendations = []
-    for rec in recommendations:
-        career = rec['career']
-        formatted_recommendations.append({
-            'id': career.id,
-            'name': career.name,
-            'category': career.category,
-            'description': career.description,
-            'match_score': round(rec['score'], 1),
-            'reasoning': rec['reasoning'],
-            'required_skills': career.required_skills,
-            'salary_range': career.salary_range,
-            'growth_prospects': career.growth_prospects,
-            'work_environment': career.work_environment
-        })
-    
-    print(f"Returning {len(formatted_recommendations)} formatted recommendations")
-    return Response({
-        'recommendations': formatted_recommendations,
-        'total_analyzed': len(recommendations)
-    })
+    return Response(format_recommendations(recommendations))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_analysis_job(request, job_id):
+    """Get the status of a background analysis job, with the analysis result once done"""
+    job = get_object_or_404(AnalysisJob, pk=job_id, user=request.user)
+    return Response(_job_data(request, job))
+
+def _user_recommendations(request, user):
+    """The user's recommendations restricted to ?fields=, with their paginator"""
+    fields = _sparse_fields(request, CareerRecommendationSerializer)
+    paginator = RecommendationPagination()
+    recommendations = _sparse_queryset(
+        CareerRecommendation.objects.for_user(user.pk),
+        CareerRecommendationSerializer(fields=fields),
+        paginator
+    )
+    return recommendations, paginator, fields
+
+def _recommendations_data(request, page, paginator, fields):
+    serializer = CareerRecommendationSerializer(page, many=True, fields=fields)
+    data = {'recommendations': serializer.data}
+    if paginator.is_requested(request):
+        data['next'] = paginator.get_next_link()
+    return data
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_recommendations(request):
-    """Get saved career recommendations for the user"""
-    user = request.user
-    
-    recommendations = CareerRecommendation.objects.filter(user=user).order_by('-match_score')[:5]
-    
-    serializer = CareerRecommendationSerializer(recommendations, many=True)
-    return Response({
-        'recommendations': serializer.data
-    })
+    """Get saved career recommendations for the user (top 5, or every one page by page)"""
+    recommendations, paginator, fields = _user_recommendations(request, request.user)
+    page = paginator.paginate_queryset(recommendations, request)
+    if page is None:
+        page = recommendations.order_by('-match_score')[:5]
+    return Response(_recommendations_data(request, page, paginator, fields))
+
+def _catalog_response(request, catalog):
+    """The pre-rendered catalog with its validators, or a 304 when the client's copy is current"""
+    # Validators only ever describe this exact representation, never fields=/paginated/error responses
+    last_modified = timegm(catalog.last_modified.utctimetuple())
+    response = get_conditional_response(request, etag=catalog.etag, last_modified=last_modified)
+    if response is None:
+        if GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response = HttpResponse(catalog.gzip_body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(catalog.json_body, content_type='application/json')
+        response['Last-Modified'] = http_date(last_modified)
+    response['ETag'] = catalog.etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 @api_view(['GET'])
+@use_read_replica
 def get_all_careers(request):
-    """Get all available careers"""
-    careers = Career.objects.all()
-    serializer = CareerSerializer(careers, many=True)
-    return Response({
-        'careers': serializer.data
-    })
+    """Get all available careers (pre-rendered per catalog version, 304 when unchanged)"""
+    fields = _sparse_fields(request, CareerSerializer)
+    paginator = CareerPagination()
+    if fields is not None or paginator.is_requested(request):
+        careers = _sparse_queryset(Career.objects.all(), CareerSerializer(fields=fields), paginator)
+        page = paginator.paginate_queryset(careers, request)
+        data = {'careers': CareerSerializer(careers if page is None else page, many=True, fields=fields).data}
+        if page is not None:
+            data['next'] = paginator.get_next_link()
+        return Response(data)
+    
+    return _catalog_response(request, get_career_catalog())
 
 @api_view(['GET'])
 def test_endpoint(request):
     """Test endpoint to verify Django is working"""
+    stats = get_quiz_stats()
     return Response({
         'message': 'Django backend is working!',
-        'careers_count': Career.objects.count(),
-        'questions_count': Question.objects.count()
+        'careers_count': stats['total_careers'],
+        'questions_count': stats['total_questions']
     })
 
 @api_view(['GET'])
@@ -191,3 +374,41 @@ def get_disliked_careers(request):
     return Response({
         'disliked_careers': disliked_careers
     })
+
+def _export_lines(request, kind):
+    """Check an export's output/since/until/category parameters; returns (lines, output format)"""
+    params = request.query_params
+    # Not ?format=, which DRF reserves for picking a renderer
+    export_format = params.get('output', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        raise ValidationError({'output': f"Expected one of: {', '.join(EXPORT_FORMATS)}"})
+    try:
+        lines = export_lines(
+            kind,
+            export_format,
+            since=parse_time_bound(params.get('since')),
+            until=parse_time_bound(params.get('until'), end=True),
+            category=params.get('category'),
+        )
+    except ValueError as error:
+        raise ValidationError({'detail': str(error)})
+    return lines, export_format
+
+def _export_response(lines, kind, export_format):
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_answers(request):
+    """Stream all answers as NDJSON or CSV (staff only)"""
+    lines, export_format = _export_lines(request, 'answers')
+    return _export_response(lines, 'answers', export_format)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_recommendations(request):
+    """Stream all saved recommendations as NDJSON or CSV (staff only)"""
+    lines, export_format = _export_lines(request, 'recommendations')
+    return _export_response(lines, 'recommendations', export_format)